@@ -0,0 +1,180 @@
+"""
+Single-writer execution of game commands, so that no two requests ever touch the same game at once.
+
+Every game belongs to one shard, chosen by its game_id, and each shard has a thread that runs the commands sent to it
+one at a time, in the order they were submitted. Commands for one game are therefore never interleaved, whether they
+read the game or change it, while games on different shards are handled concurrently. A fixed number of shards keeps
+the number of threads independent of the number of games.
+"""
+
+import sys
+from Queue import Queue
+from threading import Event, Thread
+
+DEFAULT_SHARDS = 8
+STOP = None  # put on a shard's queue to make its thread return
+
+class Reply:
+    """
+    The outcome of a submitted command, which the submitting thread can wait for.
+    """
+
+    def __init__(self):
+        """
+        Create a reply for a command that has not run yet.
+
+        :return: an initialized Reply object
+        """
+        self.done = Event()  # set once the command has run
+        self.result = None  # what the command returned
+        self.error = None  # sys.exc_info() of the exception the command raised, or None
+
+    def get(self):
+        """
+        Wait for the command to run and return its result.
+
+        :return: what the command returned.
+        :raises Exception: whatever the command raised.
+        """
+        self.done.wait()
+        if self.error is not None:
+            raise self.error[0], self.error[1], self.error[2]
+        return self.result
+
+class Shard:
+    """
+    A thread running the commands put on its queue one after another.
+    """
+
+    def __init__(self, name):
+        """
+        Create a shard and start its thread.
+
+        :param name: name of the thread.
+        :return: an initialized Shard object
+        """
+        self.queue = Queue()  # of (function, arguments, Reply) tuples, or STOP
+        self.thread = Thread(target=self.run, name=name)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def run(self):
+        """
+        Run commands until told to stop; the body of the shard's thread.
+
+        A command that raises an exception hands it to its reply, and the shard carries on with the next command.
+        :return: nothing.
+        """
+        while True:
+            command = self.queue.get()
+            if command is STOP:
+                return
+            function, arguments, reply = command
+            try:
+                reply.result = function(*arguments)
+            except Exception:
+                reply.error = sys.exc_info()
+            reply.done.set()
+
+    def submit(self, function, *arguments):
+        """
+        Queue a call of function with the given arguments.
+
+        :param function: the function to call on the shard's thread.
+        :param arguments: arguments to pass to function.
+        :return: the Reply of the call.
+        """
+        reply = Reply()
+        self.queue.put((function, arguments, reply))
+        return reply
+
+class GameExecutor:
+    """
+    Runs commands on the games of a game store, each game's commands on its own shard.
+
+    Everything done to a game should go through the same executor: GameExecutor.edit for changes and GameExecutor.read
+    for anything that looks at a game, since a game held in memory may otherwise be read halfway through a change.
+    """
+
+    def __init__(self, store, n_shards=DEFAULT_SHARDS):
+        """
+        Create an executor and start the threads of its shards.
+
+        :param store: the GameStore holding the games.
+        :param n_shards: number of shards, and so of threads and of games that can be worked on at once.
+        :return: an initialized GameExecutor object
+        """
+        self.store = store
+        self.shards = [Shard('game shard %d' % i) for i in range(n_shards)]
+
+    def shard(self, game_id):
+        """
+        Return the shard that runs the commands of a game.
+
+        :param game_id: the id of the game.
+        :return: a Shard.
+        """
+        return self.shards[hash(game_id) % len(self.shards)]
+
+    def submit(self, game_id, function, *arguments):
+        """
+        Run a function on a game's shard, without waiting for it.
+
+        :param game_id: the id of the game, which picks the shard.
+        :param function: the function to call.
+        :param arguments: arguments to pass to function.
+        :return: the Reply of the call.
+        """
+        return self.shard(game_id).submit(function, *arguments)
+
+    def edit(self, game_id, command):
+        """
+        Change a game on its shard and wait for the change to be saved.
+
+        :param game_id: the id of the game.
+        :param command: a function taking the game, or None if it does not exist, as GameStore.edit yields it.
+        :return: what command returned.
+        """
+        return self.submit(game_id, self.run_edit, game_id, command).get()
+
+    def read(self, game_id, query):
+        """
+        Look at a game on its shard and wait for the answer.
+
+        :param game_id: the id of the game.
+        :param query: a function taking the game, or None if it does not exist, which must not change the game.
+        :return: what query returned.
+        """
+        return self.submit(game_id, self.run_read, game_id, query).get()
+
+    def run_edit(self, game_id, command):
+        """
+        Change a game through the store; what GameExecutor.edit runs on the game's shard.
+
+        :param game_id: the id of the game.
+        :param command: a function taking the game, or None.
+        :return: what command returned.
+        """
+        with self.store.edit(game_id) as game:
+            return command(game)
+
+    def run_read(self, game_id, query):
+        """
+        Load a game and look at it; what GameExecutor.read runs on the game's shard.
+
+        :param game_id: the id of the game.
+        :param query: a function taking the game, or None.
+        :return: what query returned.
+        """
+        return query(self.store.load(game_id))
+
+    def stop(self):
+        """
+        Let every shard finish the commands already submitted, then stop its thread.
+
+        :return: nothing.
+        """
+        for shard in self.shards:
+            shard.queue.put(STOP)
+        for shard in self.shards:
+            shard.thread.join()
@@ -0,0 +1,266 @@
+"""
+A computer player, which chooses actions by searching the game tree with iterative deepening alpha-beta.
+
+Searcher.choose picks an action for the active player of a game. play_turn uses it to play a whole turn of a game run by
+a GameExecutor, and is meant to run in its own thread so that the server keeps handling requests meanwhile.
+"""
+
+from time import time
+
+import snapshot
+from constants import *
+
+# key: unit_type -> item: how much a unit is worth to its owner, in hundredths of a warpling
+UNIT_VALUES = {
+    WARPLING_TYPE: 100,
+    KING_TYPE: 2000,
+    KNIGHT_TYPE: 300,
+    ROOK_TYPE: 500,
+    BISHOP_TYPE: 300,
+    QUEEN_TYPE: 900,
+    GOLD_GENERAL_TYPE: 400,
+    SILVER_GENERAL_TYPE: 300,
+    LANCE_TYPE: 200,
+    SUPER_PAWN_TYPE: 150,
+    PROMOTED_ROOK_TYPE: 700,
+    PROMOTED_BISHOP_TYPE: 600,
+    BARRIER_TYPE: 0,
+}
+ADVANCE_VALUE = 2  # worth of each row a unit other than the king has moved away from its owner's end of the board
+INFINITY = 10**9  # larger than any evaluation
+
+DEFAULT_MAX_DEPTH = 4  # in actions, a turn is up to three actions: move, deploy and end turn
+DEFAULT_TIME_LIMIT = 2.0  # seconds
+CLOCK_CHECK_INTERVAL = 64  # nodes searched between looks at the clock
+
+# kinds of transposition table entries
+EXACT = 0  # the value is exact
+LOWER_BOUND = 1  # the search failed high, the value is at least this
+UPPER_BOUND = 2  # the search failed low, the value is at most this
+
+class SearchTimeout(Exception):
+    """
+    Raised inside the search when its time or node budget runs out.
+    """
+    pass
+
+class Searcher:
+    """
+    Chooses actions with iterative deepening negamax alpha-beta search.
+
+    Actions are tried on the game itself and taken back afterwards, so the game is never copied. Positions are evaluated
+    from the point of view of the active player. Since a player takes several actions in a row, the score only changes
+    sign across actions that end the turn. Results are kept in a transposition table keyed by the Zobrist hash of the
+    position, which also provides the first action to try when a position is searched again.
+    """
+
+    def __init__(self, max_depth=DEFAULT_MAX_DEPTH, time_limit=DEFAULT_TIME_LIMIT, node_limit=None):
+        """
+        Create a searcher with the given budget.
+
+        :param max_depth: the deepest search to try, in actions.
+        :param time_limit: seconds to search for before settling on the best action found so far, or None.
+        :param node_limit: positions to search before settling on the best action found so far, or None.
+        :return: an initialized Searcher object
+        """
+        self.max_depth = max_depth
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.table = {}  # key: (position hash, turn) -> item: (depth, value, kind of entry, best action)
+        self.nodes = 0  # positions searched by the last call to Searcher.choose
+        self.completed_depth = 0  # deepest search completed by the last call to Searcher.choose
+        self.deadline = None  # time at which the current search stops
+
+    def choose(self, game):
+        """
+        Return the action the search thinks is best for the active player of a game.
+
+        :param game: the game, in which actions are tried and taken back with Game.apply and Game.undo.
+        :return: an action tuple as returned by Game.legal_actions.
+        """
+        self.nodes = 0
+        self.completed_depth = 0
+        self.deadline = None if self.time_limit is None else time() + self.time_limit
+        actions = self.order(game, game.legal_actions(), None)
+        best_action = actions[0]
+        if len(actions) == 1:
+            return best_action
+        for depth in range(1, self.max_depth + 1):
+            try:
+                best_action = self.search_root(game, actions, depth)
+            except SearchTimeout:
+                break
+            self.completed_depth = depth
+            # search the best action first next time
+            actions.remove(best_action)
+            actions.insert(0, best_action)
+        return best_action
+
+    def search_root(self, game, actions, depth):
+        """
+        Search every action of the root position to the given depth.
+
+        :param game: the root position.
+        :param actions: the legal actions in the root position, in the order to search them.
+        :param depth: how many actions to look ahead.
+        :return: the best action.
+        """
+        alpha = -INFINITY
+        best_action = actions[0]
+        for action in actions:
+            value = self.search_child(game, action, depth - 1, alpha, INFINITY)
+            if value > alpha:
+                alpha = value
+                best_action = action
+        return best_action
+
+    def search_child(self, game, action, depth, alpha, beta):
+        """
+        Search the position reached by taking an action, and return its value to the player taking the action.
+
+        :param game: the position the action is taken in, which is the same again afterwards.
+        :param action: the action.
+        :param depth: how many more actions to look ahead.
+        :param alpha: the value the player taking the action is already sure of.
+        :param beta: the value above which the opponent will avoid this line.
+        :return: the value of the action.
+        """
+        active_color = game.active_color
+        record = game.apply(action)
+        try:
+            if game.active_color == active_color:
+                return self.search(game, depth, alpha, beta)
+            return -self.search(game, depth, -beta, -alpha)
+        finally:
+            game.undo(record)
+
+    def search(self, game, depth, alpha, beta):
+        """
+        Return the value of a position to its active player, searched to the given depth.
+
+        :param game: the position.
+        :param depth: how many actions to look ahead.
+        :param alpha: the value the active player is already sure of.
+        :param beta: the value above which the opponent will avoid this position.
+        :return: the value, exact if it lies strictly between alpha and beta and otherwise a bound on it.
+        """
+        self.count_node()
+        key = (game.position_hash(), game.turn)
+        entry = self.table.get(key)
+        best_action = None
+        if entry is not None:
+            entry_depth, value, kind, best_action = entry
+            if entry_depth >= depth:
+                if kind == EXACT or (kind == LOWER_BOUND and value >= beta) or (kind == UPPER_BOUND and value <= alpha):
+                    return value
+        if depth == 0 or game.over:
+            return self.evaluate(game)
+        original_alpha = alpha
+        best_value = -INFINITY
+        for action in self.order(game, game.legal_actions(), best_action):
+            value = self.search_child(game, action, depth - 1, alpha, beta)
+            if value > best_value:
+                best_value = value
+                best_action = action
+            if value > alpha:
+                alpha = value
+                if alpha >= beta:
+                    break
+        if best_value <= original_alpha:
+            kind = UPPER_BOUND
+        elif best_value >= beta:
+            kind = LOWER_BOUND
+        else:
+            kind = EXACT
+        self.table[key] = (depth, best_value, kind, best_action)
+        return best_value
+
+    def count_node(self):
+        """
+        Count a searched position, and stop the search if its budget has run out.
+
+        :return: nothing.
+        :raises SearchTimeout: if the time or node limit has been reached.
+        """
+        self.nodes += 1
+        if self.node_limit is not None and self.nodes > self.node_limit:
+            raise SearchTimeout
+        if self.deadline is not None and self.nodes % CLOCK_CHECK_INTERVAL == 0 and time() > self.deadline:
+            raise SearchTimeout
+
+    def order(self, game, actions, best_action):
+        """
+        Sort actions so that the ones most likely to be best are searched first.
+
+        The best action found by an earlier search comes first, then captures of valuable units by cheap ones, then
+        deploys of valuable units, then ending the turn, then every other move.
+        :param game: the position the actions are taken in.
+        :param actions: the legal actions.
+        :param best_action: the best action found by an earlier search, or None.
+        :return: a new list of the actions.
+        """
+        def priority(action):
+            if action == best_action:
+                return INFINITY
+            if action[0] == MOVE_ACTION:
+                target = game.get_unit_by_position(action[2], action[3])
+                if target is None:
+                    return -1
+                return 10*UNIT_VALUES[target.type] - UNIT_VALUES[game.units[action[1]].type]
+            if action[0] == DEPLOY_ACTION:
+                return UNIT_VALUES[action[1]] - UNIT_VALUES[WARPLING_TYPE]
+            return 0
+        return sorted(actions, key=priority, reverse=True)
+
+    def evaluate(self, game):
+        """
+        Return how good a position is for its active player.
+
+        :param game: the position.
+        :return: the value of the active player's units minus the value of their opponent's.
+        """
+        value = 0
+        for unit in game.units.values():
+            unit_value = UNIT_VALUES[unit.type]
+            if unit.type != KING_TYPE:
+                unit_value += ADVANCE_VALUE*game.players[unit.color].adjust(unit.y)
+            if unit.color == game.active_color:
+                value += unit_value
+            else:
+                value -= unit_value
+        return value
+
+def play_turn(executor, game_id, color, searcher):
+    """
+    Play every action of a color's turn in a stored game.
+
+    The search runs on a copy of the game, made on the game's shard, so the shard keeps serving other requests while the
+    computer thinks. If the game changed in the meantime, the chosen action is thrown away and the search starts again.
+    An action that cannot be taken ends the turn, since searching the same position again would choose it again.
+    :param executor: the GameExecutor running the commands of the game.
+    :param game_id: the id of the game.
+    :param color: the color to play, WHITE or BLACK.
+    :param searcher: the Searcher choosing the actions.
+    :return: nothing.
+    """
+    def copy(game):
+        if game is None or game.over or game.active_color != color:
+            return None
+        return snapshot.load(snapshot.dump(game))
+    while True:
+        position = executor.read(game_id, copy)
+        if position is None:
+            return
+        action = searcher.choose(position)
+        def perform(game):
+            # None if the game changed and the search must start again, otherwise whether to carry on
+            if game is None:
+                return False
+            if game.state_ID != position.state_ID:
+                return None
+            if game.perform(action):
+                return True
+            game.perform((END_TURN_ACTION,))
+            return False
+        if executor.edit(game_id, perform) is False:
+            return
@@ -3,12 +3,17 @@ YOLO SWAG 420
 """
 
 from json import dumps
+from os import environ
+from threading import Lock, Thread
 
 from flask import Flask, redirect, render_template, session, url_for
 
+from actor import DEFAULT_SHARDS, GameExecutor
+from ai import Searcher, play_turn
 from constants import WHITE, BLACK
 from game import Game
-from tests import test_game, make_game
+from store import MemoryGameStore, SQLiteGameStore
+from setups import test_game, make_game
 
 ROOT_TEMPLATE = 'root.html'
 GAME_TEMPLATE = 'game.html'
@@ -25,6 +30,9 @@ ERROR_MASQUERADE = 'cannot perform actions as opponent'
 SUCCESS_DEFAULT = 'success'
 SUCCESS_GAME_DNE = 'game did not exist'
 
+POLL_TIMEOUT = 25 # seconds a long-poll request waits for a new state before giving up
+AI_TIME_LIMIT = 2.0 # seconds the computer player thinks about each action
+
 DEBUG_SECRET_KEY = 'THIS IS A TESTING KEY; CHANGE WHEN DEPLOYING, YOU NUMBSKULL'
 
 DEBUG = True # change this when deploying, obviously
@@ -34,11 +42,19 @@ app = Flask(__name__)
 # secret key for session storage
 app.secret_key = DEBUG_SECRET_KEY
 
-# master list of all currently running games; list of their states
-games = {}
+# master list of all currently running games; set WARPWARS_DATABASE to share them between worker processes
+if 'WARPWARS_DATABASE' in environ:
+    games = SQLiteGameStore(environ['WARPWARS_DATABASE'])
+else:
+    games = MemoryGameStore()
+
+# runs every command that reads or changes a game, one at a time per game, on a fixed number of threads
+executor = GameExecutor(games, int(environ.get('WARPWARS_SHARDS', DEFAULT_SHARDS)))
 
-# the game_id to use for the next game to be created
-next_id = 0
+# single-player games started by this process, key: game_id -> item: the color the computer plays
+ai_players = {}
+ai_running = set() # game_ids whose computer player is currently taking its turn
+ai_lock = Lock() # held while changing ai_running
 
 @app.route('/')
 def root():
@@ -50,8 +66,8 @@ def root():
     :return: the html for the root page
     """
     ajax_file = generate_static_url(AJAX_FILE)
-    num_games = len(games)
-    list_of_games = games.keys()
+    list_of_games = games.game_ids()
+    num_games = len(list_of_games)
     return render_template(ROOT_TEMPLATE, ajax_file = ajax_file, num_games = num_games, games = list_of_games)
 
 @app.route('/create/game')
@@ -59,22 +75,31 @@ def create_game():
     """
     Create a new game.
 
-    The new game will be created with game_id = next_id and next_id incremented.
+    The game store hands out the new game's game_id.
 
     :return: a redirect to '/game/<game_id>'
     """
-    global next_id
-
-    # book-keeping
-    game_id = next_id
-    next_id += 1
+    # actually create the game
+    game_id = games.create(make_game()) #test_game()
 
     # set this player as black
     session['color-' + str(game_id)] = BLACK
 
-    # actually create the game
-    games[game_id] = make_game() #test_game()
+    return redirect('/game/' + str(game_id))
+
+@app.route('/create/game/ai')
+def create_ai_game():
+    """
+    Create a new game against the computer.
 
+    The player is black and the computer is white, so the computer starts taking its first turn right away.
+
+    :return: a redirect to '/game/<game_id>'
+    """
+    game_id = games.create(make_game())
+    session['color-' + str(game_id)] = BLACK
+    ai_players[game_id] = WHITE
+    start_ai_turn(game_id)
     return redirect('/game/' + str(game_id))
 
 @app.route('/join/game/<int:game_id>/as/<color>')
@@ -109,8 +134,7 @@ def delete_game(game_id):
     :param game_id: the game_id of the game to delete
     :return: a JSON message indicating whether or not the delete succeeded
     """
-    if game_id not in games: return format_response(STATUS_SUCCESS, SUCCESS_GAME_DNE)
-    games.pop(game_id)
+    if not games.delete(game_id): return format_response(STATUS_SUCCESS, SUCCESS_GAME_DNE)
     return format_response(STATUS_SUCCESS, SUCCESS_DEFAULT)
 
 @app.route('/delete/game/all')
@@ -141,11 +165,12 @@ def game(game_id):
     ajax_file = generate_static_url(AJAX_FILE)
     drawing_file = generate_static_url(DRAWING_FILE)
     changed = url_for('game_changed', game_id = game_id, last_state = 0)[:-1] # remove last_state so client can fill it in
+    poll = url_for('game_poll', game_id = game_id, last_state = 0)[:-1]
     state = url_for('game_status', game_id = game_id)
     end_turn = url_for('game_update_end_turn', game_id = game_id)
     color = session['color-' + str(game_id)]
     return render_template(GAME_TEMPLATE, game_id = game_id, drawing_file = drawing_file, ajax_file = ajax_file,
-                           state = state, changed = changed, end_turn = end_turn, player_color = color)
+                           state = state, changed = changed, poll = poll, end_turn = end_turn, player_color = color)
 
 @app.route('/update/game/<int:game_id>/move/<int:unit_id>/to/<int:x>/<int:y>')
 def game_update_move(game_id, unit_id, x, y):
@@ -162,9 +187,13 @@ def game_update_move(game_id, unit_id, x, y):
     :param y: the y-coordinate the piece is moving to
     :return: whether or not the update succeeded, as JSON
     """
-    if game_id not in games: return format_response(STATUS_ERROR, ERROR_GAME_DNE)
-    games[game_id].move(unit_id, x, y)
-    return format_response(STATUS_SUCCESS, SUCCESS_DEFAULT) # maybe return game_status(game_id), or just wait for autoupdate?
+    def move(game):
+        if game is None: return format_response(STATUS_ERROR, ERROR_GAME_DNE)
+        game.move(unit_id, x, y)
+        return format_response(STATUS_SUCCESS, SUCCESS_DEFAULT) # maybe return game_status(game_id), or just wait for autoupdate?
+    response = executor.edit(game_id, move)
+    start_ai_turn(game_id)
+    return response
 
 @app.route('/update/game/<int:game_id>/color/<int:color>/deploy/<int:unit_type>/to/<int:x>/<int:y>')
 def game_update_deploy(game_id, color, unit_type, x, y):
@@ -184,8 +213,13 @@ def game_update_deploy(game_id, color, unit_type, x, y):
     """
     if game_id not in games: return format_response(STATUS_ERROR, ERROR_GAME_DNE)
     if color != session['color-' + str(game_id)]: return format_response(STATUS_ERROR, ERROR_MASQUERADE)
-    games[game_id].deploy(unit_type, color, x, y)
-    return format_response(STATUS_SUCCESS, SUCCESS_DEFAULT)
+    def deploy(game):
+        if game is None: return format_response(STATUS_ERROR, ERROR_GAME_DNE)
+        game.deploy(unit_type, color, x, y)
+        return format_response(STATUS_SUCCESS, SUCCESS_DEFAULT)
+    response = executor.edit(game_id, deploy)
+    start_ai_turn(game_id)
+    return response
 
 @app.route('/update/game/<int:game_id>/end/turn')
 def game_update_end_turn(game_id):
@@ -195,9 +229,13 @@ def game_update_end_turn(game_id):
     :param game_id: the id of the game to update
     :return: whether or not the update succeeded, as JSON
     """
-    if game_id not in games: return format_response(STATUS_ERROR, ERROR_GAME_DNE)
-    games[game_id].next_turn()
-    return format_response(STATUS_SUCCESS, SUCCESS_DEFAULT)
+    def end_turn(game):
+        if game is None: return format_response(STATUS_ERROR, ERROR_GAME_DNE)
+        game.next_turn()
+        return format_response(STATUS_SUCCESS, SUCCESS_DEFAULT)
+    response = executor.edit(game_id, end_turn)
+    start_ai_turn(game_id)
+    return response
 
 @app.route('/changed/game/<int:game_id>/<int:last_state>')
 def game_changed(game_id, last_state):
@@ -208,8 +246,9 @@ def game_changed(game_id, last_state):
     :param last_state: the last state seen by the client
     :return: whether or not there is new state to be fetched or an error, as JSON
     """
-    if game_id not in games: return format_response(STATUS_ERROR, ERROR_GAME_DNE)
-    return dumps({'changed': True if games[game_id].state_ID > last_state else False}) # absolutely disgusting
+    state_ID = games.state_ID(game_id)
+    if state_ID is None: return format_response(STATUS_ERROR, ERROR_GAME_DNE)
+    return dumps({'changed': True if state_ID > last_state else False}) # absolutely disgusting
 
 @app.route('/state/game/<int:game_id>')
 def game_status(game_id):
@@ -221,8 +260,43 @@ def game_status(game_id):
     :param game_id: the id of the game whose status is to be fetched
     :return: the current game state or an error, as JSON
     """
-    if game_id not in games: return format_response(STATUS_ERROR, ERROR_GAME_DNE)
-    return games[game_id].state()
+    def state(game):
+        if game is None: return format_response(STATUS_ERROR, ERROR_GAME_DNE)
+        return game.state()
+    return executor.read(game_id, state)
+
+@app.route('/poll/game/<int:game_id>/<int:last_state>')
+def game_poll(game_id, last_state):
+    """
+    Wait until the given game has a state newer than the client's, then fetch what changed.
+
+    The request is held open for up to POLL_TIMEOUT seconds, so this needs a server that handles requests in threads.
+
+    :param game_id: the game_id of the game to wait on
+    :param last_state: the last state seen by the client
+    :return: the changes since last_state (see Game.state_since), {'changed': false} if there were none before the
+    timeout, or an error, as JSON
+    """
+    state_ID = games.wait(game_id, last_state, POLL_TIMEOUT)
+    if state_ID is None: return format_response(STATUS_ERROR, ERROR_GAME_DNE)
+    if state_ID <= last_state: return dumps({'changed': False})
+    return game_delta(game_id, last_state)
+
+@app.route('/delta/game/<int:game_id>/<int:last_state>')
+def game_delta(game_id, last_state):
+    """
+    Fetch what changed in a given game since the client's last state.
+
+    If the server no longer remembers last_state, the full game state is sent instead, marked with 'full': true.
+
+    :param game_id: the id of the game whose changes are to be fetched
+    :param last_state: the last state seen by the client
+    :return: the changes or full state (see Game.state_since), or an error, as JSON
+    """
+    def delta(game):
+        if game is None: return format_response(STATUS_ERROR, ERROR_GAME_DNE)
+        return game.state_since(last_state)
+    return executor.read(game_id, delta)
 
 @app.errorhandler(404)
 def page_not_found(error):
@@ -246,6 +320,38 @@ def format_response(status, message):
     """
     return dumps({'status': status, 'message': message})
 
+def start_ai_turn(game_id):
+    """
+    Let the computer take its turn in the given game, in a background thread, if the game is against the computer.
+
+    Nothing happens if the computer is already taking its turn, or if it is not the computer's turn.
+
+    :param game_id: the id of the game
+    :return: nothing
+    """
+    with ai_lock:
+        if game_id not in ai_players or game_id in ai_running: return
+        ai_running.add(game_id)
+    thread = Thread(target = run_ai_turn, args = (game_id,))
+    thread.daemon = True
+    thread.start()
+
+def run_ai_turn(game_id):
+    """
+    Play the computer's turn in the given game; the body of the threads started by start_ai_turn.
+
+    :param game_id: the id of the game
+    :return: nothing
+    """
+    color = ai_players[game_id]
+    try:
+        play_turn(executor, game_id, color, Searcher(time_limit = AI_TIME_LIMIT))
+    finally:
+        with ai_lock:
+            ai_running.discard(game_id)
+    # the player may have ended their turn just as the computer finished, while it still counted as running
+    if executor.read(game_id, lambda game: game is not None and game.active_color == color): start_ai_turn(game_id)
+
 def generate_static_url(file_name):
     """
     Generate URLs for static files according to the relevant static file root.
@@ -267,4 +373,4 @@ if __name__ == '__main__':
         print 'ERROR: default secret key cannot be used in production!'
         print 'Exiting!'
         raise SystemExit
-    app.run(debug = DEBUG)
\ No newline at end of file
+    app.run(debug = DEBUG, threaded = True)
\ No newline at end of file
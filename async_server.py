@@ -0,0 +1,1026 @@
+"""
+An asynchronous server for WarpWars, serving the same routes as application.py from a single thread.
+
+Python 2 has no asyncio, so connections are asynchat channels driven by an epoll loop, or a poll loop where epoll is
+missing. A connection only costs a socket and a few objects, and the loop only looks at connections that have something
+to do, so thousands of players and spectators can wait on long polls at once. A long poll is parked until its game
+changes, when every poll waiting on the game is answered, or until it times out.
+
+Game pages may instead open a WebSocket per game, see Server.route_socket. Actions are sent over it as short messages
+and acknowledged on it, and every change to the game is pushed to all WebSockets following it, so an action takes a
+single round trip and carries no HTTP headers or cookies.
+
+Every command that reads or changes a game runs on the loop's thread, which makes the loop the single writer of every
+game it serves. The computer player searches in threads of its own and hands the actions it chooses to the loop.
+Games are therefore kept in memory only: a query to an SQLiteGameStore, and above all waiting for its write lock, would
+stall every connection at once, so the server does not share games with other workers the way application.py can.
+
+Sessions are kept in a cookie signed with HMAC-SHA256, so that players cannot claim another player's color. Pages are
+rendered from the same templates as application.py when Jinja2 is installed; the JSON routes need nothing but the
+standard library. Run `python async_server.py --help` for options.
+"""
+
+import argparse
+import asynchat
+import asyncore
+import base64
+import hmac
+import os
+import re
+import select
+import socket
+import struct
+import sys
+import traceback
+from Queue import Empty, Queue
+from collections import deque
+from hashlib import sha1, sha256
+from heapq import heappop, heappush
+from json import dumps, loads
+from threading import Thread
+from time import time
+
+from actor import Reply
+from ai import Searcher, play_turn
+from constants import WHITE, BLACK, MOVE_ACTION, DEPLOY_ACTION, END_TURN_ACTION
+from setups import make_game
+from store import MemoryGameStore
+
+try:
+    import jinja2
+except ImportError:
+    jinja2 = None
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 5000
+LISTEN_BACKLOG = 1024  # connections the operating system queues before the loop accepts them
+
+POLL_TIMEOUT = 25  # seconds a long-poll request waits for a new state before giving up, as in application.py
+AI_TIME_LIMIT = 2.0  # seconds the computer player thinks about each action, as in application.py
+CHECK_INTERVAL = 0.5  # seconds between looks at parked polls for timeouts
+MAX_HEAD_SIZE = 65536  # longest request line and headers accepted, in bytes
+MAX_MESSAGE_SIZE = 4096  # longest WebSocket message accepted from a client, in bytes
+
+SESSION_COOKIE = 'warpwars-session'
+
+# WebSocket protocol, RFC 6455
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'  # appended to the client's key to make the accept header
+WEBSOCKET_VERSION = '13'
+CONTINUATION_FRAME, TEXT_FRAME, BINARY_FRAME, CLOSE_FRAME, PING_FRAME, PONG_FRAME = 0x0, 0x1, 0x2, 0x8, 0x9, 0xa
+CLOSE_NORMAL = 1000
+CLOSE_PROTOCOL_ERROR = 1002
+CLOSE_TOO_BIG = 1009
+# key: action name -> item: length of the action tuple, as passed to Game.perform
+ACTION_LENGTHS = {MOVE_ACTION: 4, DEPLOY_ACTION: 4, END_TURN_ACTION: 1}
+
+TEMPLATE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+STATIC_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+ROOT_TEMPLATE = 'root.html'
+GAME_TEMPLATE = 'game.html'
+ERROR_404_TEMPLATE = '404.html'
+AJAX_FILE = 'ajax.js'
+DRAWING_FILE = 'drawing.js'
+# key: file extension -> item: content type of static files
+CONTENT_TYPES = {'.js': 'application/javascript', '.css': 'text/css', '.html': 'text/html; charset=utf-8'}
+
+# response messages, as in application.py
+STATUS_SUCCESS = 'success'
+STATUS_ERROR = 'error'
+ERROR_GAME_DNE = 'game does not exist'
+ERROR_MASQUERADE = 'cannot perform actions as opponent'
+ERROR_ILLEGAL_ACTION = 'illegal action'
+ERROR_BAD_MESSAGE = 'malformed message'
+ERROR_INTERNAL = 'internal server error'
+SUCCESS_DEFAULT = 'success'
+SUCCESS_GAME_DNE = 'game did not exist'
+
+# (path pattern, name of the Server method handling it); numeric groups are passed to the method as ints
+ROUTES = [(re.compile('^%s$' % pattern), name) for pattern, name in (
+    (r'/', 'root'),
+    (r'/create/game', 'create_game'),
+    (r'/create/game/ai', 'create_ai_game'),
+    (r'/join/game/(\d+)/as/(\w+)', 'join_game'),
+    (r'/delete/game/(\d+)', 'delete_game'),
+    (r'/delete/game/all', 'delete_all_games'),
+    (r'/game/(\d+)', 'game'),
+    (r'/update/game/(\d+)/move/(\d+)/to/(\d+)/(\d+)', 'move'),
+    (r'/update/game/(\d+)/color/(\d+)/deploy/(\d+)/to/(\d+)/(\d+)', 'deploy'),
+    (r'/update/game/(\d+)/end/turn', 'end_turn'),
+    (r'/changed/game/(\d+)/(\d+)', 'changed'),
+    (r'/state/game/(\d+)', 'state'),
+    (r'/poll/game/(\d+)/(\d+)', 'poll'),
+    (r'/delta/game/(\d+)/(\d+)', 'delta'),
+    (r'/socket/game/(\d+)/(\d+)', 'socket'),
+    (r'/static/([\w.-]+)', 'static'),
+)]
+
+def sign_session(secret, session):
+    """
+    Encode a session as a cookie value that cannot be changed without the secret.
+
+    :param secret: the server's secret key, a string.
+    :param session: a dictionary that can be converted to JSON.
+    :return: a string.
+    """
+    data = base64.urlsafe_b64encode(dumps(session, sort_keys=True))
+    return data + '.' + hmac.new(secret, data, sha256).hexdigest()
+
+def load_session(secret, cookie):
+    """
+    Decode a cookie value made by sign_session.
+
+    :param secret: the server's secret key, a string.
+    :param cookie: the cookie value, or None.
+    :return: the session dictionary, or an empty one if the cookie is missing, malformed or not signed with secret.
+    """
+    if not cookie:
+        return {}
+    data, separator, signature = cookie.rpartition('.')
+    if not hmac.compare_digest(signature, hmac.new(secret, data, sha256).hexdigest()):
+        return {}
+    try:
+        session = loads(base64.urlsafe_b64decode(data))
+    except (TypeError, ValueError):
+        return {}
+    return session if isinstance(session, dict) else {}
+
+def format_response(status, message):
+    """
+    Format a status and message as a JSON object, as application.format_response does.
+
+    :param status: the status of the message (eg 'error', 'success').
+    :param message: the message to format.
+    :return: a JSON string.
+    """
+    return dumps({'status': status, 'message': message})
+
+def unmask(mask, data):
+    """
+    Undo the masking of a WebSocket payload sent by a client.
+
+    :param mask: the frame's four byte masking key.
+    :param data: the masked payload.
+    :return: the payload, a string.
+    """
+    mask = bytearray(mask)
+    data = bytearray(data)
+    for i in range(len(data)):
+        data[i] ^= mask[i & 3]
+    return str(data)
+
+class Request:
+    """
+    An HTTP request, as far as the server looks at it.
+    """
+
+    def __init__(self, head, secret):
+        """
+        Parse the request line and headers of a request.
+
+        :param head: everything before the blank line ending the headers.
+        :param secret: the server's secret key, to check the session cookie with.
+        :return: an initialized Request object
+        :raises ValueError: if the request line is malformed.
+        """
+        lines = head.split('\r\n')
+        self.method, target, self.version = lines[0].split(' ')
+        self.path = target.split('?', 1)[0]
+        self.headers = {}  # key: lower case header name -> item: value
+        for line in lines[1:]:
+            name, separator, value = line.partition(':')
+            self.headers[name.strip().lower()] = value.strip()
+        connection = self.headers.get('connection', '').lower()
+        if self.version == 'HTTP/1.1':
+            self.keep_alive = 'close' not in connection
+        else:
+            self.keep_alive = 'keep-alive' in connection
+        cookies = {}
+        for cookie in self.headers.get('cookie', '').split(';'):
+            name, separator, value = cookie.strip().partition('=')
+            cookies[name] = value
+        self.session = load_session(secret, cookies.get(SESSION_COOKIE))
+        self.session_changed = False  # set when a route changes the session, so the response sets the cookie
+
+    def set_color(self, game_id, color):
+        """
+        Remember in the session which color the player plays in a game.
+
+        :param game_id: the id of the game.
+        :param color: WHITE or BLACK.
+        :return: nothing.
+        """
+        self.session['color-' + str(game_id)] = color
+        self.session_changed = True
+
+    def color(self, game_id):
+        """
+        Return the color the player plays in a game.
+
+        :param game_id: the id of the game.
+        :return: WHITE, BLACK, or None if the player has not joined the game.
+        """
+        return self.session.get('color-' + str(game_id))
+
+class Connection(asynchat.async_chat):
+    """
+    A client's connection, which reads requests one after another and answers them in order.
+
+    Requests that arrive while an earlier one is parked are queued until it has been answered. A connection upgraded to
+    a WebSocket stops speaking HTTP and reads frames instead, each in up to three parts: its first two bytes, its
+    extended length and masking key, and its payload.
+    """
+
+    def __init__(self, server, sock):
+        """
+        Start reading requests from an accepted socket.
+
+        :param server: the Server that accepted the connection.
+        :param sock: the socket.
+        :return: an initialized Connection object
+        """
+        asynchat.async_chat.__init__(self, sock, map=server.map)
+        # answers are often written in several small pieces, eg: an acknowledgement and then the changes it made
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.server = server
+        self.incoming = []  # data of the request being read
+        self.incoming_size = 0  # bytes in self.incoming
+        self.requests = deque()  # heads of requests read but not answered yet, the first being handled
+        self.request = None  # the Request being handled
+        self.parked = None  # (game_id, last_state, deadline) of the long poll this connection waits on, or None
+        self.channel = None  # (game_id, color) once upgraded to a WebSocket, color being None for spectators
+        self.last_state = None  # state_ID of the last state sent over the WebSocket
+        self.frame = None  # (final, opcode, length code) of the WebSocket frame being read, or None before its start
+        self.mask = None  # masking key of the frame being read, or None before it is known
+        self.fragments = []  # payloads of a WebSocket message that arrived in several frames so far
+        self.set_terminator('\r\n\r\n')
+
+    def collect_incoming_data(self, data):
+        self.incoming.append(data)
+        self.incoming_size += len(data)
+        if self.incoming_size > MAX_HEAD_SIZE:
+            self.close()
+
+    def found_terminator(self):
+        data = ''.join(self.incoming)
+        self.incoming = []
+        self.incoming_size = 0
+        if self.channel is not None:
+            self.read_frame(data)
+            return
+        self.requests.append(data)
+        if len(self.requests) == 1:
+            self.server.handle(self, self.requests[0])
+
+    def respond(self, status, body, content_type='application/json', headers=()):
+        """
+        Send the response to the request being handled, then handle the next request if one is waiting.
+
+        :param status: the status line after the version, eg: '200 OK'.
+        :param body: the body, a string or unicode.
+        :param content_type: the Content-Type of the body.
+        :param headers: extra (name, value) header pairs.
+        :return: nothing.
+        """
+        if isinstance(body, unicode):
+            body = body.encode('utf-8')
+        request = self.request
+        keep_alive = request is not None and request.keep_alive
+        lines = ['HTTP/1.1 ' + status, 'Content-Type: ' + content_type, 'Content-Length: %d' % len(body)]
+        lines.extend('%s: %s' % header for header in headers)
+        if request is not None and request.session_changed:
+            lines.append('Set-Cookie: %s=%s; Path=/; HttpOnly' % (SESSION_COOKIE,
+                                                                  sign_session(self.server.secret, request.session)))
+        if not keep_alive:
+            lines.append('Connection: close')
+        self.push('\r\n'.join(lines) + '\r\n\r\n' + body)
+        self.request = None
+        self.parked = None
+        self.requests.popleft()
+        if not keep_alive:
+            self.requests.clear()
+            self.close_when_done()
+        self.server.update(self)
+        if self.requests:
+            self.server.handle(self, self.requests[0])
+
+    def upgrade(self, accept, game_id, color, last_state):
+        """
+        Accept a WebSocket handshake, after which the connection carries frames instead of HTTP.
+
+        :param accept: value of the Sec-WebSocket-Accept header.
+        :param game_id: the id of the game the WebSocket follows.
+        :param color: the color the client plays, or None.
+        :param last_state: the last state seen by the client.
+        :return: nothing.
+        """
+        self.push('HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+                  'Sec-WebSocket-Accept: %s\r\n\r\n' % accept)
+        self.request = None
+        self.requests.clear()
+        self.channel = (game_id, color)
+        self.last_state = last_state
+        self.set_terminator(2)
+        self.server.update(self)
+
+    def read_frame(self, data):
+        """
+        Take the next part of a WebSocket frame, and hand the message to the server once a message is complete.
+
+        :param data: the part read, as long as the terminator asked for.
+        :return: nothing.
+        """
+        if self.frame is None:
+            first, second = struct.unpack('!BB', data)
+            if not second & 0x80:
+                self.close_channel(CLOSE_PROTOCOL_ERROR)  # clients must mask every frame
+                return
+            self.frame = (first & 0x80, first & 0x0f, second & 0x7f)
+            self.set_terminator({126: 2, 127: 8}.get(self.frame[2], 0) + 4)
+            return
+        final, opcode, length = self.frame
+        if self.mask is None:
+            if length == 126:
+                length = struct.unpack('!H', data[:2])[0]
+            elif length == 127:
+                length = struct.unpack('!Q', data[:8])[0]
+            if length + sum(len(fragment) for fragment in self.fragments) > MAX_MESSAGE_SIZE:
+                self.close_channel(CLOSE_TOO_BIG)
+                return
+            self.mask = data[-4:]
+            if length:
+                self.set_terminator(length)
+                return
+            data = ''
+        payload = unmask(self.mask, data)
+        self.frame = None
+        self.mask = None
+        self.set_terminator(2)
+        if opcode == CLOSE_FRAME:
+            self.close_channel(CLOSE_NORMAL)
+        elif opcode == PING_FRAME:
+            self.send_frame(PONG_FRAME, payload)
+        elif opcode == PONG_FRAME:
+            pass
+        elif (opcode == CONTINUATION_FRAME) != bool(self.fragments):
+            self.close_channel(CLOSE_PROTOCOL_ERROR)  # a continuation with nothing to continue, or an unfinished message
+        else:
+            self.fragments.append(payload)
+            if final:
+                message = ''.join(self.fragments)
+                self.fragments = []
+                self.server.handle_message(self, message)
+
+    def send_frame(self, opcode, payload):
+        """
+        Send a WebSocket frame, unmasked as frames from servers are.
+
+        :param opcode: the kind of frame, eg: TEXT_FRAME.
+        :param payload: the payload, a string or unicode.
+        :return: nothing.
+        """
+        if isinstance(payload, unicode):
+            payload = payload.encode('utf-8')
+        length = len(payload)
+        if length < 126:
+            header = struct.pack('!BB', 0x80 | opcode, length)
+        elif length < 65536:
+            header = struct.pack('!BBH', 0x80 | opcode, 126, length)
+        else:
+            header = struct.pack('!BBQ', 0x80 | opcode, 127, length)
+        self.push(header + payload)
+        self.server.update(self)
+
+    def close_channel(self, code):
+        """
+        Send a WebSocket close frame and close the connection once it has been sent.
+
+        :param code: the status code of the close frame, eg: CLOSE_NORMAL.
+        :return: nothing.
+        """
+        self.server.forget(self)
+        self.send_frame(CLOSE_FRAME, struct.pack('!H', code))
+        self.set_terminator(None)  # ignore whatever the client sends after this
+        self.close_when_done()
+        self.server.update(self)
+
+    def handle_close(self):
+        self.server.forget(self)
+        self.close()
+
+    def handle_error(self):
+        traceback.print_exc()
+        self.server.forget(self)
+        self.close()
+
+class Waker(asyncore.dispatcher):
+    """
+    One end of a socket pair, which other threads write to so that the loop wakes up and runs their tasks.
+    """
+
+    def __init__(self, server):
+        """
+        Create the socket pair.
+
+        :param server: the Server whose loop to wake.
+        :return: an initialized Waker object
+        """
+        reader, self.writer = socket.socketpair()
+        asyncore.dispatcher.__init__(self, reader, map=server.map)
+        self.writer.setblocking(False)
+
+    def wake(self):
+        """
+        Wake up the loop; called from other threads.
+
+        :return: nothing.
+        """
+        try:
+            self.writer.send('x')
+        except socket.error:
+            pass  # the buffer is full, so the loop has a wake up pending anyway
+
+    def handle_read(self):
+        self.recv(4096)
+
+    def writable(self):
+        return False
+
+class Server(asyncore.dispatcher):
+    """
+    Accepts connections and answers their requests, all on the thread that runs Server.serve_forever.
+    """
+
+    def __init__(self, store, host=DEFAULT_HOST, port=DEFAULT_PORT, secret=None, poll_timeout=POLL_TIMEOUT):
+        """
+        Start listening.
+
+        :param store: the MemoryGameStore holding the games; stores that wait on a database would block the loop.
+        :param host: the address to listen on.
+        :param port: the port to listen on, or 0 for any free port; see Server.port.
+        :param secret: the key signing session cookies, or None for a random one, which logs players out on restart.
+        :param poll_timeout: seconds a long poll is held before it is answered with no change.
+        :return: an initialized Server object
+        """
+        if not isinstance(store, MemoryGameStore):
+            raise ValueError('the asynchronous server keeps games in memory only, not in %s' % type(store).__name__)
+        self.map = {}  # key: file descriptor -> item: dispatcher, for every socket of this server
+        asyncore.dispatcher.__init__(self, map=self.map)
+        self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.set_reuse_addr()
+        self.bind((host, port))
+        self.listen(LISTEN_BACKLOG)
+        self.port = self.socket.getsockname()[1]
+        self.store = store
+        self.secret = secret if secret is not None else os.urandom(32)
+        self.poll_timeout = poll_timeout
+        self.templates = None if jinja2 is None else jinja2.Environment(
+            loader=jinja2.FileSystemLoader(TEMPLATE_DIRECTORY), autoescape=True)
+        self.poller = select.epoll() if hasattr(select, 'epoll') else select.poll()
+        self.poll_scale = 1 if hasattr(select, 'epoll') else 1000  # poll takes milliseconds, epoll seconds
+        self.registered = {}  # key: dispatcher -> item: (file descriptor, events it is registered for)
+        self.waiting = {}  # key: game_id -> item: set of connections parked on the game
+        self.subscribers = {}  # key: game_id -> item: set of WebSocket connections following the game
+        self.deadlines = []  # heap of (time, connection) at which parked polls time out
+        self.next_check = 0  # time of the next look at every parked poll
+        self.tasks = Queue()  # of (function, arguments, Reply) handed to the loop by other threads
+        self.waker = Waker(self)
+        self.ai_players = {}  # key: game_id -> item: the color the computer plays
+        self.ai_running = set()  # game_ids whose computer player is currently taking its turn
+        self.running = True  # set to False from any thread to make Server.serve_forever return
+        self.update(self)
+        self.update(self.waker)
+
+    # the loop
+
+    def serve_forever(self):
+        """
+        Handle connections until Server.stop is called.
+
+        :return: nothing.
+        """
+        while self.running:
+            timeout = max(0, min(CHECK_INTERVAL, self.next_check - time()))
+            for fd, flags in self.poller.poll(timeout*self.poll_scale):
+                dispatcher = self.map.get(fd)
+                if dispatcher is None:
+                    self.unregister(fd)
+                    continue
+                asyncore.readwrite(dispatcher, flags)
+                self.update(dispatcher)
+            self.run_tasks()
+            if time() >= self.next_check:
+                self.check_parked()
+        for dispatcher in self.map.values():
+            dispatcher.close()
+        self.waker.writer.close()
+
+    def stop(self):
+        """
+        Make Server.serve_forever return; may be called from any thread.
+
+        :return: nothing.
+        """
+        self.running = False
+        self.waker.wake()
+
+    def update(self, dispatcher):
+        """
+        Register a dispatcher's socket with the poller for the events it waits for, or unregister it once closed.
+
+        Only dispatchers that just did something need updating, which is what keeps idle connections free.
+        :param dispatcher: a dispatcher of this server.
+        :return: nothing.
+        """
+        fd = dispatcher._fileno  # set by asyncore, and reset to None when the dispatcher is closed
+        registered = self.registered.get(dispatcher)
+        if fd is None or self.map.get(fd) is not dispatcher:
+            if registered is not None:
+                del self.registered[dispatcher]
+                # the file descriptor may already belong to a newer connection
+                if registered[0] not in self.map:
+                    self.unregister(registered[0])
+            return
+        events = select.POLLIN | select.POLLPRI
+        if dispatcher.writable():
+            events |= select.POLLOUT
+        if registered is None:
+            self.poller.register(fd, events)
+        elif registered[1] != events:
+            self.poller.modify(fd, events)
+        else:
+            return
+        self.registered[dispatcher] = (fd, events)
+
+    def unregister(self, fd):
+        """
+        Stop polling a file descriptor.
+
+        :param fd: the file descriptor.
+        :return: nothing.
+        """
+        try:
+            self.poller.unregister(fd)
+        except (IOError, OSError, KeyError, ValueError):
+            pass  # epoll forgets closed sockets by itself
+
+    def handle_accept(self):
+        accepted = self.accept()
+        if accepted is not None:
+            self.update(Connection(self, accepted[0]))
+
+    def handle_error(self):
+        traceback.print_exc()
+
+    def call(self, function, *arguments):
+        """
+        Run a function on the loop's thread; called from other threads.
+
+        :param function: the function to call.
+        :param arguments: arguments to pass to function.
+        :return: the Reply of the call.
+        """
+        reply = Reply()
+        self.tasks.put((function, arguments, reply))
+        self.waker.wake()
+        return reply
+
+    def run_tasks(self):
+        """
+        Run the functions other threads handed to the loop.
+
+        :return: nothing.
+        """
+        while True:
+            try:
+                function, arguments, reply = self.tasks.get_nowait()
+            except Empty:
+                return
+            try:
+                reply.result = function(*arguments)
+            except Exception:
+                reply.error = sys.exc_info()
+            reply.done.set()
+
+    # games, used by the computer player from its own thread like a GameExecutor
+
+    def edit(self, game_id, command):
+        """
+        Change a game on the loop's thread and wait for it; see GameExecutor.edit.
+
+        :param game_id: the id of the game.
+        :param command: a function taking the game, or None if it does not exist.
+        :return: what command returned.
+        """
+        return self.call(self.run_edit, game_id, command).get()
+
+    def read(self, game_id, query):
+        """
+        Look at a game on the loop's thread and wait for the answer; see GameExecutor.read.
+
+        :param game_id: the id of the game.
+        :param query: a function taking the game, or None if it does not exist.
+        :return: what query returned.
+        """
+        return self.call(lambda: query(self.store.load(game_id))).get()
+
+    def run_edit(self, game_id, command):
+        """
+        Change a game and answer the polls waiting on it; only called on the loop's thread.
+
+        :param game_id: the id of the game.
+        :param command: a function taking the game, or None.
+        :return: what command returned.
+        """
+        with self.store.edit(game_id) as game:
+            result = command(game)
+        self.wake(game_id)
+        return result
+
+    # long polls and WebSockets
+
+    def park(self, connection, game_id, last_state):
+        """
+        Hold a long poll until its game changes or it times out.
+
+        :param connection: the connection whose request is the poll.
+        :param game_id: the id of the game.
+        :param last_state: the last state seen by the client.
+        :return: nothing.
+        """
+        deadline = time() + self.poll_timeout
+        connection.parked = (game_id, last_state, deadline)
+        self.waiting.setdefault(game_id, set()).add(connection)
+        heappush(self.deadlines, (deadline, connection))
+
+    def forget(self, connection):
+        """
+        Stop holding a connection's long poll, if any, and stop sending it new states over its WebSocket, if any.
+
+        :param connection: the connection.
+        :return: nothing.
+        """
+        for game_id, connections in ((connection.parked and connection.parked[0], self.waiting),
+                                     (connection.channel and connection.channel[0], self.subscribers)):
+            if game_id in connections:
+                connections[game_id].discard(connection)
+                if not connections[game_id]:
+                    del connections[game_id]
+        connection.parked = None
+
+    def wake(self, game_id):
+        """
+        Send the changes of a game to every poll and WebSocket following it whose client has not seen its current state.
+
+        Clients at the same state get the same changes, which are only worked out once. Polls are answered and
+        WebSockets stay open for the next change, unless the game is gone.
+        :param game_id: the id of the game.
+        :return: nothing.
+        """
+        polls = self.waiting.get(game_id, ())
+        sockets = self.subscribers.get(game_id, ())
+        if not polls and not sockets:
+            return
+        state_ID = self.store.state_ID(game_id)
+        game = None
+        deltas = {}  # key: last_state -> item: the changes for clients at that state
+        for connection in list(polls) + list(sockets):
+            last_state = connection.last_state if connection.channel else connection.parked[1]
+            if state_ID is not None and state_ID <= last_state:
+                continue
+            if last_state not in deltas:
+                if state_ID is None:
+                    deltas[last_state] = format_response(STATUS_ERROR, ERROR_GAME_DNE)
+                else:
+                    if game is None:
+                        game = self.store.load(game_id)
+                    deltas[last_state] = game.state_since(last_state)
+            if not connection.channel:
+                self.forget(connection)
+                connection.respond('200 OK', deltas[last_state])
+            elif state_ID is None:
+                connection.send_frame(TEXT_FRAME, deltas[last_state])
+                connection.close_channel(CLOSE_NORMAL)
+            else:
+                connection.send_frame(TEXT_FRAME, deltas[last_state])
+                connection.last_state = state_ID
+
+    def check_parked(self):
+        """
+        Answer timed out polls. Changes need no looking for, since they are all made on the loop, which wakes their game.
+
+        :return: nothing.
+        """
+        now = time()
+        self.next_check = now + CHECK_INTERVAL
+        while self.deadlines and self.deadlines[0][0] <= now:
+            deadline, connection = heappop(self.deadlines)
+            if connection.parked is not None and connection.parked[2] == deadline:
+                self.forget(connection)
+                connection.respond('200 OK', dumps({'changed': False}))
+
+    # requests
+
+    def handle(self, connection, head):
+        """
+        Answer a request, or park it.
+
+        :param connection: the connection the request came on.
+        :param head: the request line and headers.
+        :return: nothing.
+        """
+        try:
+            request = Request(head, self.secret)
+        except ValueError:
+            connection.respond('400 Bad Request', 'bad request', 'text/plain')
+            return
+        connection.request = request
+        if request.method != 'GET':
+            connection.respond('405 Method Not Allowed', 'only GET is supported', 'text/plain', [('Allow', 'GET')])
+            return
+        for pattern, name in ROUTES:
+            match = pattern.match(request.path)
+            if match is not None:
+                arguments = [int(group) if group.isdigit() else group for group in match.groups()]
+                try:
+                    getattr(self, 'route_' + name)(connection, request, *arguments)
+                except Exception:
+                    traceback.print_exc()
+                    if connection.request is request:
+                        connection.respond('500 Internal Server Error', 'internal server error', 'text/plain')
+                return
+        self.respond_page(connection, '404 Not Found', ERROR_404_TEMPLATE)
+
+    def respond_json(self, connection, body):
+        connection.respond('200 OK', body)
+
+    def redirect(self, connection, location):
+        connection.respond('302 Found', '', 'text/plain', [('Location', location)])
+
+    def respond_page(self, connection, status, template, **context):
+        """
+        Render a template and send it.
+
+        :param connection: the connection to answer.
+        :param status: the status line after the version.
+        :param template: file name of the template.
+        :param context: variables of the template.
+        :return: nothing.
+        """
+        if self.templates is None:
+            connection.respond('501 Not Implemented', 'pages need Jinja2, which is not installed', 'text/plain')
+            return
+        connection.respond(status, self.templates.get_template(template).render(**context), CONTENT_TYPES['.html'])
+
+    def route_root(self, connection, request):
+        game_ids = self.store.game_ids()
+        self.respond_page(connection, '200 OK', ROOT_TEMPLATE, ajax_file='/static/' + AJAX_FILE,
+                          num_games=len(game_ids), games=game_ids)
+
+    def route_create_game(self, connection, request):
+        game_id = self.store.create(make_game())
+        request.set_color(game_id, BLACK)
+        self.redirect(connection, '/game/%d' % game_id)
+
+    def route_create_ai_game(self, connection, request):
+        game_id = self.store.create(make_game())
+        request.set_color(game_id, BLACK)
+        self.ai_players[game_id] = WHITE
+        self.start_ai_turn(game_id)
+        self.redirect(connection, '/game/%d' % game_id)
+
+    def route_join_game(self, connection, request, game_id, color):
+        if game_id not in self.store or color not in ('white', 'black'):
+            self.redirect(connection, '/')
+            return
+        request.set_color(game_id, WHITE if color == 'white' else BLACK)
+        self.redirect(connection, '/game/%d' % game_id)
+
+    def route_delete_game(self, connection, request, game_id):
+        existed = self.store.delete(game_id)
+        self.wake(game_id)
+        self.respond_json(connection, format_response(STATUS_SUCCESS, SUCCESS_DEFAULT if existed else SUCCESS_GAME_DNE))
+
+    def route_delete_all_games(self, connection, request):
+        self.store.clear()
+        for game_id in set(self.waiting) | set(self.subscribers):
+            self.wake(game_id)
+        self.respond_json(connection, format_response(STATUS_SUCCESS, SUCCESS_DEFAULT))
+
+    def route_game(self, connection, request, game_id):
+        color = request.color(game_id)
+        if game_id not in self.store or color is None:
+            self.redirect(connection, '/')
+            return
+        self.respond_page(connection, '200 OK', GAME_TEMPLATE, game_id=game_id, drawing_file='/static/' + DRAWING_FILE,
+                          ajax_file='/static/' + AJAX_FILE, state='/state/game/%d' % game_id,
+                          changed='/changed/game/%d/' % game_id, poll='/poll/game/%d/' % game_id,
+                          end_turn='/update/game/%d/end/turn' % game_id, socket='/socket/game/%d/' % game_id,
+                          player_color=color)
+
+    def route_move(self, connection, request, game_id, unit_id, x, y):
+        self.respond_json(connection, self.run_edit(game_id, lambda game: self.perform(game, game and game.move,
+                                                                                         unit_id, x, y)))
+        self.start_ai_turn(game_id)
+
+    def route_deploy(self, connection, request, game_id, color, unit_type, x, y):
+        if game_id not in self.store:
+            self.respond_json(connection, format_response(STATUS_ERROR, ERROR_GAME_DNE))
+            return
+        if color != request.color(game_id):
+            self.respond_json(connection, format_response(STATUS_ERROR, ERROR_MASQUERADE))
+            return
+        self.respond_json(connection, self.run_edit(game_id, lambda game: self.perform(game, game and game.deploy,
+                                                                                         unit_type, color, x, y)))
+        self.start_ai_turn(game_id)
+
+    def route_end_turn(self, connection, request, game_id):
+        self.respond_json(connection, self.run_edit(game_id, lambda game: self.perform(game,
+                                                                                         game and game.next_turn)))
+        self.start_ai_turn(game_id)
+
+    def perform(self, game, method, *arguments):
+        """
+        Call a method of a game and describe the outcome, as the update routes of application.py do.
+
+        :param game: the game, or None if it does not exist.
+        :param method: a bound method of game, or None.
+        :param arguments: arguments to pass to method.
+        :return: a JSON response.
+        """
+        if game is None:
+            return format_response(STATUS_ERROR, ERROR_GAME_DNE)
+        method(*arguments)
+        return format_response(STATUS_SUCCESS, SUCCESS_DEFAULT)
+
+    def route_changed(self, connection, request, game_id, last_state):
+        state_ID = self.store.state_ID(game_id)
+        if state_ID is None:
+            self.respond_json(connection, format_response(STATUS_ERROR, ERROR_GAME_DNE))
+            return
+        self.respond_json(connection, dumps({'changed': state_ID > last_state}))
+
+    def route_state(self, connection, request, game_id):
+        game = self.store.load(game_id)
+        self.respond_json(connection, format_response(STATUS_ERROR, ERROR_GAME_DNE) if game is None else game.state())
+
+    def route_poll(self, connection, request, game_id, last_state):
+        state_ID = self.store.state_ID(game_id)
+        if state_ID is None:
+            self.respond_json(connection, format_response(STATUS_ERROR, ERROR_GAME_DNE))
+        elif state_ID > last_state:
+            self.respond_json(connection, self.store.load(game_id).state_since(last_state))
+        else:
+            self.park(connection, game_id, last_state)
+
+    def route_delta(self, connection, request, game_id, last_state):
+        game = self.store.load(game_id)
+        self.respond_json(connection, format_response(STATUS_ERROR, ERROR_GAME_DNE) if game is None
+                          else game.state_since(last_state))
+
+    def route_socket(self, connection, request, game_id, last_state):
+        """
+        Open a WebSocket following a game, which is sent the changes since last_state and then every later change.
+
+        Actions come back over it as JSON arrays of a sequence number and an action tuple, eg: [7, "move", 3, 4, 5],
+        taken as the color of the session. Each is acknowledged with {"ack": 7, "status": ..., "message": ...}, before
+        the changes it made are sent to every WebSocket and poll following the game.
+        :param connection: the connection asking for the WebSocket.
+        :param request: the handshake request.
+        :param game_id: the id of the game.
+        :param last_state: the last state seen by the client.
+        :return: nothing.
+        """
+        headers = request.headers
+        if headers.get('upgrade', '').lower() != 'websocket' or 'sec-websocket-key' not in headers:
+            connection.respond('400 Bad Request', 'expected a WebSocket handshake', 'text/plain')
+            return
+        if headers.get('sec-websocket-version') != WEBSOCKET_VERSION:
+            connection.respond('426 Upgrade Required', 'unsupported WebSocket version', 'text/plain',
+                               [('Sec-WebSocket-Version', WEBSOCKET_VERSION)])
+            return
+        # browsers send cookies with WebSockets opened by any site, so only the game's own pages may open them
+        origin = headers.get('origin')
+        if origin is not None and origin.split('://', 1)[-1] != headers.get('host'):
+            connection.respond('403 Forbidden', 'WebSockets must be opened from the game page', 'text/plain')
+            return
+        if game_id not in self.store:
+            self.respond_json(connection, format_response(STATUS_ERROR, ERROR_GAME_DNE))
+            return
+        accept = base64.b64encode(sha1(headers['sec-websocket-key'] + WEBSOCKET_GUID).digest())
+        connection.upgrade(accept, game_id, request.color(game_id), last_state)
+        self.subscribers.setdefault(game_id, set()).add(connection)
+        self.wake(game_id)
+
+    def handle_message(self, connection, message):
+        """
+        Take an action sent over a WebSocket, acknowledge it, and send its changes to everyone following the game.
+
+        :param connection: the WebSocket connection.
+        :param message: the message, as described in Server.route_socket.
+        :return: nothing.
+        """
+        game_id, color = connection.channel
+        sequence = None
+        try:
+            message = loads(message)
+            sequence = message[0]
+            action = (str(message[1]),) + tuple(message[2:])
+            valid = ACTION_LENGTHS.get(action[0]) == len(action) and all(type(argument) is int
+                                                                         for argument in action[1:])
+        except (ValueError, TypeError, IndexError, KeyError, UnicodeError):
+            valid = False
+        if not valid:
+            connection.send_frame(TEXT_FRAME, dumps({'ack': sequence, 'status': STATUS_ERROR,
+                                                     'message': ERROR_BAD_MESSAGE}))
+            return
+        def perform(game):
+            if game is None:
+                return STATUS_ERROR, ERROR_GAME_DNE
+            if color != game.active_color:
+                return STATUS_ERROR, ERROR_MASQUERADE
+            if not game.perform(action):
+                return STATUS_ERROR, ERROR_ILLEGAL_ACTION
+            return STATUS_SUCCESS, SUCCESS_DEFAULT
+        try:
+            with self.store.edit(game_id) as game:
+                status, reply = perform(game)
+        except Exception:
+            traceback.print_exc()
+            status, reply = STATUS_ERROR, ERROR_INTERNAL
+        connection.send_frame(TEXT_FRAME, dumps({'ack': sequence, 'status': status, 'message': reply}))
+        self.wake(game_id)
+        self.start_ai_turn(game_id)
+
+    def route_static(self, connection, request, file_name):
+        path = os.path.join(STATIC_DIRECTORY, file_name)
+        if not os.path.isfile(path):
+            self.respond_page(connection, '404 Not Found', ERROR_404_TEMPLATE)
+            return
+        with open(path, 'rb') as static_file:
+            body = static_file.read()
+        connection.respond('200 OK', body, CONTENT_TYPES.get(os.path.splitext(file_name)[1], 'text/plain'))
+
+    # the computer player
+
+    def start_ai_turn(self, game_id):
+        """
+        Let the computer take its turn in a game, in a thread of its own, if the game is against the computer.
+
+        Nothing happens if the computer is already taking its turn, or if it is not the computer's turn.
+        :param game_id: the id of the game.
+        :return: nothing.
+        """
+        if game_id not in self.ai_players or game_id in self.ai_running:
+            return
+        game = self.store.load(game_id)
+        if game is None or game.active_color != self.ai_players[game_id]:
+            return
+        self.ai_running.add(game_id)
+        thread = Thread(target=self.run_ai_turn, args=(game_id, self.ai_players[game_id]))
+        thread.daemon = True
+        thread.start()
+
+    def run_ai_turn(self, game_id, color):
+        """
+        Play the computer's turn in a game; the body of the threads started by Server.start_ai_turn.
+
+        :param game_id: the id of the game.
+        :param color: the color the computer plays.
+        :return: nothing.
+        """
+        try:
+            play_turn(self, game_id, color, Searcher(time_limit=AI_TIME_LIMIT))
+        finally:
+            self.call(self.finish_ai_turn, game_id)
+
+    def finish_ai_turn(self, game_id):
+        """
+        Note that the computer has finished its turn, and start the next if the player has already ended theirs.
+
+        :param game_id: the id of the game.
+        :return: nothing.
+        """
+        self.ai_running.discard(game_id)
+        self.start_ai_turn(game_id)
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Serve WarpWars from a single asynchronous thread.')
+    parser.add_argument('--host', default=DEFAULT_HOST, help='address to listen on')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='port to listen on')
+    parser.add_argument('--poll-timeout', type=float, default=POLL_TIMEOUT, help='seconds long polls are held')
+    arguments = parser.parse_args(argv)
+    if os.environ.get('WARPWARS_DATABASE'):
+        # every query would run on the loop's thread, see the module docstring
+        parser.error('games are kept in memory only, unset WARPWARS_DATABASE or serve them with application.py')
+    store = MemoryGameStore()
+    # without WARPWARS_SECRET_KEY a random key is used, so sessions do not survive a restart
+    server = Server(store, arguments.host, arguments.port, os.environ.get('WARPWARS_SECRET_KEY'),
+                    arguments.poll_timeout)
+    print 'serving on http://%s:%d/' % (arguments.host, server.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
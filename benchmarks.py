@@ -0,0 +1,268 @@
+"""
+Rough timings for the hot paths of the game engine.
+
+Run with `python benchmarks.py`. Numbers are wall clock seconds and are only meaningful relative to each other.
+"""
+
+import gc
+import os
+import subprocess
+import sys
+import time
+import types
+from json import dumps
+
+import card_dictionary
+import move_tables
+import snapshot
+from bitboard import Bitboard
+from game import Game
+from graph import Graph
+from setups import graph_destinations, make_game, random_game
+
+# objects that belong to the program rather than to any one game, never counted by deep_size
+UNCOUNTED_TYPES = (type, types.ClassType, types.ModuleType, types.FunctionType, types.BuiltinFunctionType)
+
+def timed(function, repeat=5):
+    """
+    Return the best wall clock time of several calls to function.
+
+    :param function: a callable taking no arguments.
+    :param repeat: how many times to call it.
+    :return: the fastest time observed, in seconds.
+    """
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        function()
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+def reachable_objects(root, skip=frozenset()):
+    """
+    Return every object reachable from root through references, leaving out classes, modules and functions.
+
+    :param root: the object to start from.
+    :param skip: ids of objects to leave out, along with everything reachable only through them.
+    :return: a dictionary mapping the id of each object to the object.
+    """
+    seen = {}
+    stack = [root]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or id(obj) in skip or isinstance(obj, UNCOUNTED_TYPES):
+            continue
+        seen[id(obj)] = obj
+        stack.extend(gc.get_referents(obj))
+    return seen
+
+def deep_size(root, skip=frozenset()):
+    """
+    Return the memory used by an object and everything it references.
+
+    :param root: the object to measure.
+    :param skip: ids of objects not to count, see reachable_objects.
+    :return: a size in bytes.
+    """
+    return sum(sys.getsizeof(obj) for obj in reachable_objects(root, skip).values())
+
+def linear_find_node_by_position(graph, x, y):
+    # the original lookup, which scans every node in the graph
+    for node in graph.mapping:
+        if node.x == x and node.y == y:
+            return node
+
+def scanning_find_edge(graph, node1, node2):
+    # the original lookup, which scans every edge of node1
+    for edge in graph.mapping[node1].itervalues():
+        if node2 in edge.nodes:
+            return edge
+
+def scanning_neighbourhood(graph, node):
+    # the original neighbourhood, which builds a set from the nodes of every edge
+    neighbours = set([node])
+    for edge in graph.mapping[node].itervalues():
+        neighbours.update(edge.nodes)
+    return neighbours
+
+def scanning_are_neighbours(graph, node1, node2):
+    # the original test, which builds the whole neighbourhood of node2
+    return node1 in scanning_neighbourhood(graph, node2)
+
+def benchmark_graph(n_star=400):
+    """
+    Time the Graph API with neighbours looked up in each node's dictionary against the original scans of its edges.
+
+    :param n_star: number of nodes connected to the centre of the star graph.
+    :return: nothing.
+    """
+    queen = card_dictionary.build_queen().moves
+    nodes = sorted(queen.mapping, key=lambda node: node.ID)
+    pairs = [(node, other_node) for node in nodes for other_node in nodes[::7]]
+    def star():
+        graph = Graph()
+        for x in range(n_star + 1):
+            graph.add_new_node(x, 0)
+        graph.connect_all_to(graph.find_node_by_position(0, 0))
+    operations = [
+        ('build queen', card_dictionary.build_queen),
+        ('star of %d' % n_star, star),
+        ('copy queen', queen.copy),
+        ('find_edge', lambda: [queen.find_edge(node, other_node) for node, other_node in pairs]),
+        ('are_neighbours', lambda: [queen.are_neighbours(node, other_node) for node, other_node in pairs]),
+        ('neighbourhood', lambda: [queen.neighbourhood(node) for node in nodes]),
+    ]
+    indexed = [timed(function) for name, function in operations]
+    methods = (Graph.find_edge, Graph.neighbourhood, Graph.are_neighbours)
+    Graph.find_edge = scanning_find_edge
+    Graph.neighbourhood = scanning_neighbourhood
+    Graph.are_neighbours = scanning_are_neighbours
+    try:
+        scanned = [timed(function) for name, function in operations]
+    finally:
+        Graph.find_edge, Graph.neighbourhood, Graph.are_neighbours = methods
+    for (name, function), indexed_time, scanned_time in zip(operations, indexed, scanned):
+        print 'graph %s: %.6fs looked up, %.6fs scanned (%.1fx)' % (name, indexed_time, scanned_time,
+                                                                     scanned_time/indexed_time)
+    def block(graph):
+        for x, y in ((0, 1), (1, 1), (-1, 0), (0, -1)):
+            graph.block_position(x, y)
+    copied = timed(lambda: block(queen.copy()))
+    cloned = timed(lambda: block(queen.clone()))
+    print 'graph copy queen and block 4 nodes: %.6fs copied, %.6fs cloned (%.1fx)' % (copied, cloned, copied/cloned)
+
+def benchmark_card_dictionary():
+    """
+    Compare building every template of CARD_DICTIONARY with the position index against the original linear scan.
+
+    :return: nothing.
+    """
+    build = lambda: reload(card_dictionary).CARD_DICTIONARY.values()
+    indexed = timed(build)
+    find_node_by_position = Graph.find_node_by_position
+    Graph.find_node_by_position = linear_find_node_by_position
+    try:
+        scanned = timed(build)
+    finally:
+        Graph.find_node_by_position = find_node_by_position
+        reload(card_dictionary)
+    print 'card_dictionary build: %.4fs indexed, %.4fs scanned (%.1fx)' % (indexed, scanned, scanned/indexed)
+
+def benchmark_import(modules=('game', 'setups', 'application')):
+    """
+    Time importing modules in a fresh interpreter, as a worker process starts, and creating the standard game.
+
+    :param modules: names of the modules to import.
+    :return: nothing.
+    """
+    script = ('import time\n'
+              'start = time.time()\n'
+              'try:\n'
+              '    import %s\n'
+              'except ImportError:\n'
+              '    print -1, -1\n'
+              'else:\n'
+              '    imported = time.time()\n'
+              '    import setups\n'
+              '    setups.make_game()\n'
+              '    print imported - start, time.time() - imported\n')
+    for module in modules:
+        times = []
+        for i in range(5):
+            output = subprocess.check_output([sys.executable, '-c', script % module], cwd=os.path.dirname(__file__) or '.')
+            times.append([float(seconds) for seconds in output.split()])
+        imported, game = min(times)
+        if imported < 0:
+            print 'import %s: cannot be imported here' % module
+        else:
+            print 'import %s: %.4fs, then %.4fs to make the standard game' % (module, imported, game)
+
+def benchmark_place(n_moves=200):
+    """
+    Time moving a unit mid-game, and finding the legal moves of every unit afterwards.
+
+    :param n_moves: number of moves to time.
+    :return: nothing.
+    """
+    game = make_game()
+    rook = game.get_unit_by_position(3, 0)
+    squares = [(3, 1), (3, 0)]
+    game.take(3, 1)
+    def move():
+        for i in range(n_moves):
+            x, y = squares[i % 2]
+            game.place(rook, x, y)
+    def search():
+        game.update_movements()
+        for unit_ID in game.units:
+            game.find_destinations(game.units[unit_ID])
+    place = timed(move) / n_moves
+    destinations = timed(search)
+    print 'place: %.6fs per move, legal moves of every unit: %.6fs' % (place, destinations)
+
+def benchmark_snapshot(n_games=100):
+    """
+    Compare the size and speed of binary snapshots against the json state.
+
+    :param n_games: number of times to encode and decode the game.
+    :return: nothing.
+    """
+    game = make_game()
+    data = snapshot.dump(game)
+    json = dumps(game.generate_dict())
+    dump = timed(lambda: [snapshot.dump(game) for i in range(n_games)]) / n_games
+    load = timed(lambda: [snapshot.load(data) for i in range(n_games)]) / n_games
+    generate = timed(lambda: [dumps(game.generate_dict()) for i in range(n_games)]) / n_games
+    print 'snapshot: %d bytes, %.6fs dump, %.6fs load; json: %d bytes, %.6fs' % (len(data), dump, load, len(json),
+                                                                                generate)
+
+def benchmark_move_tables(n_positions=20):
+    """
+    Compare finding the legal moves of every unit by searching the movement graphs, walking the move tables and with
+    the bitboard, and time loading the move tables.
+
+    :param n_positions: number of random positions to time, besides the standard setup.
+    :return: nothing.
+    """
+    build = timed(move_tables.build_tables, repeat=1)
+    load = timed(move_tables.load_tables)
+    print 'move tables: %.6fs to work out, %.6fs to load from the cache' % (build, load)
+    games = [make_game()] + [random_game(seed, n_units=30, n_obstructions=5) for seed in range(n_positions)]
+    def search(find_destinations):
+        for game in games:
+            game.update_movements()
+            for unit_ID in game.units:
+                find_destinations(game, game.units[unit_ID])
+    graph = timed(lambda: search(graph_destinations))
+    tables = timed(lambda: search(Game.find_destinations))
+    for game in games:
+        game.bitboard = Bitboard()
+    search(Game.find_destinations)  # build the move masks before timing
+    bitboard = timed(lambda: search(Game.find_destinations))
+    print 'legal moves of every unit in %d positions: %.6fs graph, %.6fs tables (%.1fx), %.6fs bitboard (%.1fx)' % (
+        len(games), graph, tables, graph/tables, bitboard, graph/bitboard)
+
+def benchmark_memory():
+    """
+    Measure the memory used by one game, apart from the movement graphs every game shares.
+
+    :return: nothing.
+    """
+    templates = [card_dictionary.CARD_DICTIONARY, card_dictionary.FLIPPED_MOVES]
+    card_dictionary.CARD_DICTIONARY.values()  # build every template, so that none is counted as part of a game
+    shared = reachable_objects(templates)
+    graphs = deep_size(templates)
+    for name, game in (('standard game', make_game()), ('random game', random_game(0, n_units=40))):
+        print '%s with %d units: %d bytes, plus %d bytes of shared movement graphs' % (name, len(game.units),
+                                                                                      deep_size(game, shared), graphs)
+
+if __name__ == '__main__':
+    benchmark_card_dictionary()
+    benchmark_import()
+    benchmark_graph()
+    benchmark_place()
+    benchmark_move_tables()
+    benchmark_snapshot()
+    benchmark_memory()
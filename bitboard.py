@@ -0,0 +1,184 @@
+"""
+An optional bitboard representation of the board, for fast move generation.
+
+Every square of the board is one bit of an integer: square (x, y) is bit x*BOARD_HEIGHT + y. A Bitboard holds one mask
+per color and one for obstructions. For each unit type and square, MoveMasks turns the move tables into masks, so legal
+moves can be resolved against the occupancy with a few bit operations.
+"""
+
+from constants import *
+from move_tables import get_square_moves
+
+# key: (unit_type, flipped) -> item: list of MoveMasks indexed by square, built on first use
+MOVE_MASKS = {}
+
+def square(x, y):
+    """
+    Return the index of the bit representing a position.
+
+    :param x: x coordinate.
+    :param y: y coordinate.
+    :return: an int.
+    """
+    return x*BOARD_HEIGHT + y
+
+def positions(mask):
+    """
+    Return the positions of every bit set in a mask.
+
+    :param mask: an int.
+    :return: a set of (x, y) tuples.
+    """
+    result = set()
+    while mask:
+        low = mask & -mask
+        result.add(divmod(low.bit_length() - 1, BOARD_HEIGHT))
+        mask ^= low
+    return result
+
+class MoveMasks:
+    """
+    The squares a unit of some type can reach from one square of the board, before looking at the board.
+
+    Destinations fall into three groups. The steps mask holds squares that can never be blocked. Each ray is a list of
+    squares that can only be reached by passing through the earlier squares of the ray, so a unit moves along it up to
+    and including the first occupied square. Every other destination is guarded by a list of masks, and can be reached
+    when any one of them is empty.
+    """
+
+    def __init__(self, moves):
+        """
+        Build the masks from the moves of a unit on a square.
+
+        :param moves: a SquareMoves tuple from the move tables.
+        :return: an initialized MoveMasks object
+        """
+        self.steps = 0  # mask of destinations that can never be blocked
+        self.rays = []  # list of (mask, ordered list of bits, direction); direction is 1 or -1 if bits are monotonic
+        self.guarded = []  # list of (bit, list of masks) for destinations reached some other way
+        for x, y in moves.steps:
+            self.steps |= 1 << square(x, y)
+        for ray in moves.rays:
+            chain = [square(x, y) for x, y in ray]
+            if chain == sorted(chain):
+                direction = 1
+            elif chain == sorted(chain, reverse=True):
+                direction = -1
+            else:
+                direction = 0
+            self.rays.append((sum(1 << ray_square for ray_square in chain), [1 << ray_square for ray_square in chain],
+                              direction))
+        for (x, y), guards in moves.guarded:
+            masks = [sum(1 << square(guard_x, guard_y) for guard_x, guard_y in guard) for guard in guards]
+            self.guarded.append((1 << square(x, y), masks))
+
+    def destinations(self, occupied):
+        """
+        Return the squares reachable given the occupied squares, including occupied ones a unit could take.
+
+        :param occupied: mask of every occupied square.
+        :return: a mask of destination squares.
+        """
+        result = self.steps
+        for mask, bits, direction in self.rays:
+            blockers = mask & occupied
+            if not blockers:
+                result |= mask
+            elif direction == 1:
+                first = blockers & -blockers
+                result |= mask & ((first << 1) - 1)
+            elif direction == -1:
+                first = 1 << (blockers.bit_length() - 1)
+                result |= mask & ~(first - 1)
+            else:
+                for bit in bits:
+                    result |= bit
+                    if bit & occupied:
+                        break
+        for bit, masks in self.guarded:
+            for mask in masks:
+                if not mask & occupied:
+                    result |= bit
+                    break
+        return result
+
+def get_move_masks(unit_type, flipped, x, y):
+    """
+    Return the MoveMasks of a unit type on a square, building the masks of the unit type on first use.
+
+    :param unit_type: number specifying the type of the unit, eg: WARPLING_TYPE.
+    :param flipped: True if the unit belongs to a flipped player.
+    :param x: x coordinate of the unit.
+    :param y: y coordinate of the unit.
+    :return: a MoveMasks object.
+    """
+    key = (unit_type, flipped)
+    if key not in MOVE_MASKS:
+        MOVE_MASKS[key] = [MoveMasks(get_square_moves(unit_type, flipped, mask_x, mask_y))
+                           for mask_x in range(BOARD_LENGTH) for mask_y in range(BOARD_HEIGHT)]
+    return MOVE_MASKS[key][square(x, y)]
+
+class Bitboard:
+    """
+    The occupancy of the board as bit masks.
+    """
+
+    def __init__(self):
+        """
+        Create an empty bitboard.
+
+        :return: an initialized Bitboard object
+        """
+        self.colors = [0, 0]  # mask of the squares occupied by each color, indexed by WHITE and BLACK
+        self.obstructions = 0  # mask of the squares holding an obstruction
+
+    def load(self, board):
+        """
+        Set every square from a list of lists board.
+
+        :param board: a 2d array of board elements, as in Game.board.
+        :return: nothing.
+        """
+        self.colors = [0, 0]
+        self.obstructions = 0
+        for x in range(BOARD_LENGTH):
+            for y in range(BOARD_HEIGHT):
+                self.set_tile(x, y, board[x][y])
+
+    def set_tile(self, x, y, tile):
+        """
+        Set the contents of a square.
+
+        :param x: x coordinate.
+        :param y: y coordinate.
+        :param tile: EMPTY_TILE, WHITE_TILE, BLACK_TILE or OBSTRUCTION.
+        :return: nothing.
+        """
+        bit = 1 << square(x, y)
+        self.colors[WHITE] &= ~bit
+        self.colors[BLACK] &= ~bit
+        self.obstructions &= ~bit
+        if tile == OBSTRUCTION:
+            self.obstructions |= bit
+        elif tile != EMPTY_TILE:
+            self.colors[tile] |= bit
+
+    def occupied(self):
+        """
+        Return the mask of every square that is not empty.
+
+        :return: an int.
+        """
+        return self.colors[WHITE] | self.colors[BLACK] | self.obstructions
+
+    def destinations(self, unit, flipped):
+        """
+        Return the positions a unit can move to, regardless of whose turn it is.
+
+        :param unit: the unit to move.
+        :param flipped: True if the unit belongs to a flipped player.
+        :return: a set of (x, y) tuples.
+        """
+        masks = get_move_masks(unit.type, flipped, unit.x, unit.y)
+        reachable = masks.destinations(self.occupied())
+        return positions(reachable & ~(self.colors[unit.color] | self.obstructions))
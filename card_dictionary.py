@@ -1,174 +1,338 @@
+from UserDict import DictMixin
+
 from unit import Unit
 from constants import *
 from graph import Graph
 
-warpling = Unit()
-warpling.type = WARPLING_TYPE
-warpling.name = "Warpling"
-warpling.cost = 0
-warpling.moves = Graph()
-warpling.moves.add_new_node(0, 0)
-warpling.moves.add_new_node(0, 1)
-warpling.moves.connect_adjacent_nodes()
-
-knight = Unit()
-knight.type = KNIGHT_TYPE
-knight.name = "Knight"
-knight.cost = 3
-knight.moves = Graph()
-knight.moves.add_new_node(0, 0)
-knight.moves.add_new_node(1, 2)
-knight.moves.add_new_node(-1, 2)
-knight.moves.add_new_node(2, 1)
-knight.moves.add_new_node(2, -1)
-knight.moves.add_new_node(1, -2)
-knight.moves.add_new_node(-1, -2)
-knight.moves.add_new_node(-2, -1)
-knight.moves.add_new_node(-2, 1)
-knight.moves.connect_all_to(knight.moves.find_node_by_position(0, 0))
-
-bishop = Unit()
-bishop.type = BISHOP_TYPE
-bishop.name = "Bishop"
-bishop.cost = 3
-bishop.moves = Graph()
-for x in range(-BOARD_LENGTH, BOARD_LENGTH + 1):
-    for y in range(-BOARD_HEIGHT, BOARD_HEIGHT + 1):
-        if x == y or x == -y:
-            bishop.moves.add_new_node(x, y)
-bishop.moves.connect_diagonal_nodes()
-
-rook = Unit()
-rook.type = ROOK_TYPE
-rook.name = "Rook"
-rook.cost = 5
-rook.moves = Graph()
-for x in range(-BOARD_LENGTH, BOARD_LENGTH + 1):
-    for y in range(-BOARD_HEIGHT, BOARD_HEIGHT + 1):
-        if x == 0 or y == 0:
-            rook.moves.add_new_node(x, y)
-rook.moves.connect_adjacent_nodes()
-
-queen = Unit()
-queen.type = QUEEN_TYPE
-queen.name = "Queen"
-queen.cost = 0
-queen.moves = Graph()
-for x in range(-BOARD_LENGTH, BOARD_LENGTH + 1):
-    for y in range(-BOARD_HEIGHT, BOARD_HEIGHT + 1):
-        if x == y or x == -y:
-            queen.moves.add_new_node(x, y)
-queen.moves.connect_diagonal_nodes()
-for x in range(-BOARD_LENGTH, BOARD_LENGTH + 1):
-    for y in range(-BOARD_HEIGHT, BOARD_HEIGHT + 1):
-        if x == 0 or y == 0 and x != y:
-            queen.moves.add_new_node(x, y)
-queen.moves.connect_adjacent_nodes()
-
-king = Unit()
-king.type = KING_TYPE
-king.name = "King"
-king.cost = 0
-king.moves = Graph()
-for x in range(-1, 2):
-    for y in range(-1, 2):
-        king.moves.add_new_node(x, y)
-king.moves.connect_adjacent_nodes()
-king.moves.connect_diagonal_nodes()
-king.abilities = ['barrier']
-
-gold_general = Unit()
-gold_general.type = GOLD_GENERAL_TYPE
-gold_general.name = "Gold General"
-gold_general.cost = 4
-gold_general.moves = Graph()
-for x in range(-1, 2):
-    for y in range(0, 2):
-        gold_general.moves.add_new_node(x, y)
-gold_general.moves.add_new_node(0, -1)
-gold_general.moves.connect_adjacent_nodes()
-
-silver_general = Unit()
-silver_general.type = SILVER_GENERAL_TYPE
-silver_general.name = "Silver General"
-silver_general.cost = 2
-silver_general.moves = Graph()
-for x in range(-1, 2):
-    silver_general.moves.add_new_node(x, 1)
-silver_general.moves.add_new_node(0, 0)
-silver_general.moves.add_new_node(-1, -1)
-silver_general.moves.add_new_node(1, -1)
-silver_general.moves.connect_all_to(silver_general.moves.find_node_by_position(0, 0))
-
-lance = Unit()
-lance.type = LANCE_TYPE
-lance.name = "Lance"
-lance.cost = 2
-lance.moves = Graph()
-for y in range(0, BOARD_HEIGHT + 1):
-    lance.moves.add_new_node(0, y)
-lance.moves.connect_adjacent_nodes()
-
-super_pawn = Unit()
-super_pawn.type = SUPER_PAWN_TYPE
-super_pawn.name = "Super Pawn"
-super_pawn.cost = 1
-super_pawn.moves = Graph()
-super_pawn.moves.add_new_node(0, 0)
-for x in range(-1, 2):
-    super_pawn.moves.add_new_node(x, 1)
-super_pawn.moves.connect_adjacent_nodes()
-
-promoted_rook = Unit()
-promoted_rook.type = PROMOTED_ROOK_TYPE
-promoted_rook.name = "Promoted Rook"
-promoted_rook.cost = 7
-promoted_rook.moves = Graph()
-for x in range(-1, 2):
-    for y in range(-1, 2):
-        if x == y or x == -y:
-            promoted_rook.moves.add_new_node(x, y)
-promoted_rook.moves.connect_diagonal_nodes()
-for x in range(-BOARD_LENGTH, BOARD_LENGTH + 1):
-    for y in range(-BOARD_HEIGHT, BOARD_HEIGHT + 1):
-        if x == 0 or y == 0 and x != y:
-            promoted_rook.moves.add_new_node(x, y)
-promoted_rook.moves.connect_adjacent_nodes()
-
-promoted_bishop = Unit()
-promoted_bishop.type = PROMOTED_BISHOP_TYPE
-promoted_bishop.name = "Promoted Bishop"
-promoted_bishop.cost = 6
-promoted_bishop.moves = Graph()
-for x in range(-BOARD_LENGTH, BOARD_LENGTH + 1):
-    for y in range(-BOARD_HEIGHT, BOARD_HEIGHT + 1):
-        if x == y or x == -y:
-            promoted_bishop.moves.add_new_node(x, y)
-promoted_bishop.moves.connect_diagonal_nodes()
-for x in range(-1, 2):
-    for y in range(-1, 2):
-        if x == 0 or y == 0 and x != y:
-            promoted_bishop.moves.add_new_node(x, y)
-promoted_bishop.moves.connect_adjacent_nodes()
-
-barrier = Unit()
-barrier.type = BARRIER_TYPE
-barrier.name = 'barrier'
-barrier.cost = 0
-barrier.moves = Graph()
-
-CARD_DICTIONARY = {
-    WARPLING_TYPE: warpling,
-    KNIGHT_TYPE: knight,
-    BISHOP_TYPE: bishop,
-    ROOK_TYPE: rook,
-    QUEEN_TYPE: queen,
-    KING_TYPE: king,
-    GOLD_GENERAL_TYPE: gold_general,
-    SILVER_GENERAL_TYPE: silver_general,
-    LANCE_TYPE: lance,
-    SUPER_PAWN_TYPE: super_pawn,
-    PROMOTED_ROOK_TYPE: promoted_rook,
-    PROMOTED_BISHOP_TYPE: promoted_bishop,
-    BARRIER_TYPE: barrier
+def build_warpling():
+    """
+    Build the template of a warpling.
+
+    :return: a Unit.
+    """
+    warpling = Unit()
+    warpling.type = WARPLING_TYPE
+    warpling.name = "Warpling"
+    warpling.cost = 0
+    warpling.moves = Graph()
+    warpling.moves.add_new_node(0, 0)
+    warpling.moves.add_new_node(0, 1)
+    warpling.moves.connect_adjacent_nodes()
+    return warpling
+
+def build_knight():
+    """
+    Build the template of a knight.
+
+    :return: a Unit.
+    """
+    knight = Unit()
+    knight.type = KNIGHT_TYPE
+    knight.name = "Knight"
+    knight.cost = 3
+    knight.moves = Graph()
+    knight.moves.add_new_node(0, 0)
+    knight.moves.add_new_node(1, 2)
+    knight.moves.add_new_node(-1, 2)
+    knight.moves.add_new_node(2, 1)
+    knight.moves.add_new_node(2, -1)
+    knight.moves.add_new_node(1, -2)
+    knight.moves.add_new_node(-1, -2)
+    knight.moves.add_new_node(-2, -1)
+    knight.moves.add_new_node(-2, 1)
+    knight.moves.connect_all_to(knight.moves.find_node_by_position(0, 0))
+    return knight
+
+def build_bishop():
+    """
+    Build the template of a bishop.
+
+    :return: a Unit.
+    """
+    bishop = Unit()
+    bishop.type = BISHOP_TYPE
+    bishop.name = "Bishop"
+    bishop.cost = 3
+    bishop.moves = Graph()
+    for x in range(-BOARD_LENGTH, BOARD_LENGTH + 1):
+        for y in range(-BOARD_HEIGHT, BOARD_HEIGHT + 1):
+            if x == y or x == -y:
+                bishop.moves.add_new_node(x, y)
+    bishop.moves.connect_diagonal_nodes()
+    return bishop
+
+def build_rook():
+    """
+    Build the template of a rook.
+
+    :return: a Unit.
+    """
+    rook = Unit()
+    rook.type = ROOK_TYPE
+    rook.name = "Rook"
+    rook.cost = 5
+    rook.moves = Graph()
+    for x in range(-BOARD_LENGTH, BOARD_LENGTH + 1):
+        for y in range(-BOARD_HEIGHT, BOARD_HEIGHT + 1):
+            if x == 0 or y == 0:
+                rook.moves.add_new_node(x, y)
+    rook.moves.connect_adjacent_nodes()
+    return rook
+
+def build_queen():
+    """
+    Build the template of a queen.
+
+    :return: a Unit.
+    """
+    queen = Unit()
+    queen.type = QUEEN_TYPE
+    queen.name = "Queen"
+    queen.cost = 0
+    queen.moves = Graph()
+    for x in range(-BOARD_LENGTH, BOARD_LENGTH + 1):
+        for y in range(-BOARD_HEIGHT, BOARD_HEIGHT + 1):
+            if x == y or x == -y:
+                queen.moves.add_new_node(x, y)
+    queen.moves.connect_diagonal_nodes()
+    for x in range(-BOARD_LENGTH, BOARD_LENGTH + 1):
+        for y in range(-BOARD_HEIGHT, BOARD_HEIGHT + 1):
+            if x == 0 or y == 0 and x != y:
+                queen.moves.add_new_node(x, y)
+    queen.moves.connect_adjacent_nodes()
+    return queen
+
+def build_king():
+    """
+    Build the template of a king.
+
+    :return: a Unit.
+    """
+    king = Unit()
+    king.type = KING_TYPE
+    king.name = "King"
+    king.cost = 0
+    king.moves = Graph()
+    for x in range(-1, 2):
+        for y in range(-1, 2):
+            king.moves.add_new_node(x, y)
+    king.moves.connect_adjacent_nodes()
+    king.moves.connect_diagonal_nodes()
+    king.abilities = ['barrier']
+    return king
+
+def build_gold_general():
+    """
+    Build the template of a gold general.
+
+    :return: a Unit.
+    """
+    gold_general = Unit()
+    gold_general.type = GOLD_GENERAL_TYPE
+    gold_general.name = "Gold General"
+    gold_general.cost = 4
+    gold_general.moves = Graph()
+    for x in range(-1, 2):
+        for y in range(0, 2):
+            gold_general.moves.add_new_node(x, y)
+    gold_general.moves.add_new_node(0, -1)
+    gold_general.moves.connect_adjacent_nodes()
+    return gold_general
+
+def build_silver_general():
+    """
+    Build the template of a silver general.
+
+    :return: a Unit.
+    """
+    silver_general = Unit()
+    silver_general.type = SILVER_GENERAL_TYPE
+    silver_general.name = "Silver General"
+    silver_general.cost = 2
+    silver_general.moves = Graph()
+    for x in range(-1, 2):
+        silver_general.moves.add_new_node(x, 1)
+    silver_general.moves.add_new_node(0, 0)
+    silver_general.moves.add_new_node(-1, -1)
+    silver_general.moves.add_new_node(1, -1)
+    silver_general.moves.connect_all_to(silver_general.moves.find_node_by_position(0, 0))
+    return silver_general
+
+def build_lance():
+    """
+    Build the template of a lance.
+
+    :return: a Unit.
+    """
+    lance = Unit()
+    lance.type = LANCE_TYPE
+    lance.name = "Lance"
+    lance.cost = 2
+    lance.moves = Graph()
+    for y in range(0, BOARD_HEIGHT + 1):
+        lance.moves.add_new_node(0, y)
+    lance.moves.connect_adjacent_nodes()
+    return lance
+
+def build_super_pawn():
+    """
+    Build the template of a super pawn.
+
+    :return: a Unit.
+    """
+    super_pawn = Unit()
+    super_pawn.type = SUPER_PAWN_TYPE
+    super_pawn.name = "Super Pawn"
+    super_pawn.cost = 1
+    super_pawn.moves = Graph()
+    super_pawn.moves.add_new_node(0, 0)
+    for x in range(-1, 2):
+        super_pawn.moves.add_new_node(x, 1)
+    super_pawn.moves.connect_adjacent_nodes()
+    return super_pawn
+
+def build_promoted_rook():
+    """
+    Build the template of a promoted rook.
+
+    :return: a Unit.
+    """
+    promoted_rook = Unit()
+    promoted_rook.type = PROMOTED_ROOK_TYPE
+    promoted_rook.name = "Promoted Rook"
+    promoted_rook.cost = 7
+    promoted_rook.moves = Graph()
+    for x in range(-1, 2):
+        for y in range(-1, 2):
+            if x == y or x == -y:
+                promoted_rook.moves.add_new_node(x, y)
+    promoted_rook.moves.connect_diagonal_nodes()
+    for x in range(-BOARD_LENGTH, BOARD_LENGTH + 1):
+        for y in range(-BOARD_HEIGHT, BOARD_HEIGHT + 1):
+            if x == 0 or y == 0 and x != y:
+                promoted_rook.moves.add_new_node(x, y)
+    promoted_rook.moves.connect_adjacent_nodes()
+    return promoted_rook
+
+def build_promoted_bishop():
+    """
+    Build the template of a promoted bishop.
+
+    :return: a Unit.
+    """
+    promoted_bishop = Unit()
+    promoted_bishop.type = PROMOTED_BISHOP_TYPE
+    promoted_bishop.name = "Promoted Bishop"
+    promoted_bishop.cost = 6
+    promoted_bishop.moves = Graph()
+    for x in range(-BOARD_LENGTH, BOARD_LENGTH + 1):
+        for y in range(-BOARD_HEIGHT, BOARD_HEIGHT + 1):
+            if x == y or x == -y:
+                promoted_bishop.moves.add_new_node(x, y)
+    promoted_bishop.moves.connect_diagonal_nodes()
+    for x in range(-1, 2):
+        for y in range(-1, 2):
+            if x == 0 or y == 0 and x != y:
+                promoted_bishop.moves.add_new_node(x, y)
+    promoted_bishop.moves.connect_adjacent_nodes()
+    return promoted_bishop
+
+def build_barrier():
+    """
+    Build the template of a barrier.
+
+    :return: a Unit.
+    """
+    barrier = Unit()
+    barrier.type = BARRIER_TYPE
+    barrier.name = 'barrier'
+    barrier.cost = 0
+    barrier.moves = Graph()
+    return barrier
+
+# key: unit_type -> item: function building the template of that unit type
+UNIT_BUILDERS = {
+    WARPLING_TYPE: build_warpling,
+    KNIGHT_TYPE: build_knight,
+    BISHOP_TYPE: build_bishop,
+    ROOK_TYPE: build_rook,
+    QUEEN_TYPE: build_queen,
+    KING_TYPE: build_king,
+    GOLD_GENERAL_TYPE: build_gold_general,
+    SILVER_GENERAL_TYPE: build_silver_general,
+    LANCE_TYPE: build_lance,
+    SUPER_PAWN_TYPE: build_super_pawn,
+    PROMOTED_ROOK_TYPE: build_promoted_rook,
+    PROMOTED_BISHOP_TYPE: build_promoted_bishop,
+    BARRIER_TYPE: build_barrier
 }
+
+class CardDictionary(DictMixin):
+    """
+    Unit templates by unit type, each built the first time it is looked up.
+
+    Every unit type is a key from the start, so iterating over, counting and testing for unit types never builds a
+    template, while looking one up builds it, and only it, once, so a process only pays for the movement graphs of the
+    unit types it uses. It is not a dict, so that every mapping method, eg: iteritems or copy, goes through
+    CardDictionary.__getitem__ and sees every unit type, built or not.
+    """
+
+    def __init__(self, builders):
+        """
+        Create a dictionary that builds its values on demand.
+
+        :param builders: a dictionary mapping each unit_type to a function returning its template.
+        :return: an initialized CardDictionary object
+        """
+        self.builders = builders  # key: unit_type -> item: function building the template
+        self.templates = {}  # key: unit_type -> item: the template, for the templates built so far
+
+    def __getitem__(self, unit_type):
+        if unit_type not in self.templates:
+            if unit_type not in self.builders:
+                raise KeyError(unit_type)
+            self.templates[unit_type] = self.builders[unit_type]()
+        return self.templates[unit_type]
+
+    def __iter__(self):
+        return iter(self.builders)
+
+    def __len__(self):
+        return len(self.builders)
+
+    def __contains__(self, unit_type):
+        return unit_type in self.builders
+
+    def keys(self):
+        return self.builders.keys()
+
+    def copy(self):
+        """
+        Return a dict of every template, building those not built yet.
+
+        :return: a dictionary mapping each unit_type to its template.
+        """
+        return dict(self.iteritems())
+
+CARD_DICTIONARY = CardDictionary(UNIT_BUILDERS)
+
+# key: unit_type -> item: movement graph mirrored for flipped players, built on first use
+FLIPPED_MOVES = {}
+
+def get_moves(unit_type, flipped=False):
+    """
+    Return the movement graph shared by every unit of the given type.
+
+    Movement graphs are relative to the unit's position, so (0, 0) is the unit itself. They are shared between units
+    and must never be modified.
+    :param unit_type: number specifying the type of the unit, eg: WARPLING_TYPE.
+    :param flipped: when True, return the graph mirrored for a flipped player.
+    :return: a Graph.
+    """
+    if not flipped:
+        return CARD_DICTIONARY[unit_type].moves
+    if unit_type not in FLIPPED_MOVES:
+        moves = CARD_DICTIONARY[unit_type].moves.copy()
+        moves.flip(0)
+        FLIPPED_MOVES[unit_type] = moves
+    return FLIPPED_MOVES[unit_type]
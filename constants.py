@@ -11,6 +11,12 @@ STARTING_PLAYER = WHITE
 
 MOVE_PHASE = 0
 DEPLOY_PHASE = 1
+END_PHASE = 2  # after deploying, the only thing left to do is end the turn
+
+# actions are tuples whose first element names the kind of action, see Game.perform
+MOVE_ACTION = 'move'  # (MOVE_ACTION, unit_ID, x, y)
+DEPLOY_ACTION = 'deploy'  # (DEPLOY_ACTION, unit_type, x, y)
+END_TURN_ACTION = 'end_turn'  # (END_TURN_ACTION,)
 
 WARPLING_TYPE = 1
 KING_TYPE = 2
@@ -41,3 +47,7 @@ SOUTH = 2
 WEST = 3
 
 BLOCKED = 999999999
+
+STATE_HISTORY_LENGTH = 32  # number of recently sent states a game remembers for computing deltas
+
+CHECK_CONSISTENCY = False  # when True, Game checks its board and indexes against its units after every change; slow
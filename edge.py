@@ -1,12 +1,13 @@
 from node import Node
 
-class Edge:
+class Edge(object):
     """
     An edge is a connection between two nodes.
 
-    Edges have a unique identifier and a list of two nodes. Optionally, an edge can have a numerical weight. Edges can
+    Edges have a unique identifier and a pair of two nodes. Optionally, an edge can have a numerical weight. Edges can
     also be directed, in which case it is only possible to traverse the edge in one direction, not both.
     """
+    __slots__ = ('ID', 'weight', 'nodes', 'directed')  # no per-edge __dict__, graphs hold many edges
     n_edges = 0
     def __init__(self, node1, node2, weight=1, directed=False):
         """
@@ -21,20 +22,36 @@ class Edge:
         Edge.n_edges += 1
         self.ID = Edge.n_edges
         self.weight = weight
-        self.nodes = frozenset([node1, node2])
+        self.nodes = (node1, node2)  # node1 first, so a directed edge goes from nodes[0] to nodes[1]
         self.directed = directed
 
     def __eq__(self, other):
-        return (self.ID, self.weight, self.nodes, self.directed) == (other.ID, other.weight, other.nodes, other.directed)
+        return (self.ID, self.weight, frozenset(self.nodes), self.directed) == \
+               (other.ID, other.weight, frozenset(other.nodes), other.directed)
 
     def __hash__(self):
         return hash(self.ID)
 
-    def copy(self):
-        nodes = []
-        for node in self.nodes:
-            nodes.append(node.copy())
-        return Edge(nodes[0], nodes[1], self.weight, self.directed)
+    def __getstate__(self):
+        return (self.ID, self.weight, self.nodes, self.directed)
+
+    def __setstate__(self, state):
+        self.ID, self.weight, self.nodes, self.directed = state
+
+    def copy(self, node1=None, node2=None):
+        """
+        Return an edge with the same ID, weight and directedness.
+
+        The nodes are not copied: the copy connects node1 and node2 when given, eg: copies of the nodes in a copied
+        graph, and otherwise the same nodes as the original.
+        :param node1: node at first end of the copy.
+        :param node2: node at second end of the copy.
+        :return: a new Edge.
+        """
+        edge = Edge(self.nodes[0] if node1 is None else node1, self.nodes[1] if node2 is None else node2, self.weight,
+                    self.directed)
+        edge.ID = self.ID
+        return edge
 
     def generate_dict(self):
         nodes = []
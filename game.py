@@ -1,8 +1,43 @@
+from collections import OrderedDict
 from json import dumps
 
 from constants import *
-from card_dictionary import CARD_DICTIONARY
+from card_dictionary import CARD_DICTIONARY, get_moves
 from ability_dictionary import ABILITY_DICTIONARY
+from bitboard import Bitboard
+from move_tables import get_square_moves
+from zobrist import BLACK_KEY, CARD_KEYS, PHASE_KEYS, UNIT_KEYS, WARP_KEYS, count_key, position_hash
+
+# attributes of Game that are derived from the rest of the game and so are not pickled
+CACHED_ATTRIBUTES = ('destinations', 'destinations_state_ID', 'cached_state', 'cached_state_ID', 'history')
+
+class UndoRecord(object):
+    """
+    What Game.undo needs to take back an action, as returned by Game.apply.
+
+    Only what the action can change is kept: the game's counters, the unit that moved or was deployed and where it came
+    from, the unit it took, and the number of cards left before a deploy.
+    """
+    __slots__ = ('action', 'counters', 'warps', 'destinations', 'unit', 'origin', 'taken', 'card_amount')
+
+    def __init__(self, game, action):
+        """
+        Record a game's counters before it takes an action.
+
+        :param game: the game.
+        :param action: the action about to be taken.
+        :return: an initialized UndoRecord object
+        """
+        self.action = action
+        self.counters = (game.state_ID, game.turn, game.active_color, game.phase, game.n_units_deployed, game.over,
+                         game.position_key)
+        self.warps = [player.warp for player in game.players]  # warp of each player
+        # legal moves cached for the state before the action; Game.legal_destinations starts a new dictionary per state
+        self.destinations = game.destinations if game.destinations_state_ID == game.state_ID else {}
+        self.unit = None  # the unit that moved or was deployed
+        self.origin = None  # (x, y) the moved unit came from
+        self.taken = None  # the unit taken at the destination
+        self.card_amount = None  # number of cards of the deployed type left before the deploy
 
 class Game:
     """
@@ -11,24 +46,58 @@ class Game:
     It Contains the canonical copy of the game's state.
     """
 
-    def __init__(self):
+    def __init__(self, bitboard=False):
         """
         Set up a game with default conditions.
 
+        :param bitboard: When True, also keep the board as bit masks and use them to find legal moves.
         :return: an initialized Game object
         """
         self.turn = 0  # 1 on the first turn, 2 on the second turn...
         self.active_color = WHITE  # color currently taking its turn
         self.phase = MOVE_PHASE  # int indicating current phase
         self.units = {}  # list of units in play key: unit_ID -> item: unit
+        self.unit_positions = {}  # key: (x, y) -> item: unit_ID of the unit at that position
         self.board = []  # 2d array of board elements
         for x in range(BOARD_LENGTH):
             self.board.append([EMPTY_TILE]*BOARD_HEIGHT)
         self.players = []  # list of players in the game
         self.n_units_deployed = 0  # total number of units deployed in the game
         self.state_ID = 0  # total number different states
+        self.destinations = {}  # key: unit_ID -> item: set of positions in range, valid for destinations_state_ID
+        self.destinations_state_ID = None
+        self.cached_state = None  # json returned by Game.state, valid for cached_state_ID
+        self.cached_state_ID = None
+        self.history = OrderedDict()  # key: state_ID -> item: Game.generate_dict output for recently sent states
+        self.bitboard = Bitboard() if bitboard else None  # the board as bit masks, kept in step with self.board
+        self.position_key = None  # Zobrist hash of the position kept up to date, None until Game.position_hash is called
         self.over = False  # set to true when the game ends
 
+    def __getstate__(self):
+        """
+        Return the game's data for pickling, leaving out everything that is cached.
+
+        :return: a dictionary of attributes.
+        """
+        state = dict(self.__dict__)
+        for key in CACHED_ATTRIBUTES:
+            del state[key]
+        return state
+
+    def __setstate__(self, state):
+        """
+        Restore the game's data after unpickling, with empty caches.
+
+        :param state: a dictionary made by Game.__getstate__.
+        :return: nothing
+        """
+        self.__dict__.update(state)
+        self.destinations = {}
+        self.destinations_state_ID = None
+        self.cached_state = None
+        self.cached_state_ID = None
+        self.history = OrderedDict()
+
     def next_turn(self):
         """
         Advance to next turn.
@@ -37,9 +106,10 @@ class Game:
         :return: nothing
         """
         self.turn += 1
+        self.update_hash(PHASE_KEYS[self.phase] ^ PHASE_KEYS[MOVE_PHASE] ^ BLACK_KEY)
         self.phase = MOVE_PHASE
         self.active_color = int(not self.active_color)
-        self.players[self.active_color].warp = (self.turn + self.turn % 2)/2  # Hearthstone style resources
+        self.set_warp(self.players[self.active_color], (self.turn + self.turn % 2)/2)  # Hearthstone style resources
         self.state_ID += 1
 
     def next_phase(self):
@@ -48,7 +118,9 @@ class Game:
 
         :return: nothing
         """
-        self.phase = (self.phase + 1) % 3
+        phase = (self.phase + 1) % 3
+        self.update_hash(PHASE_KEYS[self.phase] ^ PHASE_KEYS[phase])
+        self.phase = phase
         self.state_ID += 1
 
     def move_is_legal(self, unit_ID, x, y):
@@ -61,34 +133,68 @@ class Game:
         :return: True if the move is legal, False otherwise.
         """
         # TODO: Do we want more specific return values or error messages?
-        # The unit must belong to the active player.
-        if self.units[unit_ID].color != self.active_color:
-            return False
-        # The destination must not be off the board.
-        if x + 1 > BOARD_LENGTH or y + 1 > BOARD_HEIGHT:
-            return False
-        if x < 0 or y < 0:
-            return False
-        # Grab the unit by ID.
+        return (x, y) in self.legal_destinations(unit_ID)
+
+    def legal_destinations(self, unit_ID):
+        """
+        Return the set of positions the given unit can legally move to.
+
+        A move is legal when the unit belongs to the active player, the destination is on the board, is not the unit's
+        own position and holds neither a unit of the same color nor an obstruction, and the path to some node in the
+        destination's neighbourhood is not blocked. All destinations are found from a single search of the unit's
+        movement graph, and remembered until the state changes.
+        :param unit_ID: unique identifier of the unit.
+        :return: a set of (x, y) tuples, which must not be modified.
+        """
         unit = self.units[unit_ID]
-        movement = unit.moves
+        # The unit must belong to the active player.
+        if unit.color != self.active_color:
+            return set()
+        # Everything else only changes along with state_ID.
+        if self.destinations_state_ID != self.state_ID:
+            self.destinations = {}
+            self.destinations_state_ID = self.state_ID
+        if unit_ID not in self.destinations:
+            self.destinations[unit_ID] = self.find_destinations(unit)
+        return self.destinations[unit_ID]
+
+    def find_destinations(self, unit):
+        """
+        Find the positions a unit can move to, regardless of whose turn it is, from the precomputed move tables.
+
+        :param unit: the unit to move.
+        :return: a set of (x, y) tuples.
+        """
+        flipped = self.players[unit.color].flipped
+        if self.bitboard is not None:
+            return self.bitboard.destinations(unit, flipped)
+        board = self.board
+        moves = get_square_moves(unit.type, flipped, unit.x, unit.y)
+        destinations = set()
         # The destination must not be a unit of the same color or an obstruction.
-        if self.board[x][y] == unit.color or self.board[x][y] == OBSTRUCTION:
-            return False
-        # The destination must be different from the starting location.
-        if (x, y) == (unit.x, unit.y):
-            return False
-        start_node = movement.find_node_by_position(unit.x, unit.y)
-        end_node = movement.find_node_by_position(x, y)
-        # The destination must be within the unit's range.
-        if end_node is None:
-            return False
-        # Now if the path to any node in the destination's neighbourhood is not blocked, the move is legal.
-        for node in movement.neighbourhood(end_node):
-            if movement.traversal_cost(start_node, node) < BLOCKED:
-                return True
-        # If they are all blocked, the move is illegal.
-        return False
+        for x, y in moves.steps:
+            if board[x][y] != unit.color and board[x][y] != OBSTRUCTION:
+                destinations.add((x, y))
+        # A ray is followed up to the first square that is not empty, which can be taken.
+        for ray in moves.rays:
+            for x, y in ray:
+                tile = board[x][y]
+                if tile != unit.color and tile != OBSTRUCTION:
+                    destinations.add((x, y))
+                if tile != EMPTY_TILE:
+                    break
+        # Any one of the guards of a destination must be empty.
+        for (x, y), guards in moves.guarded:
+            if board[x][y] == unit.color or board[x][y] == OBSTRUCTION:
+                continue
+            for guard in guards:
+                for guard_x, guard_y in guard:
+                    if board[guard_x][guard_y] != EMPTY_TILE:
+                        break
+                else:
+                    destinations.add((x, y))
+                    break
+        return destinations
 
     def list_legal_moves(self, unit_ID):
         """
@@ -98,10 +204,8 @@ class Game:
         :return: a 2D list where (legal_moves[i][0], legal_moves[i][1]) is the (x, y) coordinate of the ith legal move.
         """
         legal_moves = []
-        for x in range(BOARD_LENGTH):
-            for y in range(BOARD_HEIGHT):
-                if self.move_is_legal(unit_ID, x, y):
-                    legal_moves.append([x, y])
+        for x, y in sorted(self.legal_destinations(unit_ID)):
+            legal_moves.append([x, y])
         return legal_moves
 
     def move(self, unit_ID, x, y):
@@ -138,46 +242,92 @@ class Game:
         self.take(x, y)
         # update board
         if not deploy:
-            self.board[unit.x][unit.y] = EMPTY_TILE
-        self.board[x][y] = unit.color
-        # update graph position
-        movement = unit.moves
-        for node in movement.mapping:
-            if deploy:
-                node.x += x
-                node.y += y
-            else:
-                node.x += x - unit.x
-                node.y += y - unit.y
+            self.set_tile(unit.x, unit.y, EMPTY_TILE)
+            self.unit_positions.pop((unit.x, unit.y), None)
+            self.update_hash(UNIT_KEYS[(unit.type, unit.color, unit.x, unit.y)])
+        self.set_tile(x, y, unit.color)
+        self.unit_positions[(x, y)] = unit.ID
+        self.update_hash(UNIT_KEYS[(unit.type, unit.color, x, y)])
         # update unit position
         unit.x = x
         unit.y = y
-        self.update_movements()
         self.state_ID += 1
+        if CHECK_CONSISTENCY:
+            self.check_consistency()
 
     def update_movements(self):
         """
-        Update the movement graph of every unit in play to reflect the current board.
+        Account for direct edits of the board.
 
+        Move tables never change and are checked against the live board whenever legal moves are computed, so there is
+        nothing to update, but legal moves cached for the current state are discarded, the bitboard, if any, is rebuilt
+        from the board, and the position's hash is computed afresh when next asked for. Call this after editing the
+        board, the players or the active color directly.
         :return: nothing.
         """
-        for key in self.units:
-            unit = self.units[key]
-            movement = unit.moves
-            # unblock nodes on the first pass
-            for node in movement.mapping:
-                x = node.x
-                y = node.y
-                if (0 <= x < BOARD_LENGTH) and (0 <= y < BOARD_HEIGHT):
-                    if self.board[x][y] == EMPTY_TILE or (x, y) == (unit.x, unit.y):
-                        movement.unblock_position(x, y)
-            # block nodes on the second pass
-            for node in movement.mapping:
-                x = node.x
-                y = node.y
-                if (0 <= x < BOARD_LENGTH) and (0 <= y < BOARD_HEIGHT):
-                    if self.board[x][y] != EMPTY_TILE and (x, y) != (unit.x, unit.y):
-                        movement.block_position(x, y)
+        if self.bitboard is not None:
+            self.bitboard.load(self.board)
+        self.position_key = None
+        self.state_ID += 1
+
+    def position_hash(self):
+        """
+        Return the Zobrist hash of the game's position.
+
+        Positions that are the same get the same hash, see zobrist.position_hash. The hash is computed once, then kept up
+        to date as the game changes, so this is O(1).
+        :return: a 64-bit int.
+        """
+        if self.position_key is None:
+            self.position_key = position_hash(self)
+        return self.position_key
+
+    def update_hash(self, key):
+        """
+        Account for a change of the position in its hash, if the hash is being kept.
+
+        :param key: the exclusive or of the keys of the features that appeared or disappeared, see zobrist.
+        :return: nothing.
+        """
+        if self.position_key is not None:
+            self.position_key ^= key
+
+    def set_warp(self, player, warp):
+        """
+        Set the amount of warp a player has.
+
+        :param player: the player.
+        :param warp: the new amount of warp.
+        :return: nothing.
+        """
+        self.update_hash(count_key(WARP_KEYS[player.color], player.warp) ^ count_key(WARP_KEYS[player.color], warp))
+        player.warp = warp
+
+    def set_tile(self, x, y, tile):
+        """
+        Set the contents of a square of the board.
+
+        :param x: x coordinate.
+        :param y: y coordinate.
+        :param tile: EMPTY_TILE, WHITE_TILE, BLACK_TILE or OBSTRUCTION.
+        :return: nothing.
+        """
+        self.board[x][y] = tile
+        if self.bitboard is not None:
+            self.bitboard.set_tile(x, y, tile)
+
+    def is_blocking(self, unit, x, y):
+        """
+        Return whether the given position blocks the movement of the given unit.
+
+        :param unit: the unit that is moving.
+        :param x: x coordinate of the position.
+        :param y: y coordinate of the position.
+        :return: True if the position is on the board, occupied and not the unit's own position, otherwise False.
+        """
+        if not ((0 <= x < BOARD_LENGTH) and (0 <= y < BOARD_HEIGHT)):
+            return False
+        return self.board[x][y] != EMPTY_TILE and (x, y) != (unit.x, unit.y)
 
     def take(self, x, y):
         """
@@ -188,14 +338,41 @@ class Game:
         :return: True if there is a unit at the given position, False otherwise.
         """
         # TODO: Rename to destroy?
-        for key in self.units:
-            if self.units[key].x == x and self.units[key].y == y:
-                del self.units[key]
-                self.board[x][y] = EMPTY_TILE
-                self.update_movements()
-                self.state_ID += 1
-                return True
-        return False
+        unit_ID = self.unit_positions.pop((x, y), None)
+        if unit_ID is None:
+            return False
+        unit = self.units.pop(unit_ID)
+        self.set_tile(x, y, EMPTY_TILE)
+        self.update_hash(UNIT_KEYS[(unit.type, unit.color, x, y)])
+        self.state_ID += 1
+        if CHECK_CONSISTENCY:
+            self.check_consistency()
+        return True
+
+    def check_consistency(self):
+        """
+        Check that the board, the position index and the bitboard agree with the units.
+
+        Called after every change when CHECK_CONSISTENCY is True.
+        :return: nothing.
+        :raises AssertionError: describing the first disagreement found.
+        """
+        expected = {}
+        for unit_ID in self.units:
+            unit = self.units[unit_ID]
+            assert unit.ID == unit_ID, 'unit %d is stored as unit %d' % (unit.ID, unit_ID)
+            assert (unit.x, unit.y) not in expected, 'units %d and %d are both at (%d, %d)' % (
+                expected.get((unit.x, unit.y)), unit_ID, unit.x, unit.y)
+            assert self.board[unit.x][unit.y] == unit.color, 'the board does not show unit %d at (%d, %d)' % (
+                unit_ID, unit.x, unit.y)
+            expected[(unit.x, unit.y)] = unit_ID
+        assert self.unit_positions == expected, 'the position index is out of date'
+        assert self.position_key in (None, position_hash(self)), 'the position hash is out of date'
+        if self.bitboard is not None:
+            bitboard = Bitboard()
+            bitboard.load(self.board)
+            assert (self.bitboard.colors, self.bitboard.obstructions) == (bitboard.colors, bitboard.obstructions), \
+                'the bitboard does not match the board'
 
     def deploy_is_legal(self, unit_type, color, x, y, legal=True):
         """
@@ -245,20 +422,26 @@ class Game:
         player = self.players[self.active_color]
         if legal:
             # decrease the player's warp by the cost of the unit.
-            player.warp -= player.palette[unit_type].cost
+            self.set_warp(player, player.warp - player.palette[unit_type].cost)
             # decrement number of units of the type in the player's palette.
-            player.palette[unit_type].current_amount -= 1
+            card = player.palette[unit_type]
+            key = CARD_KEYS[(player.color, unit_type)]
+            self.update_hash(count_key(key, card.current_amount) ^ count_key(key, card.current_amount - 1))
+            card.current_amount -= 1
         # initialize unit
         unit = CARD_DICTIONARY[unit_type].copy()
-        if self.players[color].flipped:
-            unit.moves.flip(0)
+        unit.moves = get_moves(unit_type, self.players[color].flipped)
         unit.color = self.active_color
         self.n_units_deployed += 1
         unit.ID = self.n_units_deployed
-        # put the unit in play
+        # put the unit in play, taking any unit at the destination first so the game is never seen half changed
+        self.take(x, y)
         self.units[unit.ID] = unit
         deploy = True
         self.place(unit, x, y, deploy)
+        # only one unit may be deployed per turn
+        if legal and self.phase == DEPLOY_PHASE:
+            self.next_phase()
         self.state_ID += 1
         return True
 
@@ -298,6 +481,122 @@ class Game:
         return True
 
 
+    def legal_actions(self):
+        """
+        Return every action the active player can take, for players that are not people.
+
+        A turn is one move during the move phase, then at most one deploy during the deploy phase, and the turn can be
+        ended at any point.
+        :return: a list of action tuples that can be given to Game.perform, ending the turn last.
+        """
+        actions = []
+        if self.over:
+            return actions
+        if self.phase == MOVE_PHASE:
+            for unit_ID in sorted(self.units):
+                for x, y in sorted(self.legal_destinations(unit_ID)):
+                    actions.append((MOVE_ACTION, unit_ID, x, y))
+        elif self.phase == DEPLOY_PHASE:
+            player = self.players[self.active_color]
+            warplings = sorted((unit.x, unit.y) for unit in self.units.values()
+                               if unit.type == WARPLING_TYPE and unit.color == player.color)
+            for unit_type in sorted(player.palette):
+                card = player.palette[unit_type]
+                if card.current_amount < 1 or card.cost > player.warp:
+                    continue
+                for x, y in warplings:
+                    actions.append((DEPLOY_ACTION, unit_type, x, y))
+        actions.append((END_TURN_ACTION,))
+        return actions
+
+    def perform(self, action):
+        """
+        Take an action for the active player.
+
+        :param action: a tuple as returned by Game.legal_actions, eg: (MOVE_ACTION, unit_ID, x, y).
+        :return: True if the action was legal and taken, False otherwise.
+        """
+        if action[0] == MOVE_ACTION:
+            return self.move(*action[1:])
+        if action[0] == DEPLOY_ACTION:
+            unit_type, x, y = action[1:]
+            return self.deploy(unit_type, self.active_color, x, y)
+        if action[0] == END_TURN_ACTION:
+            self.next_turn()
+            return True
+        return False
+
+    def apply(self, action):
+        """
+        Take an action for the active player in a way that can be taken back with Game.undo.
+
+        :param action: a tuple as returned by Game.legal_actions.
+        :return: an UndoRecord if the action was legal and taken, None otherwise.
+        """
+        record = UndoRecord(self, action)
+        if action[0] == MOVE_ACTION:
+            unit_ID, x, y = action[1:]
+            if unit_ID in self.units:
+                record.unit = self.units[unit_ID]
+                record.origin = (record.unit.x, record.unit.y)
+            record.taken = self.get_unit_by_position(x, y)
+        elif action[0] == DEPLOY_ACTION:
+            unit_type, x, y = action[1:]
+            record.taken = self.get_unit_by_position(x, y)
+            card = self.players[self.active_color].palette.get(unit_type)
+            record.card_amount = None if card is None else card.current_amount
+        if not self.perform(action):
+            return None
+        if action[0] == DEPLOY_ACTION:
+            record.unit = self.units[self.n_units_deployed]
+        return record
+
+    def undo(self, record):
+        """
+        Take back the last action taken with Game.apply.
+
+        Records must be undone in the reverse order of the actions. The game gets back its earlier state_ID, so state_IDs
+        after it will be used again: legal moves cached before the action are restored, and states newer than it are
+        forgotten.
+        :param record: the UndoRecord returned by Game.apply.
+        :return: nothing.
+        """
+        action = record.action
+        (self.state_ID, self.turn, self.active_color, self.phase, self.n_units_deployed, self.over,
+         self.position_key) = record.counters
+        for player, warp in zip(self.players, record.warps):
+            player.warp = warp
+        if action[0] in (MOVE_ACTION, DEPLOY_ACTION):
+            unit = record.unit
+            del self.unit_positions[(unit.x, unit.y)]
+            self.set_tile(unit.x, unit.y, EMPTY_TILE)
+            if action[0] == MOVE_ACTION:
+                unit.x, unit.y = record.origin
+                self.put_back(unit)
+            else:
+                del self.units[unit.ID]
+                self.players[self.active_color].palette[action[1]].current_amount = record.card_amount
+            if record.taken is not None:
+                self.put_back(record.taken)
+        self.destinations = record.destinations
+        self.destinations_state_ID = self.state_ID
+        self.cached_state_ID = None
+        for state_ID in [state_ID for state_ID in self.history if state_ID > self.state_ID]:
+            del self.history[state_ID]
+        if CHECK_CONSISTENCY:
+            self.check_consistency()
+
+    def put_back(self, unit):
+        """
+        Return a unit to the board at its own position, which must be empty.
+
+        :param unit: the unit.
+        :return: nothing.
+        """
+        self.units[unit.ID] = unit
+        self.unit_positions[(unit.x, unit.y)] = unit.ID
+        self.set_tile(unit.x, unit.y, unit.color)
+
     def get_unit_by_position(self, x, y):
         """
         Return the unit in the game at the specified location.
@@ -306,20 +605,100 @@ class Game:
         :param y: y coordinate.
         :return: the specified unit if one exists at the location, None otherwise.
         """
-        for unit_ID in self.units:
-            unit = self.units[unit_ID]
-            if (unit.x, unit.y) == (x, y):
-                return unit
+        unit_ID = self.unit_positions.get((x, y))
+        if unit_ID is None:
+            return None
+        return self.units[unit_ID]
 
     def state(self):
         """
         Return the entire game state.
 
+        The text is built once per state_ID, so repeated calls for an unchanged game are cheap.
         :return: Text in json format containing all of the game's data
         """
-        game_dict = self.generate_dict()
-        json = dumps(game_dict)
-        return json
+        if self.cached_state_ID != self.state_ID:
+            self.cached_state = dumps(self.record_state())
+            self.cached_state_ID = self.state_ID
+        return self.cached_state
+
+    def record_state(self):
+        """
+        Remember the dictionary of the current state so later deltas can be computed against it.
+
+        Only the last STATE_HISTORY_LENGTH recorded states are kept.
+        :return: the dictionary of the current state, as generated by Game.generate_dict.
+        """
+        if self.state_ID not in self.history:
+            self.history[self.state_ID] = self.generate_dict()
+            while len(self.history) > STATE_HISTORY_LENGTH:
+                self.history.popitem(False)
+        return self.history[self.state_ID]
+
+    def state_since(self, last_state_ID):
+        """
+        Return what changed in the game since a state the client has already seen.
+
+        The delta holds the current turn, phase and counters, every unit that was created or changed (including
+        changes to its legal moves), the IDs of removed units, and the warp and palette counts of players that changed.
+        If the client's state is too old to be remembered, or a palette changed shape, a full snapshot is returned
+        instead, marked by 'full' being True.
+        :param last_state_ID: the state_ID of the last state the client received.
+        :return: Text in json format containing the delta or snapshot.
+        """
+        current = self.record_state()
+        delta = self.generate_delta(self.history.get(last_state_ID), current)
+        if delta is None:
+            delta = dict(current)
+            delta['full'] = True
+        return dumps(delta)
+
+    def generate_delta(self, old, new):
+        """
+        Create a dictionary of the differences between two generated state dictionaries.
+
+        :param old: the dictionary of the older state, or None if it is unknown.
+        :param new: the dictionary of the newer state.
+        :return: a dictionary formatted to be an argument for json.dumps, or None if no delta can express the change.
+        """
+        if old is None:
+            return None
+        old_units = {}
+        for unit in old['units']:
+            old_units[unit['ID']] = unit
+        units = []
+        for unit in new['units']:
+            if old_units.pop(unit['ID'], None) != unit:
+                units.append(unit)
+        players = []
+        for old_player, new_player in zip(old['players'], new['players']):
+            if old_player == new_player:
+                continue
+            old_types = [card['type'] for card in old_player['palette']]
+            new_types = [card['type'] for card in new_player['palette']]
+            if old_player['color'] != new_player['color'] or old_types != new_types:
+                return None
+            palette = []
+            for old_card, new_card in zip(old_player['palette'], new_player['palette']):
+                if old_card['current_amount'] != new_card['current_amount']:
+                    palette.append([new_card['type'], new_card['current_amount']])
+            players.append({'color': new_player['color'], 'warp': new_player['warp'], 'palette': palette})
+        if len(old['players']) != len(new['players']):
+            return None
+        dictionary = {
+            'full': False,
+            'since': old['state_ID'],
+            'turn': new['turn'],
+            'active_color': new['active_color'],
+            'phase': new['phase'],
+            'units': units,
+            'removed': sorted(old_units.keys()),
+            'players': players,
+            'n_units_deployed': new['n_units_deployed'],
+            'state_ID': new['state_ID'],
+            'over': new['over'],
+        }
+        return dictionary
 
     def generate_dict(self):
         """
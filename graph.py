@@ -1,3 +1,5 @@
+from heapq import heappop, heappush
+
 from node import Node
 from edge import Edge
 from constants import BLOCKED
@@ -6,9 +8,10 @@ class Graph:
     """
     A graph is a mathematical collection of nodes and edges.
 
-    Graphs have a dictionary that maps each node in the graph to the set of edges connected to it. For now, we assume
-    that the graph in question is connected. If you want something that handles a graph with disconnected components,
-    ask nicely and maybe, maybe we'll get around to it.
+    Graphs have a dictionary that maps each node in the graph to a dictionary from each of its neighbours to the edge
+    connecting them, so edges and neighbours are looked up rather than searched for. For now, we assume that the graph
+    in question is connected. If you want something that handles a graph with disconnected components, ask nicely and
+    maybe, maybe we'll get around to it.
     """
 
     def __init__(self):
@@ -17,26 +20,90 @@ class Graph:
 
         :return: an initialized Graph object
         """
-        self.mapping = {} # Key: node -> Item: edges
+        self.mapping = {}  # Key: node -> Item: dictionary of Key: neighbouring node -> Item: edge connecting them
+        self.nodes_by_ID = {}  # Key: ID -> Item: node
+        self.nodes_by_position = {}  # Key: (x, y) -> Item: first node added at that position
+        self.owned_nodes = None  # once cloned or a clone, nodes whose neighbour dictionaries are not shared, else None
+        self.owned_edges = None  # once cloned or a clone, ids of the edges that are not shared, otherwise None
 
     def copy(self):
         """
         Return a copy of the graph.
 
+        Every node and every edge is copied once, so this takes time proportional to the size of the graph. Copies keep
+        the IDs, positions, weights and directedness of the originals.
         :return: a new graph with the same values as the caller.
         """
         graph = Graph()
+        copies = {}  # Key: node -> Item: its copy in the new graph
         for node in self.mapping:
             copy_of_node = node.copy()
-            graph.add_node(copy_of_node)
-            for other_node in self.mapping:
-                edge = self.find_edge(node, other_node)
-                if edge is not None:
-                    copy_of_other_node = graph.find_node_by_ID(other_node.ID)
-                    if copy_of_other_node is not None:
-                        graph.connect(copy_of_node, copy_of_other_node, edge.weight, edge.directed)
+            copies[node] = copy_of_node
+            graph.mapping[copy_of_node] = {}
+            graph.nodes_by_ID[copy_of_node.ID] = copy_of_node
+        for position in self.nodes_by_position:
+            graph.nodes_by_position[position] = copies[self.nodes_by_position[position]]
+        for node in self.mapping:
+            for neighbour, edge in self.mapping[node].iteritems():
+                copy_of_node = copies[node]
+                copy_of_neighbour = copies[neighbour]
+                if copy_of_neighbour in graph.mapping[copy_of_node]:
+                    continue  # already copied from the other end
+                copy_of_edge = edge.copy(copies[edge.nodes[0]], copies[edge.nodes[1]])
+                graph.mapping[copy_of_node][copy_of_neighbour] = copy_of_edge
+                graph.mapping[copy_of_neighbour][copy_of_node] = copy_of_edge
+        return graph
+
+    def clone(self):
+        """
+        Return a copy of the graph that shares the original's nodes and edges until it changes them.
+
+        Cloning only copies the graph's indices. From then on both graphs share everything else, and either one copies an
+        edge the first time it edits it, so the weights of the clone or the original can be changed, eg: by blocking
+        nodes, without changing the other. Nodes stay shared, so neither graph can be translated or flipped any more.
+        :return: a new graph with the same values as the caller.
+        """
+        graph = Graph()
+        graph.mapping = dict(self.mapping)
+        graph.nodes_by_ID = dict(self.nodes_by_ID)
+        graph.nodes_by_position = dict(self.nodes_by_position)
+        graph.owned_nodes = set()
+        graph.owned_edges = set()
+        # whatever this graph owned is now shared with the clone too
+        self.owned_nodes = set()
+        self.owned_edges = set()
         return graph
 
+    def own_neighbours(self, node):
+        """
+        Return a node's neighbour dictionary, first copying it if it is shared with a clone or the graph cloned.
+
+        :param node: a node of the graph.
+        :return: the dictionary mapping each neighbour of node to the edge connecting them.
+        """
+        if self.owned_nodes is not None and node not in self.owned_nodes:
+            self.mapping[node] = dict(self.mapping[node])
+            self.owned_nodes.add(node)
+        return self.mapping[node]
+
+    def own_edge(self, edge):
+        """
+        Return this graph's version of an edge, first copying it if it is shared with a clone or the graph cloned.
+
+        :param edge: an edge of the graph, or of a graph it shares edges with.
+        :return: the edge connecting the same nodes in this graph, which the graph may change.
+        """
+        if self.owned_edges is None:
+            return edge
+        node1, node2 = edge.nodes
+        edge = self.mapping[node1][node2]
+        if id(edge) not in self.owned_edges:
+            edge = edge.copy()
+            self.own_neighbours(node1)[node2] = edge
+            self.own_neighbours(node2)[node1] = edge
+            self.owned_edges.add(id(edge))
+        return edge
+
     def add_node(self, node):
         """
         Add a node to the graph.
@@ -46,7 +113,11 @@ class Graph:
         """
         if self.mapping.has_key(node):
             return False
-        self.mapping[node] = set()
+        self.mapping[node] = {}
+        if self.owned_nodes is not None:
+            self.owned_nodes.add(node)
+        self.nodes_by_ID[node.ID] = node
+        self.nodes_by_position.setdefault((node.x, node.y), node)
         return True
 
     def add_new_node(self, x=0, y=0):
@@ -67,9 +138,7 @@ class Graph:
         :param ID: unique numerical identifier of the node to find.
         :return: the node in the graph with the ID specified.
         """
-        for node in self.mapping:
-            if node.ID == ID:
-                return node
+        return self.nodes_by_ID.get(ID)
 
     def find_node_by_position(self, x, y):
         """
@@ -80,9 +149,7 @@ class Graph:
         :return: a node in the graph with the position specified. If many nodes in the graph have the position
         specified, which one of those this method returns is undefined.
         """
-        for node in self.mapping:
-            if node.x == x and node.y == y:
-                return node
+        return self.nodes_by_position.get((x, y))
 
     def get_nodes(self):
         """
@@ -98,7 +165,7 @@ class Graph:
 
         :return: the number of nodes in the graph.
         """
-        return len(self.get_nodes())
+        return len(self.mapping)
 
     def connect(self, node1, node2, weight=1, directed=False):
         """
@@ -113,8 +180,10 @@ class Graph:
         if self.are_neighbours(node1, node2):
             return False
         edge = Edge(node1, node2, weight, directed)
-        self.mapping[node1].add(edge)
-        self.mapping[node2].add(edge)
+        self.own_neighbours(node1)[node2] = edge
+        self.own_neighbours(node2)[node1] = edge
+        if self.owned_edges is not None:
+            self.owned_edges.add(id(edge))
         return True
 
     def connect_positions(self, position1, position2, weight=1, directed=False):
@@ -196,21 +265,22 @@ class Graph:
 
         :param node1: the first node.
         :param node2: the second node.
-        :return: the edge connecting node1 to node2.
+        :return: the edge connecting node1 to node2, or None if they are not connected.
         """
-        for edge in self.mapping[node1]:
-            if node2 in edge.nodes:
-                return edge
+        return self.mapping[node1].get(node2)
 
     def edit_edge(self, edge, weight, directed=False):
         """
         Assign a new weight and directedness to an edge.
 
+        In a graph that shares the edge with a clone or the graph cloned, its own copy of the edge is edited, leaving the
+        other graph's edge as it was.
         :param edge: the edge to edit.
         :param weight: new numerical weight of the edge.
         :param directed: new boolean directedness of the edge.
         :return: nothing.
         """
+        edge = self.own_edge(edge)
         edge.weight = weight
         edge.directed = directed
 
@@ -224,10 +294,10 @@ class Graph:
         :param directed: new boolean directedness of the edge.
         :return: False if there is no edge between node1 and node2, otherwise True.
         """
-        if not self.are_neighbours(node1, node2):
-            return False
         edge = self.find_edge(node1, node2)
-        self.edit_edge(weight, directed)
+        if edge is None:
+            return False
+        self.edit_edge(edge, weight, directed)
         return True
 
     def block_node(self, node):
@@ -237,7 +307,7 @@ class Graph:
         :param node: the node to block.
         :return: nothing.
         """
-        for edge in self.mapping[node]:
+        for edge in self.mapping[node].values():
             self.edit_edge(edge, BLOCKED)
 
     def unblock_node(self, node):
@@ -247,7 +317,7 @@ class Graph:
         :param node: the node to unblock.
         :return: nothing.
         """
-        for edge in self.mapping[node]:
+        for edge in self.mapping[node].values():
             self.edit_edge(edge, 1)
 
     def block_position(self, x, y):
@@ -278,8 +348,7 @@ class Graph:
         """
         edge_set = set()
         for node in self.mapping:
-            edges = self.mapping[node]
-            edge_set |= edges
+            edge_set.update(self.mapping[node].itervalues())
         return frozenset(edge_set)
 
     def num_edges(self):
@@ -298,10 +367,8 @@ class Graph:
         :param node: a Node object
         :return: the set of all nodes neighboring the given node.
         """
-        connected_edges = self.mapping[node]
-        neighbours = set([node])  # a node always neighbours itself
-        for edge in connected_edges:
-            neighbours |= edge.nodes
+        neighbours = set(self.mapping[node])
+        neighbours.add(node)  # a node always neighbours itself
         return neighbours
 
     def are_neighbours(self, node1, node2):
@@ -313,52 +380,51 @@ class Graph:
         :param node2: second node
         :return: True if node1 neighbours node2, otherwise False.
         """
-        return node1 in self.neighbourhood(node2)
+        return node1 == node2 or node1 in self.mapping[node2]
 
-    def traversal_cost(self, start_node, end_node, unvisited_nodes=None, visited_nodes=None, visit_costs=None):
+    def traversal_cost(self, start_node, end_node):
         """
         Calculate the minimum traversal cost from start_node to end_node using Dijkstra's algorithm.
 
         :param start_node: the node to traverse from.
         :param end_node: the node to traverse to.
-        :param unvisited_nodes: should always be None when called by user, it is used for recursion.
-        :param visited_nodes: should always be None when called by user, it is used for recursion.
-        :param visit_costs:  should always be None when called by user, it is used for recursion.
         :return: If start_node can access end_node, return the minimum traversal cost, otherwise return BLOCKED.
         """
-        # initialization
-        if unvisited_nodes is None:
-            if start_node == end_node:
-                return 0
-            unvisited_nodes = set(self.mapping.keys())
-            visited_nodes = set()
-            visit_costs = {}
-            for node in self.mapping:
-                visit_costs[node] = 0 if node == start_node else BLOCKED
-
-        # Find the set of unvisited neighbours.
-        unvisited_neighbours = set(self.neighbourhood(start_node)) & unvisited_nodes
-        # Compute visit_costs for the current node's neighbours.
-        for neighbour in unvisited_neighbours:
-            new_visit_cost = visit_costs[start_node] + self.find_edge(start_node, neighbour).weight
-            if new_visit_cost < visit_costs[neighbour]:
-                visit_costs[neighbour] = new_visit_cost
-        # Mark the current node as visited.
-        unvisited_nodes.remove(start_node)
-        visited_nodes.add(start_node)
-        # If end_node has been visited, terminate, the destination has been reached.
         if start_node == end_node:
-            return visit_costs[start_node]
-        # Otherwise, find the least costly unvisited node.
-        unvisited_visit_costs = {}
-        for node in unvisited_nodes:
-            unvisited_visit_costs[node] = visit_costs[node]
-        best_unvisited_node = min(unvisited_visit_costs, key=unvisited_visit_costs.get)
-        # If that node is BLOCKED, terminate; the destination is inaccessible.
-        if unvisited_visit_costs[best_unvisited_node] >= BLOCKED:
-            return BLOCKED
-        # Otherwise, recurse using the least costly unvisited node as the new start_node.
-        return self.traversal_cost(best_unvisited_node, end_node, unvisited_nodes, visited_nodes, visit_costs)
+            return 0
+        return self.traversal_costs(start_node, end_node).get(end_node, BLOCKED)
+
+    def traversal_costs(self, start_node, end_node=None, blocked=None):
+        """
+        Calculate the minimum traversal cost from start_node to every node it can access using Dijkstra's algorithm.
+
+        A node is accessible when its traversal cost is less than BLOCKED.
+        :param start_node: the node to traverse from.
+        :param end_node: when given, the search stops as soon as the cost of this node is known.
+        :param blocked: when given, a function taking a node and returning True if the node is blocked. Every edge
+        connected to a blocked node is then treated as having weight BLOCKED, without editing the graph.
+        :return: a dictionary mapping each accessible node to its minimum traversal cost from start_node.
+        """
+        visit_costs = {}  # Key: node -> Item: final traversal cost
+        best_costs = {start_node: 0}  # Key: node -> Item: cheapest cost found so far
+        queue = [(0, start_node.ID, start_node)]
+        while queue:
+            cost, ID, node = heappop(queue)
+            if node in visit_costs:
+                continue
+            visit_costs[node] = cost
+            if end_node is not None and node == end_node:
+                break
+            if blocked is not None and blocked(node):
+                continue
+            for neighbour, edge in self.mapping[node].iteritems():
+                if neighbour in visit_costs or (blocked is not None and blocked(neighbour)):
+                    continue
+                new_visit_cost = cost + edge.weight
+                if new_visit_cost < BLOCKED and new_visit_cost < best_costs.get(neighbour, BLOCKED):
+                    best_costs[neighbour] = new_visit_cost
+                    heappush(queue, (new_visit_cost, neighbour.ID, neighbour))
+        return visit_costs
 
     def flip(self, y):
         """
@@ -367,9 +433,37 @@ class Graph:
         Perform a reflection, ie: 180 degree rotation of the graph about a horizontal axis with the given y-value.
         :param y: the height of the horizontal axis over which the graph will flip
         :return: nothing
+        :raises ValueError: if the graph has been cloned or is a clone.
         """
+        if self.owned_nodes is not None:
+            raise ValueError('the graph shares its nodes with a clone, copy the graph to flip it')
         for node in self.mapping:
             node.y = y - node.y
+        positions = {}
+        for position in self.nodes_by_position:
+            positions[(position[0], y - position[1])] = self.nodes_by_position[position]
+        self.nodes_by_position = positions
+
+    def translate(self, dx, dy):
+        """
+        Shift every node in the graph by the same displacement.
+
+        Nodes must be moved through this method (or flip) rather than by editing their coordinates directly, otherwise
+        the graph's position index goes stale.
+        :param dx: displacement along the x axis.
+        :param dy: displacement along the y axis.
+        :return: nothing
+        :raises ValueError: if the graph has been cloned or is a clone.
+        """
+        if self.owned_nodes is not None:
+            raise ValueError('the graph shares its nodes with a clone, copy the graph to translate it')
+        for node in self.mapping:
+            node.x += dx
+            node.y += dy
+        positions = {}
+        for position in self.nodes_by_position:
+            positions[(position[0] + dx, position[1] + dy)] = self.nodes_by_position[position]
+        self.nodes_by_position = positions
 
     def generate_dict(self):
         # TODO: This is not ready yet
@@ -379,8 +473,7 @@ class Graph:
         # get only one instance of each edge
         edge_set = set()
         for node in self.mapping:
-            for edge in self.mapping[node]:
-                edge_set.add(edge)
+            edge_set.update(self.mapping[node].itervalues())
         edges = []
         # now turn each of those into a dictionary
         for edge in edge_set:
@@ -0,0 +1,333 @@
+"""
+Load test a WarpWars server: many idle long polls held open at once, plus a few clients making short requests.
+
+The test starts the server itself, either async_server.py or application.py under Flask's threaded development server,
+or runs against a server that is already up. It reports the server's memory with the idle polls open, the throughput
+and latency of the active clients while they are held, and how long it takes to answer every idle poll after a move.
+Last, it times the round trip of an action until its changes arrive, as an update request answered through a long
+poll and, when the server offers one, over a WebSocket.
+
+    python loadtest.py --server async --idle 2000
+    python loadtest.py --server flask --idle 200
+"""
+
+import argparse
+import base64
+import errno
+import httplib
+import json
+import os
+import resource
+import select
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+SERVER_COMMANDS = {
+    'async': lambda port: [sys.executable, os.path.join(DIRECTORY, 'async_server.py'), '--port', str(port),
+                           '--poll-timeout', '600'],
+    'flask': lambda port: [sys.executable, '-c', 'import application; '
+                           'application.POLL_TIMEOUT = 600; '
+                           'application.app.run(port=%d, threaded=True)' % port],
+}
+START_TIMEOUT = 10  # seconds to wait for a started server to answer
+
+def free_port():
+    """
+    Find a port nobody listens on.
+
+    :return: a port number.
+    """
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+def raise_file_limit():
+    """
+    Allow this process as many open files as the system lets it, since every idle poll is a socket.
+
+    :return: the new limit.
+    """
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return hard
+
+def get(host, port, path, cookie=None):
+    """
+    Make a request on a new connection.
+
+    :return: (status, headers, body).
+    """
+    connection = httplib.HTTPConnection(host, port, timeout=30)
+    connection.request('GET', path, headers={'Cookie': cookie} if cookie else {})
+    response = connection.getresponse()
+    result = (response.status, dict(response.getheaders()), response.read())
+    connection.close()
+    return result
+
+def wait_for_server(host, port):
+    deadline = time.time() + START_TIMEOUT
+    while True:
+        try:
+            return get(host, port, '/static/ajax.js')
+        except (socket.error, httplib.HTTPException):
+            if time.time() > deadline:
+                raise
+            time.sleep(0.1)
+
+def resident_memory(pid):
+    """
+    Return the resident memory of a process, in kilobytes, or None if it cannot be read.
+
+    :param pid: the process id.
+    """
+    try:
+        with open('/proc/%d/status' % pid) as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except IOError:
+        return None
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction*len(values)))] if values else float('nan')
+
+def open_polls(host, port, path, n):
+    """
+    Send a long poll on each of n new connections, without waiting for the answers.
+
+    :return: a list of sockets, fewer than n if the server or the system refused connections.
+    """
+    sockets = []
+    request = 'GET %s HTTP/1.1\r\nHost: %s\r\n\r\n' % (path, host)
+    for i in range(n):
+        sock = socket.socket()
+        try:
+            sock.connect((host, port))
+            sock.sendall(request)
+        except socket.error as error:
+            sock.close()
+            print 'opened %d idle polls of %d: %s' % (len(sockets), n, error)
+            break
+        sock.setblocking(False)
+        sockets.append(sock)
+    return sockets
+
+def wait_for_answers(sockets, start, timeout):
+    """
+    Wait until every socket has received an answer.
+
+    :param start: the time to measure from.
+    :return: (number answered, seconds from start until the last answer).
+    """
+    waiting = set(sockets)
+    poller = select.poll()
+    by_fd = {}
+    for sock in sockets:
+        poller.register(sock.fileno(), select.POLLIN)
+        by_fd[sock.fileno()] = sock
+    last = start
+    while waiting and time.time() < start + timeout:
+        for fd, flags in poller.poll(100):
+            sock = by_fd[fd]
+            try:
+                sock.recv(65536)
+            except socket.error as error:
+                if error.errno == errno.EAGAIN:
+                    continue
+            if sock in waiting:
+                waiting.discard(sock)
+                poller.unregister(fd)
+                last = time.time()
+    return len(sockets) - len(waiting), last - start
+
+def run_clients(host, port, game_id, n_clients, duration):
+    """
+    Make /state and /changed requests from n_clients threads for duration seconds, each on a kept-alive connection.
+
+    :return: a list of request latencies in seconds, and the number of failed requests.
+    """
+    latencies = []
+    failures = [0]
+    lock = threading.Lock()
+    stop = time.time() + duration
+    paths = ['/state/game/%d' % game_id, '/changed/game/%d/0' % game_id]
+    def client():
+        connection = httplib.HTTPConnection(host, port, timeout=30)
+        own = []
+        i = 0
+        while time.time() < stop:
+            start = time.time()
+            try:
+                connection.request('GET', paths[i % len(paths)])
+                connection.getresponse().read()
+                own.append(time.time() - start)
+            except (socket.error, httplib.HTTPException):
+                with lock:
+                    failures[0] += 1
+                connection.close()
+                connection = httplib.HTTPConnection(host, port, timeout=30)
+            i += 1
+        connection.close()
+        with lock:
+            latencies.extend(own)
+    threads = [threading.Thread(target=client) for i in range(n_clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, failures[0]
+
+def open_socket(host, port, path, cookie):
+    """
+    Open a WebSocket.
+
+    :return: the socket, or None if the server refused the handshake.
+    """
+    sock = socket.create_connection((host, port), 30)
+    sock.sendall('GET %s HTTP/1.1\r\nHost: %s:%d\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+                 'Sec-WebSocket-Key: %s\r\nSec-WebSocket-Version: 13\r\nCookie: %s\r\n\r\n'
+                 % (path, host, port, base64.b64encode(os.urandom(16)), cookie))
+    head = ''
+    while not head.endswith('\r\n\r\n'):
+        data = sock.recv(1)
+        if not data:
+            break
+        head += data
+    if not head.startswith('HTTP/1.1 101'):
+        sock.close()
+        return None
+    return sock
+
+def send_message(sock, message):
+    # frames from clients must be masked; an all zero mask leaves the payload as it is
+    sock.sendall(struct.pack('!BB', 0x81, 0x80 | len(message)) + '\0\0\0\0' + message)
+
+def receive(sock, n):
+    data = ''
+    while len(data) < n:
+        chunk = sock.recv(n - len(data))
+        if not chunk:
+            raise socket.error('connection closed')
+        data += chunk
+    return data
+
+def read_message(sock):
+    opcode, length = struct.unpack('!BB', receive(sock, 2))
+    if length == 126:
+        length = struct.unpack('!H', receive(sock, 2))[0]
+    elif length == 127:
+        length = struct.unpack('!Q', receive(sock, 8))[0]
+    return json.loads(receive(sock, length))
+
+def time_actions(host, port, n_actions):
+    """
+    Time ending turns in a new game until the client sees the new state, first as update requests followed by long
+    polls, as game.html does without a WebSocket, then over WebSockets, one per color, if the server has them.
+
+    :return: (latencies of requests, latencies over WebSockets or None), in seconds.
+    """
+    status, headers, body = get(host, port, '/create/game')
+    game_id = int(headers['location'].rstrip('/').rsplit('/', 1)[1])
+    black_cookie = headers.get('set-cookie', '').split(';')[0]
+    white_cookie = get(host, port, '/join/game/%d/as/white' % game_id)[1].get('set-cookie', '').split(';')[0]
+    update = httplib.HTTPConnection(host, port, timeout=30)
+    poll = httplib.HTTPConnection(host, port, timeout=30)
+    request_latencies = []
+    for i in range(n_actions):
+        state_ID = json.loads(get(host, port, '/state/game/%d' % game_id)[2])['state_ID']
+        poll.request('GET', '/poll/game/%d/%d' % (game_id, state_ID))
+        start = time.time()
+        update.request('GET', '/update/game/%d/end/turn' % game_id)
+        update.getresponse().read()
+        poll.getresponse().read()
+        request_latencies.append(time.time() - start)
+    state = json.loads(get(host, port, '/state/game/%d' % game_id)[2])
+    sockets = {}  # key: color -> item: WebSocket playing that color
+    for color, cookie in ((0, white_cookie), (1, black_cookie)):
+        sock = open_socket(host, port, '/socket/game/%d/%d' % (game_id, state['state_ID']), cookie)
+        if sock is None:
+            return request_latencies, None
+        sockets[color] = sock
+    socket_latencies = []
+    active_color = state['active_color']
+    for i in range(n_actions):
+        start = time.time()
+        send_message(sockets[active_color], json.dumps([i, 'end_turn']))
+        read_message(sockets[active_color])  # the acknowledgement
+        read_message(sockets[active_color])
+        socket_latencies.append(time.time() - start)
+        # the opponent is sent the same changes
+        active_color = read_message(sockets[1 - active_color])['active_color']
+    for sock in sockets.values():
+        sock.close()
+    return request_latencies, socket_latencies
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Load test a WarpWars server.')
+    parser.add_argument('--server', choices=sorted(SERVER_COMMANDS), default='async', help='server to start')
+    parser.add_argument('--url', help='host:port of a running server to test instead of starting one')
+    parser.add_argument('--idle', type=int, default=1000, help='number of idle long polls to hold open')
+    parser.add_argument('--clients', type=int, default=8, help='number of active clients')
+    parser.add_argument('--duration', type=float, default=5, help='seconds the active clients run')
+    parser.add_argument('--actions', type=int, default=200, help='number of actions to time')
+    arguments = parser.parse_args(argv)
+    raise_file_limit()
+    process = None
+    if arguments.url:
+        host, port = arguments.url.rsplit(':', 1)
+        port = int(port)
+        name = arguments.url
+    else:
+        host, port = '127.0.0.1', free_port()
+        process = subprocess.Popen(SERVER_COMMANDS[arguments.server](port), cwd=DIRECTORY,
+                                   preexec_fn=raise_file_limit)
+        name = arguments.server
+    try:
+        wait_for_server(host, port)
+        if process is not None:
+            print '%s server: %s kB resident at start' % (name, resident_memory(process.pid))
+        status, headers, body = get(host, port, '/create/game')
+        game_id = int(headers['location'].rstrip('/').rsplit('/', 1)[1])
+        cookie = headers.get('set-cookie', '').split(';')[0]
+        state_ID = json.loads(get(host, port, '/state/game/%d' % game_id)[2])['state_ID']
+
+        start = time.time()
+        sockets = open_polls(host, port, '/poll/game/%d/%d' % (game_id, state_ID), arguments.idle)
+        print '%d idle polls opened in %.2f s' % (len(sockets), time.time() - start)
+        time.sleep(0.5)
+        if process is not None:
+            print '%s server: %s kB resident with the polls open' % (name, resident_memory(process.pid))
+
+        latencies, failures = run_clients(host, port, game_id, arguments.clients, arguments.duration)
+        print '%d active clients: %.0f requests/s, latency p50 %.1f ms, p99 %.1f ms, %d failed' % (
+            arguments.clients, len(latencies)/arguments.duration, 1000*percentile(latencies, 0.5),
+            1000*percentile(latencies, 0.99), failures)
+
+        start = time.time()
+        get(host, port, '/update/game/%d/end/turn' % game_id, cookie)
+        answered, elapsed = wait_for_answers(sockets, start, 60)
+        print 'a move answered %d of %d idle polls in %.1f ms' % (answered, len(sockets), 1000*elapsed)
+        for sock in sockets:
+            sock.close()
+
+        request_latencies, socket_latencies = time_actions(host, port, arguments.actions)
+        print 'actions as requests: p50 %.2f ms, p99 %.2f ms' % (1000*percentile(request_latencies, 0.5),
+                                                                1000*percentile(request_latencies, 0.99))
+        if socket_latencies is not None:
+            print 'actions over WebSockets: p50 %.2f ms, p99 %.2f ms' % (1000*percentile(socket_latencies, 0.5),
+                                                                        1000*percentile(socket_latencies, 0.99))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
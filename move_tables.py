@@ -0,0 +1,228 @@
+"""
+Precomputed move tables: for every unit type, flipped or not, and every square, where a unit there can move.
+
+Movement graphs never change, and neither does the board's size, so which squares a unit may reach from a square and
+which squares must be empty on the way can be worked out once. The tables are cached to disk and loaded on first use,
+after which finding legal moves only walks short lists of squares against the board, without searching any graph.
+
+The moves of a unit on a square are a SquareMoves tuple of three parts:
+steps -- destinations that can never be blocked.
+rays -- lists of destinations in order, where each can only be reached when every earlier one is empty, so a unit moves
+    along a ray up to and including the first occupied square.
+guarded -- pairs of a destination and the sets of squares guarding it; the destination can be reached when every square
+    of any one of the sets is empty.
+Squares are (x, y) tuples. Destinations are on the board and are never the unit's own square.
+"""
+
+import marshal
+import os
+from collections import namedtuple
+from hashlib import sha1
+from threading import Lock
+
+import card_dictionary
+import constants
+import edge
+import graph
+import node
+from constants import *
+from card_dictionary import CARD_DICTIONARY, get_moves
+
+MOVE_TABLES_VERSION = 1
+MOVE_TABLES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'move_tables.cache')
+
+SquareMoves = namedtuple('SquareMoves', ['steps', 'rays', 'guarded'])
+
+# key: (unit_type, flipped) -> item: list of SquareMoves indexed by x*BOARD_HEIGHT + y, filled by load_tables
+MOVE_TABLES = {}
+MOVE_TABLES_LOCK = Lock()  # held by get_square_moves while it finds MOVE_TABLES empty and fills it
+
+def add_minimal(sets, new_set):
+    """
+    Add a set to a list of sets none of which contains another, keeping that property.
+
+    :param sets: a list of frozensets, modified in place.
+    :param new_set: the frozenset to add.
+    :return: True if new_set was added, False if some set in the list was already a subset of it.
+    """
+    for old_set in sets:
+        if old_set <= new_set:
+            return False
+    sets[:] = [old_set for old_set in sets if not new_set <= old_set]
+    sets.append(new_set)
+    return True
+
+def relative_guards(graph):
+    """
+    Find, for every position in a movement graph, which other positions must be empty for a unit to move there.
+
+    A unit can move to a node when some node in the destination's neighbourhood can be reached without passing through
+    an occupied position. The unit's own position, (0, 0), never blocks. The result lists, for every destination, the
+    smallest sets of positions that must be empty, any one of which is enough; an empty set means the move can never be
+    blocked.
+    :param graph: a movement graph relative to the unit's position.
+    :return: a dictionary mapping each (dx, dy) to a list of frozensets of (dx, dy) tuples.
+    """
+    origin = graph.find_node_by_position(0, 0)
+    if origin is None:
+        return {}
+    # reach[node] lists the minimal sets of positions that must be empty for the unit to reach the node
+    reach = {origin: [frozenset()]}
+    queue = [origin]
+    while queue:
+        node = queue.pop()
+        for neighbour in graph.neighbourhood(node):
+            position = (neighbour.x, neighbour.y)
+            for guard in reach[node]:
+                new_guard = guard if position == (0, 0) else guard | frozenset([position])
+                if add_minimal(reach.setdefault(neighbour, []), new_guard) and neighbour not in queue:
+                    queue.append(neighbour)
+    guards = {}
+    for position in graph.nodes_by_position:
+        if position == (0, 0):
+            continue
+        target = graph.find_node_by_position(position[0], position[1])
+        target_guards = []
+        for node in graph.neighbourhood(target):
+            for guard in reach.get(node, ()):
+                add_minimal(target_guards, guard)
+        if target_guards:
+            guards[position] = target_guards
+    return guards
+
+def on_board(x, y):
+    """
+    Return whether a position is on the board.
+
+    :param x: x coordinate.
+    :param y: y coordinate.
+    :return: True or False.
+    """
+    return 0 <= x < BOARD_LENGTH and 0 <= y < BOARD_HEIGHT
+
+def square_moves(guards, x, y):
+    """
+    Work out the moves of a unit on a square from the guards of its movement graph.
+
+    :param guards: the guards of the movement graph, as returned by relative_guards.
+    :param x: x coordinate of the unit.
+    :param y: y coordinate of the unit.
+    :return: a SquareMoves tuple.
+    """
+    absolute_guards = {}
+    for dx, dy in guards:
+        if not on_board(x + dx, y + dy):
+            continue
+        target_guards = []
+        for guard in guards[(dx, dy)]:
+            # positions off the board are never occupied, so they never block
+            add_minimal(target_guards, frozenset((x + gx, y + gy) for gx, gy in guard if on_board(x + gx, y + gy)))
+        absolute_guards[(x + dx, y + dy)] = target_guards
+    # a destination guarded by exactly the squares of a ray, in any order, extends that ray
+    guarded = []
+    chains = {frozenset(): [()]}  # key: set of squares -> item: tuples of those squares in ray order
+    for target in sorted(absolute_guards, key=lambda target: (len(absolute_guards[target][0]), target)):
+        target_guards = absolute_guards[target]
+        prefixes = chains.get(target_guards[0], []) if len(target_guards) == 1 else []
+        if not prefixes:
+            guarded.append((target, tuple(tuple(sorted(guard)) for guard in target_guards)))
+            continue
+        key = target_guards[0] | frozenset([target])
+        for prefix in prefixes:
+            chains.setdefault(key, []).append(prefix + (target,))
+    # keep only the longest chains, every other chain is a prefix of one of them
+    chains = [chain for key in chains for chain in chains[key] if chain]
+    prefixes = set(chain[:-1] for chain in chains)
+    steps = []
+    rays = []
+    for chain in sorted(chains):
+        if chain in prefixes:
+            continue
+        if len(chain) == 1:
+            steps.append(chain[0])
+        else:
+            rays.append(chain)
+    return SquareMoves(tuple(steps), tuple(rays), tuple(guarded))
+
+def build_tables():
+    """
+    Work out the move tables of every unit type, flipped or not, from their movement graphs.
+
+    :return: a dictionary mapping (unit_type, flipped) to a list of SquareMoves indexed by x*BOARD_HEIGHT + y.
+    """
+    tables = {}
+    for unit_type in CARD_DICTIONARY:
+        for flipped in (False, True):
+            guards = relative_guards(get_moves(unit_type, flipped))
+            tables[(unit_type, flipped)] = [square_moves(guards, x, y) for x in range(BOARD_LENGTH)
+                                            for y in range(BOARD_HEIGHT)]
+    return tables
+
+def fingerprint():
+    """
+    Return a digest of everything the tables are worked out from, so that out of date caches can be noticed.
+
+    The movement graphs are not built for this, which would undo the point of loading a cache: the source of the
+    modules defining them stands for them.
+    :return: a string.
+    """
+    digest = sha1(repr(MOVE_TABLES_VERSION))
+    for module in (card_dictionary, constants, edge, graph, node):
+        with open(os.path.splitext(module.__file__)[0] + '.py', 'rb') as source:
+            digest.update(source.read())
+    return digest.hexdigest()
+
+def load_tables(path=None):
+    """
+    Fill MOVE_TABLES from the cache on disk, working the tables out and writing the cache if it is missing or old.
+
+    A cache that cannot be written is not an error, the tables are then simply worked out by every process. Neither is
+    missing source, though then no cache is trusted. The tables are put into MOVE_TABLES in a single update, so threads
+    looking at it never see some unit types without the others.
+    :param path: file name of the cache, or None for MOVE_TABLES_PATH.
+    :return: nothing.
+    """
+    if path is None:
+        path = MOVE_TABLES_PATH
+    try:
+        key = fingerprint()
+    except IOError:
+        key = None
+    tables = None
+    try:
+        with open(path, 'rb') as cache:
+            cached_key, cached_tables = marshal.load(cache)
+        if key is not None and cached_key == key:
+            tables = cached_tables
+    except (IOError, EOFError, ValueError, TypeError):
+        pass
+    if tables is None:
+        tables = build_tables()
+        if key is not None:
+            try:
+                with open(path + '.tmp', 'wb') as cache:
+                    marshal.dump((key, dict((table_key, [tuple(moves) for moves in tables[table_key]])
+                                            for table_key in tables)), cache)
+                os.rename(path + '.tmp', path)
+            except (IOError, OSError):
+                pass
+    MOVE_TABLES.update(dict((table_key, [SquareMoves(*moves) for moves in tables[table_key]]) for table_key in tables))
+
+def get_square_moves(unit_type, flipped, x, y):
+    """
+    Return the moves of a unit of some type on a square, loading the tables on first use.
+
+    Request, shard and computer player threads may all make the first lookup at once; only one of them loads the tables,
+    and the others wait for it.
+
+    :param unit_type: number specifying the type of the unit, eg: WARPLING_TYPE.
+    :param flipped: True if the unit belongs to a flipped player.
+    :param x: x coordinate of the unit.
+    :param y: y coordinate of the unit.
+    :return: a SquareMoves tuple.
+    """
+    if not MOVE_TABLES:
+        with MOVE_TABLES_LOCK:
+            if not MOVE_TABLES:
+                load_tables()
+    return MOVE_TABLES[(unit_type, flipped)][x*BOARD_HEIGHT + y]
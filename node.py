@@ -1,10 +1,11 @@
-class Node:
+class Node(object):
     """
     A node connects to other nodes via Edges to form a graph
 
     Each node has a unique identifier (ID) so they can be mathematically distinct. Optionally, a node also has an x and
     y coordinate.
     """
+    __slots__ = ('ID', 'x', 'y')  # no per-node __dict__, graphs hold many nodes
     n_nodes = 0
     def __init__(self, x=0, y=0):
         """
@@ -25,6 +26,12 @@ class Node:
     def __hash__(self):
         return hash(self.ID)
 
+    def __getstate__(self):
+        return (self.ID, self.x, self.y)
+
+    def __setstate__(self, state):
+        self.ID, self.x, self.y = state
+
     def copy(self):
         node = Node()
         node.ID = self.ID
@@ -0,0 +1,172 @@
+"""
+Ready made games to start from, for the server, the simulator, the benchmarks and the tests, and the graph search that
+move generation is checked and measured against.
+"""
+
+import random
+
+from game import Game
+from card_dictionary import CARD_DICTIONARY
+from player import Player
+from constants import *
+
+def make_game():
+    """
+    Return a game in the standard setup: both players' units deployed across their start zones, and their hands dealt.
+
+    :return: a Game.
+    """
+    game = Game()
+    game.players = [Player(WHITE), Player(BLACK, True)]
+    for player in game.players:
+        player.warp = 1000
+        player.add_card(WARPLING_TYPE, BOARD_LENGTH*START_ZONE_HEIGHT)
+        player.add_card(ROOK_TYPE, 2)
+        player.add_card(QUEEN_TYPE, 1)
+        player.add_card(KING_TYPE, 1)
+        player.add_card(GOLD_GENERAL_TYPE, 2)
+        player.add_card(SILVER_GENERAL_TYPE, 2)
+
+        game.active_color = player.color
+        game.deploy(WARPLING_TYPE, player.color, 1, player.adjust(0), False)
+        game.deploy(ROOK_TYPE, player.color, 3, player.adjust(0), False)
+        game.deploy(KING_TYPE, player.color, 4, player.adjust(0), False)
+        game.deploy(QUEEN_TYPE, player.color, 5, player.adjust(0), False)
+        game.deploy(ROOK_TYPE, player.color, 6, player.adjust(0), False)
+        game.deploy(WARPLING_TYPE, player.color, 8, player.adjust(0), False)
+
+        game.deploy(WARPLING_TYPE, player.color, 0, player.adjust(1), False)
+        game.deploy(WARPLING_TYPE, player.color, 2, player.adjust(1), False)
+        game.deploy(SILVER_GENERAL_TYPE, player.color, 3, player.adjust(1), False)
+        game.deploy(GOLD_GENERAL_TYPE, player.color, 4, player.adjust(1), False)
+        game.deploy(GOLD_GENERAL_TYPE, player.color, 5, player.adjust(1), False)
+        game.deploy(SILVER_GENERAL_TYPE, player.color, 6, player.adjust(1), False)
+        game.deploy(WARPLING_TYPE, player.color, 7, player.adjust(1), False)
+        game.deploy(WARPLING_TYPE, player.color, 9, player.adjust(1), False)
+
+        for x in range(BOARD_LENGTH):
+            if x not in {0, 2, 7, 9}:
+                game.deploy(WARPLING_TYPE, player.color, x, player.adjust(2), False)
+        player.warp = 1
+
+        player.remove_card(WARPLING_TYPE)
+        player.remove_card(KING_TYPE)
+        player.remove_card(QUEEN_TYPE)
+        player.remove_card(GOLD_GENERAL_TYPE)
+        player.remove_card(SILVER_GENERAL_TYPE)
+
+        player.add_card(SUPER_PAWN_TYPE, 6)
+        player.add_card(LANCE_TYPE, 5)
+        player.add_card(KNIGHT_TYPE, 4)
+        player.add_card(BISHOP_TYPE, 4)
+        player.add_card(ROOK_TYPE, 3)
+        player.add_card(PROMOTED_BISHOP_TYPE, 2)
+        player.add_card(PROMOTED_ROOK_TYPE, 1)
+
+    game.turn = 1
+    game.active_color = STARTING_PLAYER
+    return game
+
+def test_game():
+    """
+    Return a small game of one warpling for each player, for trying things out.
+
+    :return: a Game.
+    """
+    return_game = Game()
+    return_game.players = [Player(WHITE), Player(BLACK)]
+    for player in return_game.players:
+        player.add_card(WARPLING_TYPE, BOARD_LENGTH*BOARD_HEIGHT)
+    return_game.active_color = WHITE
+    return_game.deploy(WARPLING_TYPE, WHITE, 5, 5, False)
+    return_game.active_color = BLACK
+    return_game.deploy(WARPLING_TYPE, BLACK, 6, 6, False)
+    return_game.turn = 1
+    return return_game
+
+def checkers_game():
+    """
+    Return a game with a checkers style arrangement of warplings, guarded by a king on each side.
+
+    :return: a Game.
+    """
+    game = Game()
+    game.players = [Player(WHITE), Player(BLACK, True)]
+    for player in game.players:
+        player.add_card(WARPLING_TYPE, BOARD_LENGTH*START_ZONE_HEIGHT)
+        player.add_card(KNIGHT_TYPE, 7)
+        player.add_card(BISHOP_TYPE, 7)
+        player.add_card(ROOK_TYPE, 5)
+        player.add_card(QUEEN_TYPE, 1)
+        player.add_card(KING_TYPE, 1)
+
+    game.active_color = game.players[0].color
+    for x in range(BOARD_LENGTH):
+        for y in range(START_ZONE_HEIGHT):
+            if (x, y) == (BOARD_LENGTH/2, 0):
+                game.deploy(KING_TYPE, game.active_color, x, y, False)
+            elif (x % 2) == (y % 2):
+                game.deploy(WARPLING_TYPE, game.players[0].color, x, y, False)
+
+    game.active_color = game.players[1].color
+    for x in range(BOARD_LENGTH):
+        for y in range(BOARD_HEIGHT - START_ZONE_HEIGHT, BOARD_HEIGHT):
+            if (x, y) == (BOARD_LENGTH/2, BOARD_HEIGHT - 1):
+                game.deploy(KING_TYPE, game.active_color, x, y, False)
+            elif x % 2 == (y - (BOARD_HEIGHT - START_ZONE_HEIGHT)) % 2:
+                game.deploy(WARPLING_TYPE, game.players[1].color, x, y, False)
+
+    game.active_color = STARTING_PLAYER
+    game.turn = 1
+    return game
+
+def random_game(seed, n_units=16, n_obstructions=3, bitboard=False):
+    """
+    Return a game with units of random types and colors scattered over the board, and a few obstructions.
+
+    :param seed: seed of the random choices, so the same seed always gives the same game.
+    :param n_units: number of units to place.
+    :param n_obstructions: number of obstructed squares.
+    :param bitboard: True to keep a bitboard of the game, see Game.
+    :return: a Game.
+    """
+    rng = random.Random(seed)
+    game = Game(bitboard)
+    game.players = [Player(WHITE), Player(BLACK, True)]
+    squares = [(x, y) for x in range(BOARD_LENGTH) for y in range(BOARD_HEIGHT)]
+    rng.shuffle(squares)
+    unit_types = sorted(CARD_DICTIONARY.keys())
+    for x, y in squares[:n_units]:
+        game.active_color = rng.choice([WHITE, BLACK])
+        game.deploy(rng.choice(unit_types), game.active_color, x, y, False)
+    for x, y in squares[n_units:n_units + n_obstructions]:
+        game.board[x][y] = OBSTRUCTION
+    game.update_movements()
+    game.active_color = STARTING_PLAYER
+    game.turn = 1
+    return game
+
+def graph_destinations(game, unit):
+    """
+    Find where a unit can move by searching its movement graph, as Game did before the move tables.
+
+    :param game: the Game the unit is in.
+    :param unit: the Unit.
+    :return: a set of (x, y) tuples.
+    """
+    movement = unit.moves
+    start_node = movement.find_node_by_position(0, 0)
+    if start_node is None:
+        return set()
+    blocked = lambda node: game.is_blocking(unit, unit.x + node.x, unit.y + node.y)
+    reachable = movement.traversal_costs(start_node, blocked=blocked)
+    destinations = set()
+    for node in reachable:
+        for neighbour in movement.neighbourhood(node):
+            x = unit.x + neighbour.x
+            y = unit.y + neighbour.y
+            if not (0 <= x < BOARD_LENGTH and 0 <= y < BOARD_HEIGHT) or (x, y) == (unit.x, unit.y):
+                continue
+            if game.board[x][y] != unit.color and game.board[x][y] != OBSTRUCTION:
+                destinations.add((x, y))
+    return destinations
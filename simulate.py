@@ -0,0 +1,204 @@
+"""
+Headless self-play, for tuning card costs and warp income from the results of many games.
+
+Games are played from the standard setup by pluggable policies, spread over every core with a process pool, and their
+results are streamed to a file of fixed size binary records as they finish. Run `python simulate.py --help` for options.
+
+The game itself has no rule for ending yet, so here a game is won by taking the opponent's king, and is a draw when
+neither king has been taken after a number of turns.
+"""
+
+import argparse
+import random
+import sys
+import time
+from multiprocessing import Pool, cpu_count
+from struct import Struct
+
+from constants import *
+from card_dictionary import CARD_DICTIONARY
+from ai import Searcher
+from setups import make_game
+
+RESULTS_MAGIC = 'WWSR'
+RESULTS_VERSION = 1
+DRAW = -1  # winner of a game where neither king was taken
+
+UNIT_TYPES = sorted(CARD_DICTIONARY)  # order of the deploy counts in a record
+# all fields are big-endian with no padding
+RESULTS_HEADER = Struct('!4sBB')  # magic, version, number of unit types
+UNIT_TYPE = Struct('!B')  # one per unit type, in the order of the deploy counts
+RESULT = Struct('!IbHI%dH' % (2*len(UNIT_TYPES)))  # seed, winner, turns, actions, units deployed per color and type
+
+DEFAULT_MAX_TURNS = 200
+SEARCH_NODE_LIMIT = 200  # positions the search policy looks at per action
+
+def random_policy(game, rng):
+    """
+    Choose any legal action.
+
+    :param game: the game, with its active player to act.
+    :param rng: a random.Random.
+    :return: an action tuple.
+    """
+    return rng.choice(game.legal_actions())
+
+def greedy_policy(game, rng):
+    """
+    Choose the action leading to the best position one action ahead, breaking ties at random.
+
+    :param game: the game, with its active player to act.
+    :param rng: a random.Random.
+    :return: an action tuple.
+    """
+    searcher = Searcher()
+    color = game.active_color
+    best_value = None
+    best_actions = []
+    for action in game.legal_actions():
+        record = game.apply(action)
+        value = searcher.evaluate(game)
+        if game.active_color != color:
+            value = -value
+        game.undo(record)
+        if best_value is None or value > best_value:
+            best_value = value
+            best_actions = [action]
+        elif value == best_value:
+            best_actions.append(action)
+    return rng.choice(best_actions)
+
+def search_policy(game, rng):
+    """
+    Choose an action with a small alpha-beta search.
+
+    :param game: the game, with its active player to act.
+    :param rng: a random.Random, unused since the search is deterministic.
+    :return: an action tuple.
+    """
+    return Searcher(time_limit=None, node_limit=SEARCH_NODE_LIMIT).choose(game)
+
+# key: name used on the command line -> item: function taking a game and a random.Random and returning an action
+POLICIES = {
+    'random': random_policy,
+    'greedy': greedy_policy,
+    'search': search_policy,
+}
+
+def winner(game):
+    """
+    Return the color that has taken the other's king.
+
+    :param game: the game.
+    :return: WHITE or BLACK, or None if both players still have a king.
+    """
+    kings = set(unit.color for unit in game.units.values() if unit.type == KING_TYPE)
+    if len(kings) == 1:
+        return kings.pop()
+    return None
+
+def play_game(task):
+    """
+    Play one game to the end.
+
+    :param task: a tuple (seed, white policy name, black policy name, maximum number of turns).
+    :return: a tuple of the fields of a RESULT record.
+    """
+    seed, white, black, max_turns = task
+    rng = random.Random(seed)
+    policies = [POLICIES[white], POLICIES[black]]
+    game = make_game()
+    deployed = dict(((color, unit_type), 0) for color in (WHITE, BLACK) for unit_type in UNIT_TYPES)
+    n_actions = 0
+    result = None
+    while result is None and game.turn <= max_turns:
+        action = policies[game.active_color](game, rng)
+        if action[0] == DEPLOY_ACTION:
+            deployed[(game.active_color, action[1])] += 1
+        game.perform(action)
+        n_actions += 1
+        result = winner(game)
+    counts = [deployed[(color, unit_type)] for color in (WHITE, BLACK) for unit_type in UNIT_TYPES]
+    return (seed, DRAW if result is None else result, game.turn, n_actions) + tuple(counts)
+
+def read_results(path):
+    """
+    Read the results written by simulate.
+
+    :param path: the results file.
+    :return: a generator of dictionaries with keys 'seed', 'winner', 'turns', 'actions' and 'deployed', the last mapping
+    (color, unit_type) to the number of units deployed.
+    :raises ValueError: if the file was not written by this version of simulate.
+    """
+    with open(path, 'rb') as results:
+        magic, version, n_types = RESULTS_HEADER.unpack(results.read(RESULTS_HEADER.size))
+        if magic != RESULTS_MAGIC or version != RESULTS_VERSION:
+            raise ValueError('not a version %d results file' % RESULTS_VERSION)
+        unit_types = [UNIT_TYPE.unpack(results.read(UNIT_TYPE.size))[0] for i in range(n_types)]
+        record = Struct('!IbHI%dH' % (2*n_types))
+        keys = [(color, unit_type) for color in (WHITE, BLACK) for unit_type in unit_types]
+        while True:
+            data = results.read(record.size)
+            if len(data) < record.size:
+                return
+            fields = record.unpack(data)
+            yield {'seed': fields[0], 'winner': fields[1], 'turns': fields[2], 'actions': fields[3],
+                   'deployed': dict(zip(keys, fields[4:]))}
+
+def simulate(path, n_games, white='random', black='random', max_turns=DEFAULT_MAX_TURNS, processes=None, seed=0,
+             progress=None):
+    """
+    Play many games in parallel and write their results to a file.
+
+    :param path: the file to write, replaced if it exists.
+    :param n_games: how many games to play.
+    :param white: name of the policy playing white, a key of POLICIES.
+    :param black: name of the policy playing black, a key of POLICIES.
+    :param max_turns: the number of turns after which a game is a draw.
+    :param processes: number of worker processes, every core if None.
+    :param seed: the seed of the first game, game i uses seed + i.
+    :param progress: when given, a function called with the number of games finished and the seconds taken so far.
+    :return: the number of games played per second.
+    """
+    tasks = [(seed + i, white, black, max_turns) for i in range(n_games)]
+    start = time.time()
+    pool = Pool(processes)
+    try:
+        with open(path, 'wb') as results:
+            results.write(RESULTS_HEADER.pack(RESULTS_MAGIC, RESULTS_VERSION, len(UNIT_TYPES)))
+            for unit_type in UNIT_TYPES:
+                results.write(UNIT_TYPE.pack(unit_type))
+            chunk_size = max(1, min(100, n_games/(4*(processes or cpu_count()))))
+            for n_finished, result in enumerate(pool.imap_unordered(play_game, tasks, chunk_size), 1):
+                results.write(RESULT.pack(*result))
+                if progress is not None:
+                    progress(n_finished, time.time() - start)
+    finally:
+        pool.terminate()
+        pool.join()
+    return n_games/max(time.time() - start, 1e-9)
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Play games between computer players and record the results.')
+    parser.add_argument('output', help='file to write the results to')
+    parser.add_argument('-n', '--games', type=int, default=1000, help='number of games to play')
+    parser.add_argument('-w', '--white', choices=sorted(POLICIES), default='random', help='policy playing white')
+    parser.add_argument('-b', '--black', choices=sorted(POLICIES), default='random', help='policy playing black')
+    parser.add_argument('-t', '--max-turns', type=int, default=DEFAULT_MAX_TURNS, help='turns before a game is a draw')
+    parser.add_argument('-p', '--processes', type=int, default=None, help='worker processes, every core by default')
+    parser.add_argument('-s', '--seed', type=int, default=0, help='seed of the first game')
+    arguments = parser.parse_args(argv)
+    report_interval = max(1, arguments.games/20)
+    def progress(n_finished, elapsed):
+        if n_finished % report_interval == 0 or n_finished == arguments.games:
+            print '%d/%d games, %.1f games per second' % (n_finished, arguments.games, n_finished/max(elapsed, 1e-9))
+    games_per_second = simulate(arguments.output, arguments.games, arguments.white, arguments.black,
+                                arguments.max_turns, arguments.processes, arguments.seed, progress)
+    wins = [0, 0, 0]  # white, black, draws
+    for result in read_results(arguments.output):
+        wins[result['winner']] += 1
+    print 'white won %d, black won %d, %d draws; %.1f games per second' % (wins[WHITE], wins[BLACK], wins[DRAW],
+                                                                            games_per_second)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
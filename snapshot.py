@@ -0,0 +1,101 @@
+"""
+A compact, versioned binary encoding of a Game.
+
+Only the data that cannot be derived is stored: the board, the units' types, colors, positions and IDs, the players and
+their palettes, and the game's counters. Movement graphs are looked up in CARD_DICTIONARY when a snapshot is loaded.
+"""
+
+from struct import Struct
+
+from constants import *
+from card_dictionary import CARD_DICTIONARY, get_moves
+from game import Game
+from player import Player
+
+SNAPSHOT_MAGIC = 'WW'
+SNAPSHOT_VERSION = 1
+
+# all fields are big-endian with no padding
+HEADER = Struct('!2sBBB')  # magic, version, board length, board height
+COUNTERS = Struct('!IBBIIB')  # turn, active_color, phase, n_units_deployed, state_ID, over
+PLAYER = Struct('!BBiB')  # color, flipped, warp, number of cards in the palette
+CARD = Struct('!BHH')  # type, current_amount, starting_amount
+COUNT = Struct('!H')
+UNIT = Struct('!IBBbb')  # ID, type, color, x, y
+BOARD = Struct('!%db' % (BOARD_LENGTH*BOARD_HEIGHT))
+
+def dump(game):
+    """
+    Encode a game as a snapshot.
+
+    :param game: the game to encode.
+    :return: a string of bytes.
+    """
+    parts = [HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, BOARD_LENGTH, BOARD_HEIGHT),
+             COUNTERS.pack(game.turn, game.active_color, game.phase, game.n_units_deployed, game.state_ID, game.over)]
+    tiles = []
+    for column in game.board:
+        tiles.extend(column)
+    parts.append(BOARD.pack(*tiles))
+    parts.append(COUNT.pack(len(game.players)))
+    for player in game.players:
+        parts.append(PLAYER.pack(player.color, player.flipped, player.warp, len(player.palette)))
+        for unit_type in player.palette:
+            card = player.palette[unit_type]
+            parts.append(CARD.pack(unit_type, card.current_amount, card.starting_amount))
+    parts.append(COUNT.pack(len(game.units)))
+    for unit_ID in sorted(game.units):
+        unit = game.units[unit_ID]
+        parts.append(UNIT.pack(unit.ID, unit.type, unit.color, unit.x, unit.y))
+    return ''.join(parts)
+
+def load(data):
+    """
+    Decode a snapshot back into a game.
+
+    :param data: a string of bytes made by snapshot.dump.
+    :return: a new Game object.
+    :raises ValueError: if the data is not a snapshot this version can read.
+    """
+    magic, version, length, height = HEADER.unpack_from(data, 0)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        raise ValueError('not a version %d game snapshot' % SNAPSHOT_VERSION)
+    if (length, height) != (BOARD_LENGTH, BOARD_HEIGHT):
+        raise ValueError('snapshot is for a %dx%d board' % (length, height))
+    offset = HEADER.size
+    game = Game()
+    game.turn, game.active_color, game.phase, game.n_units_deployed, state_ID, over = COUNTERS.unpack_from(data, offset)
+    game.over = bool(over)
+    offset += COUNTERS.size
+    tiles = BOARD.unpack_from(data, offset)
+    offset += BOARD.size
+    for x in range(BOARD_LENGTH):
+        game.board[x] = list(tiles[x*BOARD_HEIGHT:(x + 1)*BOARD_HEIGHT])
+    n_players, = COUNT.unpack_from(data, offset)
+    offset += COUNT.size
+    for i in range(n_players):
+        color, flipped, warp, n_cards = PLAYER.unpack_from(data, offset)
+        offset += PLAYER.size
+        player = Player(color, bool(flipped))
+        player.warp = warp
+        for j in range(n_cards):
+            unit_type, current_amount, starting_amount = CARD.unpack_from(data, offset)
+            offset += CARD.size
+            player.add_card(unit_type, starting_amount)
+            player.palette[unit_type].current_amount = current_amount
+        game.players.append(player)
+    n_units, = COUNT.unpack_from(data, offset)
+    offset += COUNT.size
+    for i in range(n_units):
+        unit_ID, unit_type, color, x, y = UNIT.unpack_from(data, offset)
+        offset += UNIT.size
+        unit = CARD_DICTIONARY[unit_type].copy()
+        unit.moves = get_moves(unit_type, game.players[color].flipped)
+        unit.ID = unit_ID
+        unit.color = color
+        unit.x = x
+        unit.y = y
+        game.units[unit_ID] = unit
+        game.unit_positions[(x, y)] = unit_ID
+    game.state_ID = state_ID
+    return game
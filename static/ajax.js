@@ -1,5 +1,5 @@
-// make AJAX GET request
-function makeGetRequest(url, callback){
+// make AJAX GET request; errorCallback is optional and called if the request fails
+function makeGetRequest(url, callback, errorCallback){
 	var request = new XMLHttpRequest();
 	request.open('GET', url, true);
 	
@@ -11,11 +11,17 @@ function makeGetRequest(url, callback){
 		} else {
 			// We reached our target server, but it returned an error
 			// do something competent, maybe?
+			if(errorCallback !== undefined){
+				errorCallback();
+			}
 		}
 	};
 
 	request.onerror = function() {
 		// There was a connection error of some sort
+		if(errorCallback !== undefined){
+			errorCallback();
+		}
 	};
 
 	request.send();
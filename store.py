@@ -0,0 +1,322 @@
+"""
+Game stores hold every running game so that the server can look them up by game_id.
+
+MemoryGameStore keeps games in the current process and is what a single worker uses. SQLiteGameStore keeps serialized
+games in a database file, so several worker processes on one machine can share them.
+"""
+
+import sqlite3
+from contextlib import contextmanager
+from threading import Condition, Lock, local
+from time import time
+
+import snapshot
+
+STORE_POLL_INTERVAL = 0.1  # seconds between checks for changes made by other processes
+
+class ConflictError(Exception):
+    """
+    Raised when saving a game that was changed by someone else since it was loaded.
+    """
+    pass
+
+class GameStore:
+    """
+    The interface every game store implements.
+
+    Games are identified by integer game_ids handed out by GameStore.create. Changes should be made through
+    GameStore.edit, which locks the game for the duration of the change, so that concurrent requests cannot interleave.
+    """
+
+    def __init__(self):
+        """
+        Create the locks shared by all stores.
+
+        :return: an initialized GameStore object
+        """
+        self.locks = {}  # key: game_id -> item: Lock held while the game is edited
+        self.locks_lock = Lock()  # held while creating entries in self.locks
+        self.changed = Condition()  # notified whenever a game is changed by this process
+
+    def create(self, game):
+        """
+        Add a new game to the store.
+
+        :param game: the game to add.
+        :return: the game_id of the new game.
+        """
+        raise NotImplementedError
+
+    def load(self, game_id):
+        """
+        Return the game with the given game_id.
+
+        :param game_id: the id of the game.
+        :return: the game, or None if it does not exist.
+        """
+        raise NotImplementedError
+
+    def save(self, game_id, game, last_state_ID):
+        """
+        Replace the stored game with the given one.
+
+        :param game_id: the id of the game.
+        :param game: the new version of the game.
+        :param last_state_ID: the state_ID of the game when it was loaded.
+        :return: nothing.
+        :raises ConflictError: if the stored game's state_ID no longer matches last_state_ID.
+        """
+        raise NotImplementedError
+
+    def delete(self, game_id):
+        """
+        Remove a game from the store.
+
+        :param game_id: the id of the game.
+        :return: True if the game existed, otherwise False.
+        """
+        raise NotImplementedError
+
+    def clear(self):
+        """
+        Remove every game from the store.
+
+        :return: nothing.
+        """
+        raise NotImplementedError
+
+    def game_ids(self):
+        """
+        Return the ids of every game in the store.
+
+        :return: a sorted list of game_ids.
+        """
+        raise NotImplementedError
+
+    def state_ID(self, game_id):
+        """
+        Return the current state_ID of a game without loading it.
+
+        :param game_id: the id of the game.
+        :return: the game's state_ID, or None if it does not exist.
+        """
+        raise NotImplementedError
+
+    def __contains__(self, game_id):
+        return self.state_ID(game_id) is not None
+
+    def lock(self, game_id):
+        """
+        Return the lock that serializes edits of a game within this process.
+
+        :param game_id: the id of the game.
+        :return: a Lock.
+        """
+        with self.locks_lock:
+            return self.locks.setdefault(game_id, Lock())
+
+    @contextmanager
+    def edit(self, game_id):
+        """
+        Load a game for changing, and save it afterwards if its state changed.
+
+        Use as `with store.edit(game_id) as game:`. The game is None if it does not exist.
+        :param game_id: the id of the game.
+        :return: a context manager yielding the game.
+        :raises ConflictError: if another process saved the game in the meantime.
+        """
+        with self.lock(game_id):
+            with self.transaction():
+                game = self.load(game_id)
+                last_state_ID = None if game is None else game.state_ID
+                yield game
+                if game is not None and game.state_ID != last_state_ID:
+                    self.save(game_id, game, last_state_ID)
+        self.notify()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Group the loading and saving done by GameStore.edit so that other processes see it as one change.
+
+        :return: a context manager.
+        """
+        yield
+
+    def notify(self):
+        """
+        Wake up every thread waiting for a change.
+
+        :return: nothing.
+        """
+        with self.changed:
+            self.changed.notify_all()
+
+    def wait(self, game_id, last_state_ID, timeout):
+        """
+        Block until a game has a state newer than last_state_ID, it is deleted, or the timeout expires.
+
+        :param game_id: the id of the game.
+        :param last_state_ID: the state_ID to wait past.
+        :param timeout: the longest time to wait, in seconds.
+        :return: the game's state_ID, or None if it does not exist.
+        """
+        deadline = time() + timeout
+        with self.changed:
+            while True:
+                state_ID = self.state_ID(game_id)
+                remaining = deadline - time()
+                if state_ID is None or state_ID > last_state_ID or remaining <= 0:
+                    return state_ID
+                self.changed.wait(self.wait_interval(remaining))
+
+    def wait_interval(self, remaining):
+        """
+        Return how long GameStore.wait sleeps before checking the game again.
+
+        :param remaining: the time left before the wait times out, in seconds.
+        :return: a time in seconds.
+        """
+        return remaining
+
+class MemoryGameStore(GameStore):
+    """
+    A game store that keeps the games themselves in this process.
+
+    Only one worker process can use it, since other processes cannot see its games.
+    """
+
+    def __init__(self):
+        GameStore.__init__(self)
+        self.games = {}  # key: game_id -> item: game
+        self.next_id = 0  # the game_id to use for the next game to be created
+
+    def create(self, game):
+        with self.locks_lock:
+            game_id = self.next_id
+            self.next_id += 1
+            self.games[game_id] = game
+        return game_id
+
+    def load(self, game_id):
+        return self.games.get(game_id)
+
+    def save(self, game_id, game, last_state_ID):
+        stored = self.games.get(game_id)
+        if stored is not game and (stored is None or stored.state_ID != last_state_ID):
+            raise ConflictError(game_id)
+        self.games[game_id] = game
+
+    def delete(self, game_id):
+        existed = self.games.pop(game_id, None) is not None
+        self.notify()
+        return existed
+
+    def clear(self):
+        self.games.clear()
+        self.notify()
+
+    def game_ids(self):
+        return sorted(self.games.keys())
+
+    def state_ID(self, game_id):
+        game = self.games.get(game_id)
+        return None if game is None else game.state_ID
+
+class SQLiteGameStore(GameStore):
+    """
+    A game store that keeps games in an SQLite database as binary snapshots.
+
+    Every process opening the same database file sees the same games. Each edit runs inside a write transaction and
+    saves only if the game's state_ID is unchanged, so edits from different processes cannot overwrite each other.
+    """
+
+    def __init__(self, path):
+        """
+        Open or create the database at the given path.
+
+        :param path: file name of the database.
+        :return: an initialized SQLiteGameStore object
+        """
+        GameStore.__init__(self)
+        self.path = path
+        self.connections = local()  # sqlite3 connections cannot be shared between threads
+        self.connection().execute('CREATE TABLE IF NOT EXISTS games '
+                                  '(game_id INTEGER PRIMARY KEY AUTOINCREMENT, state_ID INTEGER, data BLOB)')
+
+    def connection(self):
+        """
+        Return this thread's connection to the database.
+
+        :return: an sqlite3 Connection in autocommit mode.
+        """
+        connection = getattr(self.connections, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self.connections.connection = connection
+        return connection
+
+    def serialize(self, game):
+        """
+        Convert a game to bytes for storage.
+
+        :param game: the game.
+        :return: a string of bytes.
+        """
+        return sqlite3.Binary(snapshot.dump(game))
+
+    def deserialize(self, data):
+        """
+        Convert stored bytes back to a game.
+
+        :param data: a string of bytes made by SQLiteGameStore.serialize.
+        :return: the game.
+        """
+        return snapshot.load(str(data))
+
+    def create(self, game):
+        cursor = self.connection().execute('INSERT INTO games (state_ID, data) VALUES (?, ?)',
+                                           (game.state_ID, self.serialize(game)))
+        return cursor.lastrowid
+
+    def load(self, game_id):
+        row = self.connection().execute('SELECT data FROM games WHERE game_id = ?', (game_id,)).fetchone()
+        return None if row is None else self.deserialize(row[0])
+
+    def save(self, game_id, game, last_state_ID):
+        cursor = self.connection().execute('UPDATE games SET state_ID = ?, data = ? WHERE game_id = ? AND state_ID = ?',
+                                           (game.state_ID, self.serialize(game), game_id, last_state_ID))
+        if cursor.rowcount != 1:
+            raise ConflictError(game_id)
+
+    def delete(self, game_id):
+        cursor = self.connection().execute('DELETE FROM games WHERE game_id = ?', (game_id,))
+        self.notify()
+        return cursor.rowcount == 1
+
+    def clear(self):
+        self.connection().execute('DELETE FROM games')
+        self.notify()
+
+    def game_ids(self):
+        return [row[0] for row in self.connection().execute('SELECT game_id FROM games ORDER BY game_id')]
+
+    def state_ID(self, game_id):
+        row = self.connection().execute('SELECT state_ID FROM games WHERE game_id = ?', (game_id,)).fetchone()
+        return None if row is None else row[0]
+
+    @contextmanager
+    def transaction(self):
+        # BEGIN IMMEDIATE takes the database's write lock, which other processes wait on
+        connection = self.connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def wait_interval(self, remaining):
+        # changes made by other processes are not notified, so check the database regularly
+        return min(remaining, STORE_POLL_INTERVAL)
@@ -1,107 +1,34 @@
+import httplib
+import marshal
+import os
+import pickle
+import random
+import shutil
+import socket
+import struct
+import sys
+import tempfile
 import unittest
+from json import loads
+from threading import Event, Thread
+from time import sleep
 
 from game import Game
 from card import Card
 from player import Player
 from graph import Graph
+from bitboard import Bitboard
+import move_tables
+import simulate
+import snapshot
+import async_server
+from actor import GameExecutor
+from ai import Searcher, play_turn
+from zobrist import position_hash
+from store import ConflictError, MemoryGameStore, SQLiteGameStore
 from constants import *
-from card_dictionary import CARD_DICTIONARY
-
-def make_game():
-    game = Game()
-    game.players = [Player(WHITE), Player(BLACK, True)]
-    for player in game.players:
-        player.warp = 1000
-        player.add_card(WARPLING_TYPE, BOARD_LENGTH*START_ZONE_HEIGHT)
-        player.add_card(ROOK_TYPE, 2)
-        player.add_card(QUEEN_TYPE, 1)
-        player.add_card(KING_TYPE, 1)
-        player.add_card(GOLD_GENERAL_TYPE, 2)
-        player.add_card(SILVER_GENERAL_TYPE, 2)
-
-        game.active_color = player.color
-        game.deploy(WARPLING_TYPE, player.color, 1, player.adjust(0), False)
-        game.deploy(ROOK_TYPE, player.color, 3, player.adjust(0), False)
-        game.deploy(KING_TYPE, player.color, 4, player.adjust(0), False)
-        game.deploy(QUEEN_TYPE, player.color, 5, player.adjust(0), False)
-        game.deploy(ROOK_TYPE, player.color, 6, player.adjust(0), False)
-        game.deploy(WARPLING_TYPE, player.color, 8, player.adjust(0), False)
-
-        game.deploy(WARPLING_TYPE, player.color, 0, player.adjust(1), False)
-        game.deploy(WARPLING_TYPE, player.color, 2, player.adjust(1), False)
-        game.deploy(SILVER_GENERAL_TYPE, player.color, 3, player.adjust(1), False)
-        game.deploy(GOLD_GENERAL_TYPE, player.color, 4, player.adjust(1), False)
-        game.deploy(GOLD_GENERAL_TYPE, player.color, 5, player.adjust(1), False)
-        game.deploy(SILVER_GENERAL_TYPE, player.color, 6, player.adjust(1), False)
-        game.deploy(WARPLING_TYPE, player.color, 7, player.adjust(1), False)
-        game.deploy(WARPLING_TYPE, player.color, 9, player.adjust(1), False)
-
-        for x in range(BOARD_LENGTH):
-            if x not in {0, 2, 7, 9}:
-                game.deploy(WARPLING_TYPE, player.color, x, player.adjust(2), False)
-        player.warp = 1
-
-        player.remove_card(WARPLING_TYPE)
-        player.remove_card(KING_TYPE)
-        player.remove_card(QUEEN_TYPE)
-        player.remove_card(GOLD_GENERAL_TYPE)
-        player.remove_card(SILVER_GENERAL_TYPE)
-
-        player.add_card(SUPER_PAWN_TYPE, 6)
-        player.add_card(LANCE_TYPE, 5)
-        player.add_card(KNIGHT_TYPE, 4)
-        player.add_card(BISHOP_TYPE, 4)
-        player.add_card(ROOK_TYPE, 3)
-        player.add_card(PROMOTED_BISHOP_TYPE, 2)
-        player.add_card(PROMOTED_ROOK_TYPE, 1)
-
-    game.turn = 1
-    game.active_color = STARTING_PLAYER
-    return game
-
-def test_game():
-    return_game = Game()
-    return_game.players = [Player(WHITE), Player(BLACK)]
-    for player in return_game.players:
-        player.add_card(WARPLING_TYPE, BOARD_LENGTH*BOARD_HEIGHT)
-    return_game.active_color = WHITE
-    return_game.deploy(WARPLING_TYPE, WHITE, 5, 5, False)
-    return_game.active_color = BLACK
-    return_game.deploy(WARPLING_TYPE, BLACK, 6, 6, False)
-    return_game.turn = 1
-    return return_game
-
-def checkers_game():
-    # return a game with a checkers style arrangement of warplings.
-    game = Game()
-    game.players = [Player(WHITE), Player(BLACK, True)]
-    for player in game.players:
-        player.add_card(WARPLING_TYPE, BOARD_LENGTH*START_ZONE_HEIGHT)
-        player.add_card(KNIGHT_TYPE, 7)
-        player.add_card(BISHOP_TYPE, 7)
-        player.add_card(ROOK_TYPE, 5)
-        player.add_card(QUEEN_TYPE, 1)
-        player.add_card(KING_TYPE, 1)
-
-    game.active_color = game.players[0].color
-    for x in range(BOARD_LENGTH):
-        for y in range(START_ZONE_HEIGHT):
-            if (x, y) == (BOARD_LENGTH/2, 0):
-                game.deploy(KING_TYPE, game.active_color, x, y, False)
-            elif (x % 2) == (y % 2):
-                game.deploy(WARPLING_TYPE, game.players[0].color, x, y, False)
-
-    game.active_color = game.players[1].color
-    for x in range(BOARD_LENGTH):
-        for y in range(BOARD_HEIGHT - START_ZONE_HEIGHT, BOARD_HEIGHT):
-            if (x, y) == (BOARD_LENGTH/2, BOARD_HEIGHT - 1):
-                game.deploy(KING_TYPE, game.active_color, x, y, False)
-            elif x % 2 == (y - (BOARD_HEIGHT - START_ZONE_HEIGHT)) % 2:
-                game.deploy(WARPLING_TYPE, game.players[1].color, x, y, False)
-
-    game.active_color = STARTING_PLAYER
-    game.turn = 1
-    return game
+from card_dictionary import CARD_DICTIONARY, UNIT_BUILDERS, CardDictionary, get_moves
+from setups import checkers_game, graph_destinations, make_game, random_game, test_game
 
 def single_unit_game(unit_type):
     game = Game()
@@ -112,6 +39,83 @@ def single_unit_game(unit_type):
     game.deploy(unit_type, WHITE, BOARD_LENGTH/2, BOARD_HEIGHT/2, False)
     return game
 
+def reference_movement(game, unit):
+    # return a copy of the unit's movement graph moved to its position and blocked with the original two pass sweep.
+    movement = unit.moves.copy()
+    movement.translate(unit.x, unit.y)
+    for node in movement.mapping:
+        x = node.x
+        y = node.y
+        if (0 <= x < BOARD_LENGTH) and (0 <= y < BOARD_HEIGHT):
+            if game.board[x][y] == EMPTY_TILE or (x, y) == (unit.x, unit.y):
+                movement.unblock_position(x, y)
+    for node in movement.mapping:
+        x = node.x
+        y = node.y
+        if (0 <= x < BOARD_LENGTH) and (0 <= y < BOARD_HEIGHT):
+            if game.board[x][y] != EMPTY_TILE and (x, y) != (unit.x, unit.y):
+                movement.block_position(x, y)
+    return movement
+
+def reference_move_is_legal(game, unit, movement, x, y):
+    # the original per-destination legality check, which searches the movement graph once per neighbouring node.
+    if unit.color != game.active_color:
+        return False
+    if x + 1 > BOARD_LENGTH or y + 1 > BOARD_HEIGHT:
+        return False
+    if x < 0 or y < 0:
+        return False
+    if game.board[x][y] == unit.color or game.board[x][y] == OBSTRUCTION:
+        return False
+    if (x, y) == (unit.x, unit.y):
+        return False
+    start_node = movement.find_node_by_position(unit.x, unit.y)
+    end_node = movement.find_node_by_position(x, y)
+    if end_node is None:
+        return False
+    for node in movement.neighbourhood(end_node):
+        if movement.traversal_cost(start_node, node) < BLOCKED:
+            return True
+    return False
+
+def reference_legal_moves(game, unit_ID):
+    unit = game.units[unit_ID]
+    movement = reference_movement(game, unit)
+    legal_moves = []
+    for x in range(BOARD_LENGTH):
+        for y in range(BOARD_HEIGHT):
+            if reference_move_is_legal(game, unit, movement, x, y):
+                legal_moves.append([x, y])
+    return legal_moves
+
+def apply_delta(state, delta):
+    # return the state a client holding the given state would reach by applying the delta, the way game.html does.
+    if delta['full']:
+        del delta['full']
+        return delta
+    units = {}
+    for unit in state['units']:
+        units[unit['ID']] = unit
+    for unit in delta['units']:
+        units[unit['ID']] = unit
+    for unit_ID in delta['removed']:
+        del units[unit_ID]
+    players = state['players']
+    for changes in delta['players']:
+        for player in players:
+            if player['color'] == changes['color']:
+                player['warp'] = changes['warp']
+                for unit_type, current_amount in changes['palette']:
+                    for card in player['palette']:
+                        if card['type'] == unit_type:
+                            card['current_amount'] = current_amount
+    new_state = {}
+    for key in ('turn', 'active_color', 'phase', 'n_units_deployed', 'state_ID', 'over'):
+        new_state[key] = delta[key]
+    new_state['units'] = [units[unit_ID] for unit_ID in sorted(units)]
+    new_state['players'] = players
+    return new_state
+
 class GameTest(unittest.TestCase):
 
     def test_initialization(self):
@@ -163,6 +167,241 @@ class GameTest(unittest.TestCase):
         bishop = game.get_unit_by_position(2, 2)
         self.assertTrue(game.move(bishop.ID, 4, 4))
 
+    def test_state_cache(self):
+        game = make_game()
+        state = game.state()
+        self.assertTrue(game.state() is state)
+        rook = game.get_unit_by_position(3, 0)
+        destinations = game.legal_destinations(rook.ID)
+        self.assertTrue(game.legal_destinations(rook.ID) is destinations)
+        game.take(3, 1)
+        self.assertTrue(game.state() is not state)
+        self.assertNotEqual(game.legal_destinations(rook.ID), destinations)
+        self.assertEqual(loads(game.state())['state_ID'], game.state_ID)
+
+    def test_state_since(self):
+        game = make_game()
+        state = loads(game.state())
+        self.assertTrue(loads(game.state_since(-1))['full'])
+        rng = random.Random(0)
+        for ply in range(20):
+            if ply % 4 == 3:
+                game.next_turn()
+            else:
+                moves = [(unit_ID, x, y) for unit_ID in game.units for x, y in game.legal_destinations(unit_ID)]
+                game.move(*rng.choice(sorted(moves)))
+            delta = loads(game.state_since(state['state_ID']))
+            self.assertFalse(delta['full'])
+            state = apply_delta(state, delta)
+            expected = loads(game.state())
+            expected['units'].sort(key=lambda unit: unit['ID'])
+            self.assertEqual(state, expected)
+
+    def test_unit_positions(self):
+        game = random_game(0, n_units=40, bitboard=True)
+        game.check_consistency()
+        rng = random.Random(0)
+        for ply in range(30):
+            moves = [(unit_ID, x, y) for unit_ID in game.units for x, y in game.legal_destinations(unit_ID)]
+            unit_ID, x, y = rng.choice(sorted(moves))
+            game.move(unit_ID, x, y)
+            self.assertEqual(game.get_unit_by_position(x, y).ID, unit_ID)
+            game.check_consistency()
+            game.active_color = int(not game.active_color)
+        for x, y in sorted(game.unit_positions)[:5]:
+            self.assertTrue(game.take(x, y))
+            self.assertEqual(game.get_unit_by_position(x, y), None)
+            self.assertFalse(game.take(x, y))
+            game.check_consistency()
+        game.unit_positions[(0, 0)] = max(game.units)
+        self.assertRaises(AssertionError, game.check_consistency)
+
+    def test_apply_undo(self):
+        for game in (make_game(), random_game(1, n_units=30, bitboard=True)):
+            rng = random.Random(0)
+            game.players[WHITE].add_card(KNIGHT_TYPE, 3)
+            game.players[BLACK].add_card(KNIGHT_TYPE, 3)
+            game.state()
+            states = []
+            records = []
+            for ply in range(40):
+                states.append((snapshot.dump(game), game.list_legal_moves(game.units.keys()[0])))
+                record = game.apply(rng.choice(game.legal_actions()))
+                self.assertTrue(record is not None)
+                records.append(record)
+            unit = game.units[max(game.units)]
+            self.assertEqual(game.apply((MOVE_ACTION, unit.ID, unit.x, unit.y)), None)
+            while records:
+                game.undo(records.pop())
+                game.check_consistency()
+                self.assertEqual((snapshot.dump(game), game.list_legal_moves(game.units.keys()[0])), states.pop())
+            self.assertEqual(loads(game.state_since(game.state_ID))['full'], False)
+
+    def test_position_hash(self):
+        game = make_game()
+        start = game.position_hash()
+        rng = random.Random(0)
+        records = []
+        seen = set([start])
+        for ply in range(60):
+            records.append(game.apply(rng.choice(game.legal_actions())))
+            # the hash kept up to date matches the hash computed from scratch
+            self.assertEqual(game.position_hash(), position_hash(game))
+            seen.add(game.position_hash())
+        self.assertTrue(len(seen) > 50)  # almost every action leads to a new position
+        while records:
+            game.undo(records.pop())
+        self.assertEqual(game.position_hash(), start)
+
+class MoveGenerationTest(unittest.TestCase):
+
+    def assertMatchesReference(self, game):
+        for unit_ID in game.units:
+            self.assertEqual(game.list_legal_moves(unit_ID), reference_legal_moves(game, unit_ID))
+
+    def test_random_positions(self):
+        for seed in range(10):
+            game = random_game(seed)
+            rng = random.Random(seed)
+            for ply in range(4):
+                self.assertMatchesReference(game)
+                moves = [(unit_ID, x, y) for unit_ID in game.units for x, y in game.legal_destinations(unit_ID)]
+                if moves:
+                    self.assertTrue(game.move(*rng.choice(sorted(moves))))
+                game.active_color = int(not game.active_color)
+
+    def test_played_game(self):
+        game = make_game()
+        rng = random.Random(0)
+        for ply in range(30):
+            moves = [(unit_ID, x, y) for unit_ID in game.units for x, y in game.legal_destinations(unit_ID)]
+            if not moves:
+                break
+            self.assertTrue(game.move(*rng.choice(sorted(moves))))
+            game.active_color = int(not game.active_color)
+        self.assertMatchesReference(game)
+
+    def test_standard_setups(self):
+        for game in (make_game(), checkers_game()):
+            for color in (WHITE, BLACK):
+                game.active_color = color
+                self.assertMatchesReference(game)
+
+
+class BitboardTest(unittest.TestCase):
+
+    def assertMatchesGraph(self, game):
+        # compare the bitboard and the move tables against searching the movement graphs, whatever the units' color
+        bitboard = game.bitboard
+        for unit_ID in game.units:
+            expected = graph_destinations(game, game.units[unit_ID])
+            game.bitboard = None
+            self.assertEqual(game.find_destinations(game.units[unit_ID]), expected)
+            game.bitboard = bitboard
+            self.assertEqual(game.find_destinations(game.units[unit_ID]), expected)
+
+    def test_random_positions(self):
+        for seed in range(20):
+            game = random_game(seed, n_units=10 + seed*3, n_obstructions=seed % 6, bitboard=True)
+            rng = random.Random(seed)
+            for ply in range(4):
+                self.assertMatchesGraph(game)
+                moves = [(unit_ID, x, y) for unit_ID in game.units for x, y in game.legal_destinations(unit_ID)]
+                if moves:
+                    self.assertTrue(game.move(*rng.choice(sorted(moves))))
+                game.active_color = int(not game.active_color)
+
+    def test_every_square(self):
+        # every unit type alone on every square, and surrounded by a ring of units
+        for unit_type in sorted(CARD_DICTIONARY.keys()):
+            for flipped in (False, True):
+                for x in range(BOARD_LENGTH):
+                    for y in range(BOARD_HEIGHT):
+                        game = Game(True)
+                        game.players = [Player(WHITE, flipped), Player(BLACK, not flipped)]
+                        game.deploy(unit_type, WHITE, x, y, False)
+                        self.assertMatchesGraph(game)
+                        for dx, dy in ((0, 2), (2, 0), (1, 1), (-1, 1), (0, -1), (-2, -2)):
+                            if 0 <= x + dx < BOARD_LENGTH and 0 <= y + dy < BOARD_HEIGHT:
+                                game.set_tile(x + dx, y + dy, OBSTRUCTION)
+                        self.assertMatchesGraph(game)
+
+    def test_standard_setups(self):
+        for game in (make_game(), checkers_game()):
+            game.bitboard = Bitboard()
+            game.update_movements()
+            self.assertMatchesGraph(game)
+
+
+class MoveTablesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'move_tables.cache')
+        self.tables = dict(move_tables.MOVE_TABLES)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        move_tables.MOVE_TABLES.clear()
+        move_tables.MOVE_TABLES.update(self.tables)
+
+    def test_cache(self):
+        move_tables.load_tables(self.path)
+        self.assertTrue(os.path.exists(self.path))
+        tables = dict(move_tables.MOVE_TABLES)
+        self.assertEqual(tables, move_tables.build_tables())
+        # a second load reads the cache, and gets the same tables
+        move_tables.load_tables(self.path)
+        self.assertEqual(move_tables.MOVE_TABLES, tables)
+        queen = move_tables.get_square_moves(QUEEN_TYPE, False, 0, 0)
+        self.assertTrue(isinstance(queen, move_tables.SquareMoves))
+        self.assertTrue(((0, 1), (0, 2), (0, 3)) in [ray[:3] for ray in queen.rays])
+
+    def test_stale_cache(self):
+        # caches made for other movement graphs, and broken caches, are worked out again and replaced
+        for contents in (marshal.dumps(('stale', {})), 'not a cache'):
+            with open(self.path, 'wb') as cache:
+                cache.write(contents)
+            move_tables.load_tables(self.path)
+            self.assertEqual(len(move_tables.MOVE_TABLES), 2*len(CARD_DICTIONARY))
+            with open(self.path, 'rb') as cache:
+                self.assertEqual(marshal.load(cache)[0], move_tables.fingerprint())
+
+    def test_concurrent_first_use(self):
+        # threads making the first lookup at once load the tables once, and none of them sees them half filled
+        loads = []
+        errors = []
+        load_tables = move_tables.load_tables
+        def counting_load_tables():
+            loads.append(1)
+            load_tables(self.path)
+        def look_up():
+            try:
+                for unit_type in CARD_DICTIONARY:
+                    move_tables.get_square_moves(unit_type, True, 0, 0)
+            except Exception as error:
+                errors.append(error)
+        move_tables.MOVE_TABLES.clear()
+        move_tables.load_tables = counting_load_tables
+        check_interval = sys.getcheckinterval()
+        sys.setcheckinterval(1)
+        try:
+            threads = [Thread(target=look_up) for i in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setcheckinterval(check_interval)
+            move_tables.load_tables = load_tables
+        self.assertEqual(errors, [])
+        self.assertEqual(len(loads), 1)
+
+    def test_unwritable_cache(self):
+        move_tables.load_tables(os.path.join(self.directory, 'missing', 'move_tables.cache'))
+        self.assertEqual(len(move_tables.MOVE_TABLES), 2*len(CARD_DICTIONARY))
+
+
 class UnitTest(unittest.TestCase):  # The Unit in UnitTest is for the Unit class
 
     def setUp(self):
@@ -173,6 +412,48 @@ class UnitTest(unittest.TestCase):  # The Unit in UnitTest is for the Unit class
         self.king = CARD_DICTIONARY[KING_TYPE].copy()
         self.queen = CARD_DICTIONARY[QUEEN_TYPE].copy()
 
+    def test_pickle(self):
+        # units, nodes and edges have no __dict__, but still pickle with every protocol
+        self.assertFalse(hasattr(self.queen, '__dict__'))
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            queen = pickle.loads(pickle.dumps(self.queen, protocol))
+            self.assertEqual((queen.name, queen.type), (self.queen.name, self.queen.type))
+            self.assertEqual(queen.moves.num_nodes(), self.queen.moves.num_nodes())
+            node = queen.moves.find_node_by_position(0, 2)
+            self.assertEqual(queen.moves.neighbourhood(node), set(queen.moves.find_node_by_position(x, y)
+                                                                  for x, y in ((0, 1), (0, 2), (0, 3))))
+
+    def test_card_dictionary(self):
+        # templates are built when first looked up, once, and listing the unit types builds none of them
+        built = []
+        def builder(unit_type):
+            def build():
+                built.append(unit_type)
+                return UNIT_BUILDERS[unit_type]()
+            return build
+        cards = CardDictionary(dict((unit_type, builder(unit_type)) for unit_type in UNIT_BUILDERS))
+        self.assertEqual(sorted(cards), sorted(CARD_DICTIONARY))
+        self.assertEqual((len(cards), ROOK_TYPE in cards, -1 in cards), (len(UNIT_BUILDERS), True, False))
+        self.assertEqual(built, [])
+        rook = cards[ROOK_TYPE]
+        self.assertTrue(cards[ROOK_TYPE] is rook and cards.get(ROOK_TYPE) is rook)
+        self.assertEqual((rook.name, built), ('Rook', [ROOK_TYPE]))
+        self.assertRaises(KeyError, lambda: cards[-1])
+        self.assertEqual(len(cards.values()), len(UNIT_BUILDERS))
+        self.assertEqual(sorted(built), sorted(UNIT_BUILDERS))
+
+    def test_card_dictionary_mapping(self):
+        # every mapping method sees every unit type, even before any template has been built
+        for method in (lambda cards: dict(cards.iteritems()), lambda cards: cards.copy(), dict):
+            cards = CardDictionary(UNIT_BUILDERS)
+            templates = method(cards)
+            self.assertEqual(sorted(templates), sorted(UNIT_BUILDERS))
+            self.assertEqual(templates[ROOK_TYPE].name, 'Rook')
+        cards = CardDictionary(UNIT_BUILDERS)
+        self.assertEqual((cards.has_key(ROOK_TYPE), cards.has_key(-1)), (True, False))
+        self.assertEqual(sorted(cards.iterkeys()), sorted(UNIT_BUILDERS))
+        self.assertEqual(len(list(cards.itervalues())), len(UNIT_BUILDERS))
+
     def test_bishop(self):
         game = single_unit_game(BISHOP_TYPE)
         x0 = BOARD_LENGTH/2
@@ -184,6 +465,14 @@ class UnitTest(unittest.TestCase):  # The Unit in UnitTest is for the Unit class
         self.assertTrue(game.move(bishop.ID, x0, y0))
         self.assertTrue(game.move(bishop.ID, x0 - 3, y0 + 3))
 
+    def test_shared_moves(self):
+        game = make_game()
+        queens = [unit for unit in game.units.values() if unit.type == QUEEN_TYPE]
+        self.assertEqual(len(queens), 2)
+        self.assertTrue(queens[0].moves is get_moves(QUEEN_TYPE, game.players[queens[0].color].flipped))
+        self.assertTrue(get_moves(WARPLING_TYPE, True).find_node_by_position(0, -1) is not None)
+        self.assertTrue(get_moves(WARPLING_TYPE).find_node_by_position(0, 1) is not None)
+
     def test_rook(self):
         game = single_unit_game(ROOK_TYPE)
         x0 = BOARD_LENGTH/2
@@ -217,6 +506,22 @@ class GraphTest(unittest.TestCase):
         self.assertTrue(my_graph.are_neighbours(my_graph.find_node_by_position(0, 0), my_graph.find_node_by_position(0, 1)))
         self.assertFalse(my_graph.are_neighbours(my_graph.find_node_by_position(0, 0), my_graph.find_node_by_position(1, 1)))
 
+    def test_find_edge(self):
+        my_graph = self.graph
+        node = my_graph.find_node_by_position(0, 1)
+        other_node = my_graph.find_node_by_position(1, 1)
+        edge = my_graph.find_edge(node, other_node)
+        self.assertTrue(edge is my_graph.find_edge(other_node, node))
+        self.assertEqual(set(edge.nodes), set([node, other_node]))
+        self.assertEqual(my_graph.find_edge(node, my_graph.find_node_by_position(1, 2)), None)
+        self.assertFalse(my_graph.connect(other_node, node))
+        self.assertTrue(my_graph.are_neighbours(node, node))
+        self.assertEqual(my_graph.neighbourhood(node), set(my_graph.find_node_by_position(x, y)
+                                                           for x, y in ((0, 0), (-1, 1), (0, 1), (1, 1), (0, 2))))
+        self.assertTrue(my_graph.edit_connection(node, other_node, 5))
+        self.assertEqual(edge.weight, 5)
+        self.assertFalse(my_graph.edit_connection(node, my_graph.find_node_by_position(1, 2), 5))
+
     def test_copy(self):
         my_graph = self.graph
         my_graph.connect_all_to(my_graph.find_node_by_position(0,0))
@@ -233,6 +538,80 @@ class GraphTest(unittest.TestCase):
                 if my_graph.are_neighbours(node, other_node):
                     self.assertTrue(my_new_graph.are_neighbours(copy_of_node, copy_of_other_node))
 
+    def test_copy_edges(self):
+        # copied edges keep their weight and direction, and connect the copied nodes
+        my_graph = self.graph
+        node = my_graph.find_node_by_position(0, 1)
+        other_node = my_graph.find_node_by_position(1, 1)
+        my_graph.edit_connection(node, other_node, 4, True)
+        my_new_graph = my_graph.copy()
+        self.assertEqual(my_new_graph.get_edges(), my_graph.get_edges())
+        copy_of_node = my_new_graph.find_node_by_position(0, 1)
+        edge = my_new_graph.find_edge(copy_of_node, my_new_graph.find_node_by_position(1, 1))
+        # the edge keeps its direction, from whichever end connect_adjacent_nodes put first
+        copy_of_start = my_new_graph.find_node_by_ID(my_graph.find_edge(node, other_node).nodes[0].ID)
+        self.assertEqual((edge.weight, edge.directed, edge.nodes[0]), (4, True, copy_of_start))
+        self.assertTrue(edge.nodes[0] is copy_of_start)
+        for copy_of_edge in my_new_graph.get_edges():
+            for end in copy_of_edge.nodes:
+                self.assertTrue(my_new_graph.find_node_by_ID(end.ID) is end)
+        edge.weight = 1
+        self.assertEqual(my_graph.find_edge(node, other_node).weight, 4)
+
+    def test_clone(self):
+        my_graph = self.graph
+        node = my_graph.find_node_by_position(0, 1)
+        edges = dict((edge.ID, edge.weight) for edge in my_graph.get_edges())
+        clone = my_graph.clone()
+        clone.block_node(node)
+        clone.connect_positions((0, 0), (1, 1))
+        # the clone sees its own changes, and the original none of them
+        self.assertEqual(clone.traversal_cost(clone.find_node_by_position(0, 0), clone.find_node_by_position(0, 2)), 3)
+        self.assertEqual(my_graph.traversal_cost(my_graph.find_node_by_position(0, 0), my_graph.find_node_by_position(0, 2)), 2)
+        self.assertEqual(dict((edge.ID, edge.weight) for edge in my_graph.get_edges()), edges)
+        self.assertEqual((my_graph.num_edges(), clone.num_edges()), (8, 9))
+        # edges it did not change are still shared
+        edge = my_graph.find_edge(my_graph.find_node_by_position(1, 1), my_graph.find_node_by_position(1, 2))
+        self.assertTrue(clone.find_edge(edge.nodes[0], edge.nodes[1]) is edge)
+        clone.unblock_node(node)
+        self.assertEqual(dict((edge.ID, edge.weight) for edge in clone.get_edges() if edge.ID in edges), edges)
+        self.assertRaises(ValueError, clone.translate, 1, 0)
+
+    def test_clone_original_edits(self):
+        # editing the original after cloning leaves its clones as they were, and edges neither changed stay shared
+        my_graph = self.graph
+        node = my_graph.find_node_by_position(0, 1)
+        clone = my_graph.clone()
+        edges = dict((edge.ID, edge.weight) for edge in clone.get_edges())
+        my_graph.block_node(node)
+        my_graph.connect_positions((0, 0), (1, 1))
+        my_graph.edit_connection(my_graph.find_node_by_position(-1, 1), my_graph.find_node_by_position(-1, 2), 5)
+        self.assertEqual(dict((edge.ID, edge.weight) for edge in clone.get_edges()), edges)
+        self.assertEqual((my_graph.num_edges(), clone.num_edges()), (9, 8))
+        self.assertEqual(clone.traversal_cost(clone.find_node_by_position(0, 0), clone.find_node_by_position(0, 2)), 2)
+        self.assertEqual(my_graph.traversal_cost(my_graph.find_node_by_position(0, 0), my_graph.find_node_by_position(0, 2)), 3)
+        edge = clone.find_edge(clone.find_node_by_position(1, 1), clone.find_node_by_position(1, 2))
+        self.assertTrue(my_graph.find_edge(edge.nodes[0], edge.nodes[1]) is edge)
+        # a clone of a clone leaves both of them as they were too
+        second = clone.clone()
+        clone.block_node(node)
+        self.assertEqual(dict((edge.ID, edge.weight) for edge in second.get_edges()), edges)
+        self.assertRaises(ValueError, my_graph.flip, 0)
+
+    def test_position_index(self):
+        my_graph = self.graph
+        node = my_graph.find_node_by_position(1, 2)
+        self.assertTrue(my_graph.find_node_by_ID(node.ID) is node)
+        my_graph.translate(3, -1)
+        self.assertTrue(my_graph.find_node_by_position(4, 1) is node)
+        self.assertTrue(my_graph.find_node_by_position(1, 2) is None)
+        my_graph.flip(0)
+        self.assertTrue(my_graph.find_node_by_position(4, -1) is node)
+        my_new_graph = my_graph.copy()
+        copy_of_node = my_new_graph.find_node_by_position(4, -1)
+        self.assertEqual(copy_of_node.ID, node.ID)
+        self.assertTrue(copy_of_node is not node)
+
     def test_traversal_cost(self):
         my_graph = self.graph
         self.assertEqual(my_graph.traversal_cost(my_graph.find_node_by_position(1, 1), my_graph.find_node_by_position(-1, 1)), 2)
@@ -242,6 +621,403 @@ class GraphTest(unittest.TestCase):
         my_graph.block_node(my_graph.find_node_by_position(0, 2))
         self.assertEqual(my_graph.traversal_cost(my_graph.find_node_by_position(0, 0), my_graph.find_node_by_position(-1, 2)), BLOCKED)
 
+    def test_traversal_costs(self):
+        my_graph = self.graph
+        start = my_graph.find_node_by_position(0, 0)
+        costs = my_graph.traversal_costs(start)
+        self.assertEqual(len(costs), 7)
+        for node in costs:
+            self.assertEqual(costs[node], my_graph.traversal_cost(start, node))
+        my_graph.block_node(my_graph.find_node_by_position(0, 1))
+        costs = my_graph.traversal_costs(start)
+        self.assertEqual(costs, {start: 0})
+
+    def test_long_traversal(self):
+        # longer than the default recursion limit
+        my_graph = Graph()
+        for y in range(5000):
+            my_graph.add_new_node(0, y)
+        my_graph.connect_adjacent_nodes()
+        start = my_graph.find_node_by_position(0, 0)
+        end = my_graph.find_node_by_position(0, 4999)
+        self.assertEqual(my_graph.traversal_cost(start, end), 4999)
+
+class SnapshotTest(unittest.TestCase):
+
+    def assertRoundTrips(self, game):
+        data = snapshot.dump(game)
+        loaded = snapshot.load(data)
+        loaded.check_consistency()
+        self.assertEqual(snapshot.dump(loaded), data)
+        for color in (WHITE, BLACK):
+            game.active_color = color
+            loaded.active_color = color
+            expected = game.generate_dict()
+            actual = loaded.generate_dict()
+            expected['units'].sort(key=lambda unit: unit['ID'])
+            actual['units'].sort(key=lambda unit: unit['ID'])
+            self.assertEqual(actual, expected)
+
+    def test_round_trip(self):
+        self.assertRoundTrips(test_game())
+        self.assertRoundTrips(checkers_game())
+        game = make_game()
+        self.assertRoundTrips(game)
+        rng = random.Random(0)
+        for ply in range(10):
+            moves = [(unit_ID, x, y) for unit_ID in game.units for x, y in game.legal_destinations(unit_ID)]
+            game.move(*rng.choice(sorted(moves)))
+            game.next_turn()
+        self.assertRoundTrips(game)
+        for seed in range(5):
+            self.assertRoundTrips(random_game(seed))
+
+    def test_bad_data(self):
+        data = snapshot.dump(test_game())
+        self.assertRaises(ValueError, snapshot.load, 'XX' + data[2:])
+
+
+class StoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def check_store(self, store):
+        game_id = store.create(test_game())
+        self.assertTrue(game_id in store)
+        self.assertEqual(store.game_ids(), [game_id])
+        state_ID = store.state_ID(game_id)
+        with store.edit(game_id) as game:
+            self.assertTrue(game.move(2, 6, 7))
+        self.assertTrue(store.state_ID(game_id) > state_ID)
+        self.assertEqual(store.wait(game_id, state_ID, 0), store.state_ID(game_id))
+        game = store.load(game_id)
+        self.assertEqual(game.get_unit_by_position(6, 7).ID, 2)
+        self.assertEqual(game.board[6][7], BLACK_TILE)
+        self.assertEqual(game.list_legal_moves(2), [[6, 8]])
+        loaded_state_ID = store.state_ID(game_id)
+        with store.edit(game_id) as game:
+            game.next_turn()
+        self.assertRaises(ConflictError, store.save, game_id, test_game(), loaded_state_ID)
+        self.assertTrue(store.delete(game_id))
+        self.assertFalse(game_id in store)
+        self.assertEqual(store.wait(game_id, 0, 0), None)
+        with store.edit(game_id) as game:
+            self.assertTrue(game is None)
+
+    def test_memory_store(self):
+        self.check_store(MemoryGameStore())
+
+    def test_sqlite_store(self):
+        path = os.path.join(self.directory, 'games.db')
+        self.check_store(SQLiteGameStore(path))
+        # a second store on the same file sees the same games
+        game_id = SQLiteGameStore(path).create(test_game())
+        self.assertEqual(SQLiteGameStore(path).load(game_id).board[6][6], BLACK_TILE)
+
+
+class ActorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.store = MemoryGameStore()
+        self.executor = GameExecutor(self.store, 4)
+
+    def tearDown(self):
+        self.executor.stop()
+
+    def test_one_game_at_a_time(self):
+        # commands for one game, sent from many threads, run one after another and in the order each thread sent them
+        game_id = self.store.create(test_game())
+        running = []
+        overlaps = []
+        order = []
+        def command(game, thread, i):
+            if running:
+                overlaps.append((thread, i))
+            running.append(i)
+            order.append((thread, i))
+            game.update_movements()
+            running.remove(i)
+        def send(thread):
+            for i in range(50):
+                self.executor.edit(game_id, lambda game: command(game, thread, i))
+        threads = [Thread(target=send, args=(thread,)) for thread in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual((len(order), overlaps), (200, []))
+        for thread in range(4):
+            self.assertEqual([i for sender, i in order if sender == thread], range(50))
+        self.assertEqual(self.executor.read(game_id, lambda game: game.state_ID), test_game().state_ID + 200)
+
+    def test_games_run_concurrently(self):
+        # a game held up on its shard does not hold up games on other shards
+        game_ids = [self.store.create(test_game()) for i in range(2)]
+        self.assertNotEqual(self.executor.shard(game_ids[0]), self.executor.shard(game_ids[1]))
+        release = Event()
+        blocked = self.executor.submit(game_ids[0], release.wait)
+        self.assertEqual(self.executor.read(game_ids[1], lambda game: game.turn), 1)
+        self.assertFalse(blocked.done.is_set())
+        release.set()
+        self.assertTrue(blocked.get())
+
+    def test_errors(self):
+        game_id = self.store.create(test_game())
+        self.assertEqual(self.executor.read(game_id + 1, lambda game: game), None)
+        self.assertRaises(ZeroDivisionError, self.executor.edit, game_id, lambda game: 1/0)
+        # the shard carries on
+        self.assertTrue(self.executor.edit(game_id, lambda game: game.perform((END_TURN_ACTION,))))
+
+
+class AsyncServerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.store = MemoryGameStore()
+        self.server = async_server.Server(self.store, port=0, secret='secret', poll_timeout=0.2)
+        self.thread = Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.stop()
+        self.thread.join()
+
+    def get(self, path, cookie=None, connection=None):
+        connection = connection or httplib.HTTPConnection('127.0.0.1', self.server.port, timeout=10)
+        connection.request('GET', path, headers={'Cookie': cookie} if cookie else {})
+        response = connection.getresponse()
+        return response.status, response.getheader('set-cookie'), response.read()
+
+    def test_sessions(self):
+        cookie = async_server.sign_session('secret', {'color-3': BLACK})
+        self.assertEqual(async_server.load_session('secret', cookie), {'color-3': BLACK})
+        self.assertEqual(async_server.load_session('other secret', cookie), {})
+        forged = async_server.sign_session('other secret', {'color-3': WHITE}).split('.')[0] + '.' + cookie.split('.')[1]
+        self.assertEqual(async_server.load_session('secret', forged), {})
+        self.assertEqual(async_server.load_session('secret', 'garbage'), {})
+
+    def test_memory_only(self):
+        directory = tempfile.mkdtemp()
+        try:
+            store = SQLiteGameStore(os.path.join(directory, 'games.db'))
+            self.assertRaises(ValueError, async_server.Server, store, port=0)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_routes(self):
+        status, cookie, body = self.get('/create/game')
+        game_id = self.store.game_ids()[0]
+        self.assertEqual(status, 302)
+        cookie = cookie.split(';')[0]
+        connection = httplib.HTTPConnection('127.0.0.1', self.server.port, timeout=10)
+        state = loads(self.get('/state/game/%d' % game_id, connection=connection)[2])
+        self.assertEqual(state['state_ID'], self.store.state_ID(game_id))
+        # only the session's color can deploy, and the same kept-alive connection carries on after an error
+        self.assertEqual(loads(self.get('/update/game/%d/color/%d/deploy/%d/to/0/0' % (game_id, WHITE, WARPLING_TYPE),
+                                        cookie, connection)[2])['message'], async_server.ERROR_MASQUERADE)
+        self.assertEqual(loads(self.get('/changed/game/%d/0' % game_id, connection=connection)[2]), {'changed': True})
+        self.assertEqual(loads(self.get('/state/game/%d' % (game_id + 1), connection=connection)[2])['message'],
+                         async_server.ERROR_GAME_DNE)
+        # a missing game is reported as such to clients without a color in it
+        self.assertEqual(loads(self.get('/update/game/%d/color/%d/deploy/%d/to/0/0' % (game_id + 1, WHITE,
+                                                                                      WARPLING_TYPE))[2])['message'],
+                         async_server.ERROR_GAME_DNE)
+        self.assertEqual(self.get('/no/such/page')[0], 404 if async_server.jinja2 else 501)
+
+    def test_polls(self):
+        game_id = self.store.create(test_game())
+        state_ID = self.store.state_ID(game_id)
+        # polls from a stale state are answered at once, and polls from the current state time out unchanged
+        self.assertEqual(loads(self.get('/poll/game/%d/%d' % (game_id, state_ID - 1))[2])['state_ID'], state_ID)
+        self.assertEqual(loads(self.get('/poll/game/%d/%d' % (game_id, state_ID))[2]), {'changed': False})
+        # parked polls are answered as soon as the game changes
+        self.server.poll_timeout = 10
+        answers = []
+        def poll():
+            answers.append(loads(self.get('/poll/game/%d/%d' % (game_id, state_ID))[2]))
+        threads = [Thread(target=poll) for i in range(5)]
+        for thread in threads:
+            thread.start()
+        while len(self.server.waiting.get(game_id, ())) < 5:
+            sleep(0.01)
+        self.assertEqual(loads(self.get('/update/game/%d/end/turn' % game_id)[2])['status'],
+                         async_server.STATUS_SUCCESS)
+        for thread in threads:
+            thread.join()
+        self.assertEqual([answer['state_ID'] for answer in answers], [state_ID + 1]*5)
+        self.assertEqual(self.server.waiting, {})
+
+    def open_socket(self, path, cookie=None):
+        sock = socket.create_connection(('127.0.0.1', self.server.port), 10)
+        sock.sendall('GET %s HTTP/1.1\r\nHost: 127.0.0.1:%d\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+                     'Sec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\nSec-WebSocket-Version: 13\r\n%s\r\n'
+                     % (path, self.server.port, 'Cookie: %s\r\n' % cookie if cookie else ''))
+        head = ''
+        while not head.endswith('\r\n\r\n'):
+            head += sock.recv(1)
+        # the accept key given for this client key in RFC 6455
+        self.assertIn('Sec-WebSocket-Accept: s3pPLMBiTxaQ9kYGzzhZRbK+xOo=', head)
+        return sock
+
+    def send_frame(self, sock, opcode, payload, final=True):
+        mask = os.urandom(4)
+        sock.sendall(struct.pack('!BB', (0x80 if final else 0) | opcode, 0x80 | len(payload)) + mask +
+                     async_server.unmask(mask, payload))
+
+    def receive(self, sock, n):
+        data = ''
+        while len(data) < n:
+            data += sock.recv(n - len(data))
+        return data
+
+    def read_frame(self, sock):
+        first, length = struct.unpack('!BB', self.receive(sock, 2))
+        if length == 126:
+            length = struct.unpack('!H', self.receive(sock, 2))[0]
+        return first & 0x0f, self.receive(sock, length)
+
+    def test_sockets(self):
+        game = test_game()
+        game_id = self.store.create(game)
+        state_ID = self.store.state_ID(game_id)
+        cookie = '%s=%s' % (async_server.SESSION_COOKIE,
+                            async_server.sign_session('secret', {'color-%d' % game_id: game.active_color}))
+        player = self.open_socket('/socket/game/%d/%d' % (game_id, state_ID), cookie)
+        spectator = self.open_socket('/socket/game/%d/%d' % (game_id, state_ID - 1))
+        # a socket opened from an older state is sent the changes since
+        self.assertEqual(loads(self.read_frame(spectator)[1])['state_ID'], state_ID)
+        self.send_frame(player, async_server.PING_FRAME, 'ping')
+        self.assertEqual(self.read_frame(player), (async_server.PONG_FRAME, 'ping'))
+        # an action, sent in two fragments, is acknowledged and its changes are sent to every socket
+        self.send_frame(player, async_server.TEXT_FRAME, '[1, "end', final=False)
+        self.send_frame(player, async_server.CONTINUATION_FRAME, '_turn"]')
+        self.assertEqual(loads(self.read_frame(player)[1]), {'ack': 1, 'status': async_server.STATUS_SUCCESS,
+                                                             'message': async_server.SUCCESS_DEFAULT})
+        for sock in (player, spectator):
+            self.assertEqual(loads(self.read_frame(sock)[1])['state_ID'], state_ID + 1)
+        # spectators and malformed messages are turned away
+        self.send_frame(spectator, async_server.TEXT_FRAME, '[2, "end_turn"]')
+        self.assertEqual(loads(self.read_frame(spectator)[1])['message'], async_server.ERROR_MASQUERADE)
+        self.send_frame(player, async_server.TEXT_FRAME, '[3, "move", "a", 0, 0]')
+        self.assertEqual(loads(self.read_frame(player)[1])['message'], async_server.ERROR_BAD_MESSAGE)
+        self.assertEqual(self.store.state_ID(game_id), state_ID + 1)
+        # sockets are closed when their game is deleted
+        self.get('/delete/game/%d' % game_id)
+        for sock in (player, spectator):
+            self.assertEqual(loads(self.read_frame(sock)[1])['message'], async_server.ERROR_GAME_DNE)
+            self.assertEqual(self.read_frame(sock), (async_server.CLOSE_FRAME, struct.pack('!H', 1000)))
+            sock.close()
+        self.assertEqual(self.server.subscribers, {})
+
+
+class AITest(unittest.TestCase):
+
+    def test_legal_actions(self):
+        game = make_game()
+        rng = random.Random(0)
+        for ply in range(20):
+            actions = game.legal_actions()
+            self.assertEqual(actions[-1], (END_TURN_ACTION,))
+            for action in actions:
+                self.assertTrue(snapshot.load(snapshot.dump(game)).perform(action))
+            phase = game.phase
+            action = rng.choice(actions)
+            self.assertTrue(game.perform(action))
+            if action[0] == DEPLOY_ACTION:
+                self.assertEqual((phase, game.phase), (DEPLOY_PHASE, END_PHASE))
+                self.assertEqual(game.legal_actions(), [(END_TURN_ACTION,)])
+        self.assertFalse(game.perform(('fly', 1, 2, 3)))
+
+    def test_zobrist(self):
+        game = make_game()
+        start = position_hash(game)
+        warpling = game.get_unit_by_position(1, 0)
+        game.place(warpling, 1, 4)
+        self.assertNotEqual(position_hash(game), start)
+        game.place(warpling, 1, 0)
+        self.assertEqual(position_hash(game), start)
+        game.next_phase()
+        self.assertNotEqual(position_hash(game), start)
+        # unit IDs are not part of the position
+        first = Game()
+        second = Game()
+        for game in (first, second):
+            game.players = [Player(WHITE), Player(BLACK, True)]
+        for unit_type, x, y in ((ROOK_TYPE, 0, 0), (KING_TYPE, 4, 0)):
+            first.deploy(unit_type, WHITE, x, y, False)
+        for unit_type, x, y in ((KING_TYPE, 4, 0), (ROOK_TYPE, 0, 0)):
+            second.deploy(unit_type, WHITE, x, y, False)
+        self.assertEqual(position_hash(first), position_hash(second))
+
+    def test_capture(self):
+        game = Game()
+        game.players = [Player(WHITE), Player(BLACK, True)]
+        game.deploy(ROOK_TYPE, WHITE, 0, 0, False)
+        game.deploy(KING_TYPE, WHITE, 9, 0, False)
+        game.active_color = BLACK
+        game.deploy(QUEEN_TYPE, BLACK, 0, 5, False)
+        game.deploy(KING_TYPE, BLACK, 9, 9, False)
+        game.active_color = WHITE
+        searcher = Searcher(max_depth=3, time_limit=None)
+        self.assertEqual(searcher.choose(game), (MOVE_ACTION, 1, 0, 5))
+        self.assertEqual(searcher.completed_depth, 3)
+        # with a budget too small for any search, the best ordered action is still legal
+        searcher = Searcher(time_limit=None, node_limit=1)
+        self.assertTrue(game.perform(searcher.choose(game)))
+
+    def test_play_turn(self):
+        store = MemoryGameStore()
+        executor = GameExecutor(store, 2)
+        game_id = store.create(make_game())
+        play_turn(executor, game_id, WHITE, Searcher(max_depth=2, time_limit=None))
+        executor.stop()
+        game = store.load(game_id)
+        self.assertEqual((game.active_color, game.turn), (BLACK, 2))
+
+    def test_play_turn_illegal_action(self):
+        # an action the game refuses ends the turn, rather than leaving it to be searched for and refused forever
+        class IllegalSearcher:
+            def choose(self, game):
+                unit = [unit for unit in game.units.values() if unit.color == game.active_color][0]
+                return (MOVE_ACTION, unit.ID, unit.x, unit.y)
+        store = MemoryGameStore()
+        executor = GameExecutor(store, 2)
+        game_id = store.create(make_game())
+        play_turn(executor, game_id, WHITE, IllegalSearcher())
+        executor.stop()
+        game = store.load(game_id)
+        self.assertEqual((game.active_color, game.turn), (BLACK, 2))
+
+
+class SimulateTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_simulate(self):
+        path = os.path.join(self.directory, 'results')
+        games_per_second = simulate.simulate(path, 6, 'greedy', 'random', max_turns=30, processes=2, seed=10)
+        self.assertTrue(games_per_second > 0)
+        results = sorted(simulate.read_results(path), key=lambda result: result['seed'])
+        self.assertEqual([result['seed'] for result in results], range(10, 16))
+        # games are reproducible from their seed
+        fields = simulate.play_game((12, 'greedy', 'random', 30))
+        result = results[2]
+        self.assertEqual(fields[:4], (result['seed'], result['winner'], result['turns'], result['actions']))
+        deployed = [result['deployed'][(color, unit_type)] for color in (WHITE, BLACK)
+                    for unit_type in simulate.UNIT_TYPES]
+        self.assertEqual(list(fields[4:]), deployed)
+        for result in results:
+            self.assertTrue(result['winner'] in (WHITE, BLACK, simulate.DRAW))
+            self.assertTrue(result['turns'] <= 31)
+
+
 class AbilityTest(unittest.TestCase):
 
     def test_barrier(self):
@@ -1,13 +1,15 @@
 from constants import *
 from graph import Graph
 
-class Unit:
+class Unit(object):
     """
     Units move on the board and have abilities.
 
     Each unit has an x and y position on the board, a list of legal moves, a list of abilities, a name, and a unique
     identifier to distinguish it from others of the same name.
     """
+    # no per-unit __dict__, a game holds dozens of units
+    __slots__ = ('ID', 'name', 'type', 'color', 'cost', 'x', 'y', 'moves', 'abilities')
 
     def __init__(self):
         """
@@ -22,13 +24,21 @@ class Unit:
         self.cost = 0  # amount of warp required to play the unit
         self.x = -1  # x position
         self.y = -1  # y position
-        self.moves = Graph()  # graph specifying the movement of the unit
+        self.moves = Graph()  # graph specifying the movement of the unit relative to its position, never modified
         self.abilities = {}  # a list of all the abilities the unit owns
 
+    def __getstate__(self):
+        return dict((name, getattr(self, name)) for name in Unit.__slots__)
+
+    def __setstate__(self, state):
+        for name in state:
+            setattr(self, name, state[name])
+
     def copy(self):
         """
         Return a copy of the unit.
 
+        The copy shares the caller's movement graph, which is never modified.
         :return: a unit with the same values as the caller.
         """
         unit = Unit()
@@ -39,7 +49,7 @@ class Unit:
         unit.cost = self.cost
         unit.x = self.x
         unit.y = self.y
-        unit.moves = self.moves.copy()
+        unit.moves = self.moves
         unit.abilities = self.abilities
         return unit
 
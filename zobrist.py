@@ -0,0 +1,62 @@
+"""
+Zobrist hashing of game positions.
+
+Every feature of a position, such as a unit of some type and color on some square, has a fixed random 64-bit key. The
+hash of a position is the exclusive or of the keys of its features, so positions that are the same get the same hash
+whatever order they were reached in.
+"""
+
+from random import Random
+
+from constants import *
+from card_dictionary import CARD_DICTIONARY
+
+ZOBRIST_SEED = 0x5741525057415253  # fixed so that hashes are the same in every process
+HASH_MASK = (1 << 64) - 1
+
+rng = Random(ZOBRIST_SEED)
+# key: (unit_type, color, x, y) -> item: key of a unit of that type and color on that square
+UNIT_KEYS = dict(((unit_type, color, x, y), rng.getrandbits(64)) for unit_type in sorted(CARD_DICTIONARY)
+                 for color in (WHITE, BLACK) for x in range(BOARD_LENGTH) for y in range(BOARD_HEIGHT))
+OBSTRUCTION_KEYS = dict(((x, y), rng.getrandbits(64)) for x in range(BOARD_LENGTH) for y in range(BOARD_HEIGHT))
+BLACK_KEY = rng.getrandbits(64)  # included when black is the active color
+PHASE_KEYS = [rng.getrandbits(64) for phase in (MOVE_PHASE, DEPLOY_PHASE, END_PHASE)]
+# counts are hashed as count*key, key: (color, unit_type) -> item: key of one card left in the palette
+CARD_KEYS = dict(((color, unit_type), rng.getrandbits(64) | 1) for color in (WHITE, BLACK)
+                 for unit_type in sorted(CARD_DICTIONARY))
+WARP_KEYS = [rng.getrandbits(64) | 1 for color in (WHITE, BLACK)]  # key of one warp held by each player
+del rng
+
+def count_key(key, count):
+    """
+    Return the part of a hash standing for a number of something.
+
+    :param key: the key of one of the thing, from CARD_KEYS or WARP_KEYS.
+    :param count: how many there are.
+    :return: a 64-bit int.
+    """
+    return (key*count) & HASH_MASK
+
+def position_hash(game):
+    """
+    Compute the hash of a game's position from scratch.
+
+    The position is the units and obstructions on the board, the active color, the phase, and each player's warp and
+    cards left. The turn counter and state_ID are not part of it.
+    :param game: the game.
+    :return: a 64-bit int.
+    """
+    result = PHASE_KEYS[game.phase]
+    if game.active_color == BLACK:
+        result ^= BLACK_KEY
+    for unit in game.units.values():
+        result ^= UNIT_KEYS[(unit.type, unit.color, unit.x, unit.y)]
+    for x in range(BOARD_LENGTH):
+        for y in range(BOARD_HEIGHT):
+            if game.board[x][y] == OBSTRUCTION:
+                result ^= OBSTRUCTION_KEYS[(x, y)]
+    for player in game.players:
+        result ^= count_key(WARP_KEYS[player.color], player.warp)
+        for unit_type in player.palette:
+            result ^= count_key(CARD_KEYS[(player.color, unit_type)], player.palette[unit_type].current_amount)
+    return result